@@ -0,0 +1,64 @@
+"""
+Compare llama-index BM25Retriever, rebuilt for every query, with the shared BM25Index.
+
+Usage: python bm25_benchmark.py
+"""
+
+import time
+from llama_index.core import Document
+from llama_index.core.node_parser import LangchainNodeParser
+from llama_index.retrievers.bm25 import BM25Retriever
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from lavague.core.utilities.bm25 import BM25Index
+from synthetic_dom import generate_html
+
+QUERIES = [
+    "Click on the add to cart button of the first product",
+    "Type blue shoes in the search bar",
+    "Subscribe to the newsletter",
+    "Go to the next page",
+]
+
+
+def split(html: str):
+    splitter = LangchainNodeParser(
+        lc_splitter=RecursiveCharacterTextSplitter.from_language(language="html")
+    )
+    return splitter.get_nodes_from_documents([Document(text=html)])
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    html = generate_html(5_000_000)
+    nodes = split(html)
+    texts = [node.text for node in nodes]
+    print(f"DOM of {len(html) / 1e6:.1f} MB, {len(nodes)} chunks")
+
+    def rebuild_and_retrieve(query):
+        retriever = BM25Retriever.from_defaults(nodes=nodes, similarity_top_k=5)
+        return [node.text for node in retriever.retrieve(query)]
+
+    reference, duration = timed(rebuild_and_retrieve, QUERIES[0])
+    print(f"  BM25Retriever, build + 1 query          {duration:8.3f}s")
+
+    index = BM25Index()
+    results, duration = timed(index.top_k, QUERIES[0], texts, 5)
+    identical = [texts[i] for i, _ in results] == reference
+    print(
+        f"  BM25Index, build + 1 query              {duration:8.3f}s  identical: {identical}"
+    )
+    _, duration = timed(index.top_k, QUERIES[1], texts, 5)
+    print(f"  BM25Index, 1 query                      {duration:8.3f}s")
+    _, duration = timed(index.score_texts, QUERIES, texts)
+    print(f"  BM25Index, {len(QUERIES)} queries                    {duration:8.3f}s")
+
+    # The DOM changes a bit between two steps
+    new_nodes = split(generate_html(50_000, seed=1))
+    changed_texts = texts[: len(texts) // 2] + [node.text for node in new_nodes]
+    _, duration = timed(index.top_k, QUERIES[2], changed_texts, 5)
+    print(f"  BM25Index, next page + 1 query          {duration:8.3f}s")
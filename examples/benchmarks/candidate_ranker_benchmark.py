@@ -0,0 +1,88 @@
+"""
+Train a `CandidateRanker` offline on the dataset of the retriever evaluator (see docs/docs/module-guides/evaluation.md)
+and report its recall@k through `RetrieverEvaluator` on held out rows, next to the default weights.
+
+Pages are annotated offline with `XPathAnnotator` instead of being loaded in a driver, so every element is a
+candidate and rect features are not used. The trained weights are saved to the given path, set
+LAVAGUE_CANDIDATE_RANKER_PATH to it to use them by default.
+
+Usage: python candidate_ranker_benchmark.py [weights.npz] [dataset.parquet] [max_rows]
+"""
+
+import sys
+import time
+import pandas as pd
+import yaml
+from lavague.core.evaluator import RetrieverEvaluator
+from lavague.core.retrievers import CandidateRankerRetriever
+from lavague.core.utilities.candidate_ranker import CandidateRanker, Candidates
+from lavague.core.utilities.xpath_utils import XPathAnnotator
+
+DATASET = "hf://datasets/BigAction/the-meta-wave-raw/data/train-00000-of-00001.parquet"
+RECALL_AT = (1, 5, 10, 30)
+
+
+def load_dataset(path: str, max_rows: int) -> pd.DataFrame:
+    """Validated rows with an xpath action, their HTML annotated with xpaths"""
+    dataset = pd.read_parquet(path)
+    dataset = dataset.loc[dataset["validated"]]
+
+    def has_xpath(action) -> bool:
+        try:
+            return bool(yaml.safe_load(action)["args"]["xpath"])
+        except Exception:
+            return False
+
+    dataset = dataset.loc[dataset["action"].map(has_xpath)].head(max_rows).copy()
+    annotator = XPathAnnotator()
+    dataset["html"] = dataset["html"].map(annotator.annotate)
+    return dataset
+
+
+def training_rows(dataset: pd.DataFrame):
+    for _, row in dataset.iterrows():
+        xpath = yaml.safe_load(row["action"])["args"]["xpath"]
+        yield row["instruction"], row["html"], xpath
+
+
+def scoring_time(ranker: CandidateRanker, dataset: pd.DataFrame) -> float:
+    """Mean time to score a candidate, once the features of the page are built"""
+    total_time, total_candidates = 0.0, 0
+    for instruction, html, _ in training_rows(dataset):
+        candidates = Candidates(html)
+        start = time.perf_counter()
+        ranker.score(instruction, candidates)
+        total_time += time.perf_counter() - start
+        total_candidates += len(candidates)
+    return total_time / max(total_candidates, 1)
+
+
+if __name__ == "__main__":
+    weights_path = sys.argv[1] if len(sys.argv) > 1 else "candidate_ranker.npz"
+    path = sys.argv[2] if len(sys.argv) > 2 else DATASET
+    max_rows = int(sys.argv[3]) if len(sys.argv) > 3 else 250
+    dataset = load_dataset(path, max_rows)
+    split = len(dataset) // 2
+    train, test = dataset.iloc[:split], dataset.iloc[split:]
+    print(f"{len(train)} training rows, {len(test)} test rows of {path}")
+
+    start = time.perf_counter()
+    trained = CandidateRanker.fit(training_rows(train))
+    print(f"Trained in {time.perf_counter() - start:.1f} s")
+    trained.save(weights_path)
+    print(f"Weights saved to {weights_path}")
+
+    evaluator = RetrieverEvaluator()
+    for name, ranker in [("default", CandidateRanker()), ("trained", trained)]:
+        results = evaluator.evaluate(
+            CandidateRankerRetriever(top_k=max(RECALL_AT), ranker=ranker),
+            test,
+            retriever_name=f"candidate_ranker_{name}",
+            recall_at=RECALL_AT,
+        )
+        recalls = "   ".join(
+            f"recall@{k} {results[f'recall@{k}'].mean():6.1%}" for k in RECALL_AT
+        )
+        print(
+            f"  {name:<8} {recalls}   {scoring_time(ranker, test) * 1e6:.2f} µs per candidate"
+        )
@@ -0,0 +1,104 @@
+"""
+Compare the memory and speed of the compact DomTable with the BeautifulSoup tree used by the retrievers.
+
+Usage: python dom_table_benchmark.py
+"""
+
+import gc
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import (
+    FromXPathNodesExpansionRetriever,
+    InteractiveXPathRetriever,
+    RetrieversPipeline,
+)
+from lavague.core.utilities.dom_table import DomTable
+from lavague.core.utilities.xpath_utils import iter_soup_xpaths
+from synthetic_dom import generate_html
+
+INTERACTIVE_TAGS = {"a", "button", "input", "select"}
+
+
+class StaticDriver:
+    def __init__(self, possible_interactions):
+        self.possible_interactions = possible_interactions
+
+    def get_possible_interactions(self, in_viewport=True):
+        return self.possible_interactions
+
+
+def retained_memory(fn, *args):
+    """Memory still allocated by the result of `fn` once it returns, and peak memory during the call"""
+    gc.collect()
+    tracemalloc.start()
+    result = fn(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    query = QueryBundle("add to cart")
+    for size in [500_000, 2_000_000]:
+        html = generate_html(size)
+        print(f"DOM of {len(html) / 1e6:.1f} MB")
+
+        for name, parse in [
+            ("BeautifulSoup", lambda: BeautifulSoup(html, "html.parser")),
+            ("DomTable", lambda: DomTable.from_html(html)),
+        ]:
+            tree, current, peak = retained_memory(parse)
+            del tree
+            tree, duration = timed(parse)
+            print(
+                f"  {name:<14} parse {duration:6.2f}s  retained {current / 1e6:7.1f} MB  peak {peak / 1e6:7.1f} MB"
+            )
+
+        soup = BeautifulSoup(html, "html.parser")
+        table = DomTable.from_html(html)
+        reference, soup_duration = timed(
+            lambda: [xpath for _, xpath in iter_soup_xpaths(soup)]
+        )
+        xpaths, table_duration = timed(
+            lambda: [xpath for _, xpath in table.iter_xpaths()]
+        )
+        print(
+            f"  xpaths         soup {soup_duration:6.2f}s  table {table_duration:6.2f}s  identical: {xpaths == reference}"
+        )
+        reference, soup_duration = timed(soup.get_text)
+        text, table_duration = timed(table.get_text)
+        print(
+            f"  text           soup {soup_duration:6.2f}s  table {table_duration:6.2f}s  identical: {text == reference}"
+        )
+
+        # Annotation of the interactive elements, as returned by the driver, then context expansion
+        driver = StaticDriver(
+            {
+                xpath: set()
+                for node, xpath in table.iter_xpaths()
+                if table.tag_name(node) in INTERACTIVE_TAGS
+            }
+        )
+        results = {}
+        for backend in ["html.parser", "table"]:
+            pipeline = RetrieversPipeline(
+                InteractiveXPathRetriever(driver, backend=backend),
+                FromXPathNodesExpansionRetriever(),
+            )
+            (chunks, current, peak), _ = timed(
+                retained_memory, pipeline.retrieve, query, [html]
+            )
+            chunks, duration = timed(pipeline.retrieve, query, [html])
+            results[backend] = chunks
+            print(
+                f"  pipeline {backend:<11} {duration:6.2f}s  peak {peak / 1e6:7.1f} MB  {len(chunks)} chunks"
+            )
+        print(f"  identical chunks: {results['html.parser'] == results['table']}")
@@ -0,0 +1,61 @@
+"""
+Compare the tree-walking context expansion of FromXPathNodesExpansionRetriever with the indexed one.
+
+Usage: python expansion_benchmark.py
+"""
+
+import time
+from bs4 import BeautifulSoup
+from lavague.core.retrievers import FromXPathNodesExpansionRetriever
+from lavague.core.utilities.dom_index import DomIndex, expand_xpath_chunks
+from lavague.core.utilities.xpath_utils import XPathAnnotator, iter_soup_xpaths
+from synthetic_dom import generate_html
+
+
+def nested_html(items: int, depth: int) -> str:
+    """List of links wrapped in `depth` divs, as rendered by component frameworks"""
+    elements = []
+    for i in range(items):
+        element = f'<a href="/p/{i}">Item {i}</a><span>Description {i}</span>'
+        for level in range(depth):
+            element = f'<div class="wrapper-{level}">{element}</div>'
+        elements.append(element)
+    return "<html><body>" + "\n".join(elements) + "</body></html>"
+
+
+def annotate_one_in(html: str, step: int) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    xpaths = [xpath for _, xpath in iter_soup_xpaths(soup)]
+    return XPathAnnotator().annotate(html, set(xpaths[::step]))
+
+
+def annotate_links(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    xpaths = [xpath for element, xpath in iter_soup_xpaths(soup) if element.name == "a"]
+    return XPathAnnotator().annotate(html, set(xpaths))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    pages = {
+        "synthetic 1MB, 1 element in 10": annotate_one_in(generate_html(1_000_000), 10),
+        "synthetic 1MB, 1 element in 2": annotate_one_in(generate_html(1_000_000), 2),
+        "2k links in 20 wrappers": annotate_links(nested_html(2_000, 20)),
+        "5k links in 20 wrappers": annotate_links(nested_html(5_000, 20)),
+    }
+    retriever = FromXPathNodesExpansionRetriever()
+    for name, html in pages.items():
+        soup = BeautifulSoup(html, "html.parser")
+        print(f"{name} ({len(soup.find_all(attrs={'xpath': True}))} marked elements)")
+        reference, duration = timed(retriever.get_expanded_chunks_from_soup, soup)
+        print(f"  tree walk           {duration:8.2f}s")
+        index, index_duration = timed(DomIndex.from_soup, soup)
+        chunks, duration = timed(expand_xpath_chunks, index, retriever.chunk_size)
+        print(
+            f"  index + expansion   {index_duration:8.2f}s + {duration:.2f}s  identical: {chunks == reference}"
+        )
@@ -0,0 +1,79 @@
+"""
+Recall and latency of SemanticRetriever with the local HashingEmbedding, next to OpenAI embeddings,
+on the dataset of the retriever evaluator (see docs/docs/module-guides/evaluation.md).
+
+A row is recalled when the xpath of its action is in the retrieved chunks, as in `RetrieverEvaluator`.
+Pages are annotated offline with `XPathAnnotator` instead of being loaded in a driver.
+OpenAI embeddings are skipped when OPENAI_API_KEY is not set.
+
+Usage: python hashing_embedding_benchmark.py [dataset.parquet] [max_rows]
+"""
+
+import os
+import sys
+import time
+import pandas as pd
+import yaml
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import SemanticRetriever
+from lavague.core.utilities.hashing_embedding import HashingEmbedding
+from lavague.core.utilities.xpath_utils import XPathAnnotator
+
+DATASET = "hf://datasets/BigAction/the-meta-wave-raw/data/train-00000-of-00001.parquet"
+
+
+def load_rows(path: str, max_rows: int):
+    dataset = pd.read_parquet(path)
+    rows = []
+    for _, row in dataset.loc[dataset["validated"]].iterrows():
+        try:
+            xpath = yaml.safe_load(row["action"])["args"]["xpath"]
+        except Exception:
+            continue
+        rows.append((row["instruction"], row["html"], xpath.replace("[1]", "")))
+        if len(rows) == max_rows:
+            break
+    return rows
+
+
+def evaluate(embedding, rows, top_k: int = 10):
+    """Mean recall, mean and 95th percentile time of a retrieval (page embedding and query)"""
+    recalls, times = [], []
+    annotator = XPathAnnotator()
+    for instruction, html, xpath in rows:
+        html = annotator.annotate(html)
+        retriever = SemanticRetriever(embedding, top_k=top_k)
+        start = time.perf_counter()
+        nodes = retriever.retrieve(QueryBundle(instruction), [html])
+        times.append(time.perf_counter() - start)
+        recalls.append(xpath in "\n".join(nodes))
+    times = pd.Series(times)
+    return sum(recalls) / max(len(recalls), 1), times.mean(), times.quantile(0.95)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DATASET
+    max_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rows = load_rows(path, max_rows)
+    print(f"{len(rows)} validated rows of {path}")
+    embeddings = [("HashingEmbedding", HashingEmbedding())]
+    if os.getenv("OPENAI_API_KEY"):
+        from llama_index.embeddings.openai import OpenAIEmbedding
+
+        embeddings.append(
+            (
+                "OpenAI text-embedding-3-small",
+                OpenAIEmbedding(model="text-embedding-3-small"),
+            ),
+        )
+        embeddings.append(
+            (
+                "OpenAI text-embedding-3-large",
+                OpenAIEmbedding(model="text-embedding-3-large"),
+            ),
+        )
+    for name, embedding in embeddings:
+        recall, mean_time, p95_time = evaluate(embedding, rows)
+        print(
+            f"  {name:<32} recall@10 {recall:6.1%}   time {mean_time * 1000:7.0f} ms (p95 {p95_time * 1000:7.0f} ms)"
+        )
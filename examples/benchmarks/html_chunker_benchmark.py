@@ -0,0 +1,103 @@
+"""
+Compare LangChain's RecursiveCharacterTextSplitter followed by the xpath regex filter,
+as used by the retrievers before, with the DOM-aware HtmlChunker.
+
+Usage: python html_chunker_benchmark.py
+"""
+
+import random
+import re
+import time
+from bisect import bisect_right
+from llama_index.core import Document
+from llama_index.core.node_parser import LangchainNodeParser
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from lavague.core.utilities.html_chunker import (
+    DEFAULT_CHUNK_SIZE,
+    HtmlChunker,
+    HtmlElements,
+)
+from lavague.core.utilities.xpath_utils import XPathAnnotator
+from synthetic_dom import generate_html
+
+XPATH = re.compile(r'xpath="([^"]+)"')
+
+
+def generate_article(target_size: int, seed: int = 0) -> str:
+    """Page of paragraphs of very different lengths with inline links, unlike the regular cards of `generate_html`"""
+    rng = random.Random(seed)
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing"]
+    paragraphs = []
+    size = 0
+    while size < target_size:
+        parts = []
+        for _ in range(rng.randint(1, 40)):
+            parts.append(" ".join(rng.choices(words, k=rng.randint(5, 60))))
+            parts.append(f'<a href="/ref/{len(paragraphs)}">reference</a>')
+        paragraph = f"<p class='text'>{' '.join(parts)}</p>"
+        paragraphs.append(paragraph)
+        size += len(paragraph)
+    return "<html><body><article>" + "\n".join(paragraphs) + "</article></body></html>"
+
+
+def split(html: str):
+    splitter = LangchainNodeParser(
+        lc_splitter=RecursiveCharacterTextSplitter.from_language(language="html")
+    )
+    return [
+        node.text for node in splitter.get_nodes_from_documents([Document(text=html)])
+    ]
+
+
+def split_and_filter(html: str):
+    return [text for text in split(html) if XPATH.search(text)]
+
+
+def chunk_and_filter(html: str):
+    return HtmlChunker().split(html, xpathed_only=True)
+
+
+def cut_elements(html: str, chunks):
+    """Elements that would fit in a chunk but are not entirely contained in any chunk"""
+    spans = []
+    position = 0
+    for chunk in chunks:
+        start = html.find(chunk, position)
+        spans.append((start, start + len(chunk)))
+        position = start + 1
+    starts = [start for start, _ in spans]
+    elements = HtmlElements(html)
+    cut = 0
+    for element in range(1, len(elements)):
+        start, end = elements.start[element], elements.end[element]
+        if end - start > DEFAULT_CHUNK_SIZE:
+            continue
+        i = bisect_right(starts, start) - 1
+        if not any(end <= spans[j][1] for j in range(max(i - 1, 0), i + 1)):
+            cut += 1
+    return cut
+
+
+if __name__ == "__main__":
+    for generate, size in [
+        (generate_html, 500_000),
+        (generate_html, 2_000_000),
+        (generate_article, 2_000_000),
+    ]:
+        html = XPathAnnotator().annotate(generate(size), None)
+        xpaths = set(XPATH.findall(html))
+        print(
+            f"{generate.__name__} DOM of {len(html) / 1e6:.1f} MB, {len(xpaths)} annotated elements"
+        )
+        for name, fn, split_fn in [
+            ("LangChain + regex", split_and_filter, split),
+            ("HtmlChunker", chunk_and_filter, HtmlChunker().split),
+        ]:
+            start = time.perf_counter()
+            chunks = fn(html)
+            duration = time.perf_counter() - start
+            kept = set(XPATH.findall("\n".join(chunks)))
+            print(
+                f"  {name:<18} {duration * 1000:7.0f} ms, {len(chunks)} chunks, "
+                f"{len(xpaths - kept)} xpaths lost, {cut_elements(html, split_fn(html))} elements cut"
+            )
@@ -0,0 +1,100 @@
+"""
+Compare the regex cleaning used before by `clean_html` and `CleanHTMLRetriever` with the single pass HtmlSanitizer.
+
+Pages captured with `driver.get_html()` can be given as arguments, synthetic pages with inline SVGs,
+base64 images and scripts are used otherwise.
+
+Usage: python html_sanitizer_benchmark.py [page.html ...]
+"""
+
+import re
+import sys
+import time
+from lavague.core.utilities.html_sanitizer import HtmlSanitizer
+from synthetic_dom import generate_html
+
+IMAGE = '<img src="data:image/png;base64,{data}" alt="thumbnail">'
+
+SCRIPT = "<script>window.dataLayer = window.dataLayer || []; if (a < b) {{ track({i}); }}</script>"
+
+
+def generate_captured_like(target_size: int, layout: str = "default") -> str:
+    """Synthetic page with the inline assets of captured pages, on a single line if `minified`, with SVGs on several lines if `indented`"""
+    html = generate_html(target_size)
+    parts = html.split("</h3>")
+    html = "".join(
+        part
+        + (
+            "</h3>" + IMAGE.format(data="iVBORw0KGgo" * 200) + SCRIPT.format(i=i)
+            if i < len(parts) - 1
+            else ""
+        )
+        for i, part in enumerate(parts)
+    )
+    if layout == "minified":
+        return html.replace("\n", "")
+    if layout == "indented":
+        return html.replace("<g>", "\n  <g>").replace("</svg>", "\n</svg>")
+    return html
+
+
+def regex_clean_html(
+    html_to_clean,
+    tags_to_remove=["style", "svg", "script"],
+    attributes_to_keep=["id", "href"],
+):
+    for tag in tags_to_remove:
+        html_to_clean = re.sub(
+            rf"<{tag}[^>]*>.*?</{tag}>", "", html_to_clean, flags=re.DOTALL
+        )
+    attributes_to_keep = "|".join(attributes_to_keep)
+    pattern = rf'\b(?!({attributes_to_keep})\b)\w+(?:-\w+)?\s*=\s*["\'][^"\']*["\']'
+    return re.sub(pattern, "", html_to_clean)
+
+
+def regex_clean_chunk(html):
+    html = re.sub('src="data:image/png;base64,([^"]*?)"', "", html)
+    return re.sub("<svg.*?>(.+?)</svg>", "", html)
+
+
+def measure(fn, html):
+    start = time.perf_counter()
+    output = fn(html)
+    return time.perf_counter() - start, output
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sys.argv[1:]:
+            with open(path, encoding="utf-8") as f:
+                pages.append((path, f.read()))
+    else:
+        pages = [
+            ("synthetic page", generate_captured_like(2_000_000)),
+            ("minified synthetic page", generate_captured_like(2_000_000, "minified")),
+            ("indented synthetic page", generate_captured_like(2_000_000, "indented")),
+        ]
+    clean_sanitizer = HtmlSanitizer(keep_attributes=["id", "href"], drop_base64=False)
+    chunk_sanitizer = HtmlSanitizer(drop_tags=["svg"])
+    for name, html in pages:
+        print(f"{name} of {len(html) / 1e6:.1f} MB")
+        for label, regex_fn, sanitizer in [
+            ("clean_html", regex_clean_html, clean_sanitizer),
+            ("CleanHTMLRetriever", regex_clean_chunk, chunk_sanitizer),
+        ]:
+            regex_time, regex_output = measure(regex_fn, html)
+            stream = sanitizer.stream()
+            sanitizer_time, output = measure(
+                lambda html: stream.feed(html) + stream.close(), html
+            )
+            print(
+                f"  {label:<18} regex {regex_time * 1000:7.0f} ms -> {len(regex_output) / 1e6:.2f} MB, "
+                f"HtmlSanitizer {sanitizer_time * 1000:6.0f} ms -> {len(output) / 1e6:.2f} MB "
+                f"({stream.bytes_removed / 1e6:.2f} MB removed)"
+            )
+        chunks = [html[i : i + 65536] for i in range(0, len(html), 65536)]
+        sanitizer_time, output = measure(
+            lambda chunks: "".join(chunk_sanitizer.sanitize_chunks(chunks)), chunks
+        )
+        print(f"  streamed in 64 KB chunks {sanitizer_time * 1000:6.0f} ms")
@@ -0,0 +1,38 @@
+import random
+
+CARD = """<div class="card" data-id="{i}">
+<a href="/product/{i}"><img src="/img/{i}.png" alt="Product {i}"></a>
+<h3 class="title">Product {i}</h3>
+<svg viewBox="0 0 24 24"><g><path d="M0 0h24v24H0z"></path><path d="M12 2l3 7h7l-6 4"></path></g><circle r="2"></circle></svg>
+<p class="price">{price} EUR</p>
+<span class="badge">New</span><span class="badge">Sale</span>
+<button type="button" onclick="add({i})">Add to cart</button>
+<form><input type="text" name="qty-{i}" placeholder="Quantity"><select name="size-{i}"><option>S</option><option>M</option></select></form>
+</div>"""
+
+
+def generate_html(target_size: int, seed: int = 0) -> str:
+    """Generate a synthetic e-commerce like page of roughly `target_size` characters"""
+    rng = random.Random(seed)
+    sections = []
+    size = 0
+    i = 0
+    while size < target_size:
+        cards = []
+        for _ in range(rng.randint(5, 30)):
+            cards.append(CARD.format(i=i, price=rng.randint(1, 999)))
+            i += 1
+        section = (
+            '<section><div class="grid"><div class="row">'
+            + "".join(cards)
+            + "</div></div></section>"
+        )
+        sections.append(section)
+        size += len(section)
+    return (
+        "<!DOCTYPE html><html><head><title>Synthetic page</title></head><body>"
+        + '<nav><ul><li><a href="/">Home</a></li><li><a href="/shop">Shop</a></li></ul></nav>'
+        + "<main>"
+        + "".join(sections)
+        + "</main></body></html>"
+    )
@@ -0,0 +1,54 @@
+"""
+Compare the recursive BeautifulSoup xpath generation with the single-pass XPathAnnotator.
+
+Usage: python xpath_annotation_benchmark.py
+"""
+
+import time
+from typing import List
+from bs4 import BeautifulSoup
+from lavague.core.retrievers import InteractiveXPathRetriever
+from lavague.core.utilities.xpath_utils import XPathAnnotator, iter_soup_xpaths
+from synthetic_dom import generate_html
+
+
+def recursive_xpaths(soup: BeautifulSoup) -> List[str]:
+    retriever = InteractiveXPathRetriever.__new__(InteractiveXPathRetriever)
+    return [retriever._generate_xpath(element) for element in soup.find_all(True)]
+
+
+def single_pass_xpaths(soup: BeautifulSoup) -> List[str]:
+    return [xpath for _, xpath in iter_soup_xpaths(soup)]
+
+
+def xpaths_of(annotated_html: str) -> List[str]:
+    soup = BeautifulSoup(annotated_html, "html.parser")
+    return [e["xpath"] for e in soup.find_all(attrs={"xpath": True})]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    for size in [1_000_000, 10_000_000]:
+        html = generate_html(size)
+        soup, parse_duration = timed(BeautifulSoup, html, "html.parser")
+        print(f"DOM of {len(html) / 1e6:.1f} MB ({len(soup.find_all(True))} elements)")
+        print(f"  html.parser parsing                {parse_duration:8.2f}s")
+
+        reference, duration = timed(recursive_xpaths, soup)
+        print(f"  xpaths, recursive BeautifulSoup    {duration:8.2f}s")
+        xpaths, duration = timed(single_pass_xpaths, soup)
+        print(
+            f"  xpaths, single-pass BeautifulSoup  {duration:8.2f}s  identical: {xpaths == reference}"
+        )
+
+        for backend in ["html.parser", "lxml"]:
+            annotated, duration = timed(XPathAnnotator(backend).annotate, html)
+            identical = xpaths_of(annotated) == reference
+            print(
+                f"  parse + annotate + serialize, {backend:<11} {duration:8.2f}s  identical: {identical}"
+            )
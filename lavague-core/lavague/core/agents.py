@@ -454,42 +454,45 @@ class WebAgent:
         self.logger.end_step()
 
     def run_step(self, objective: str) -> Optional[ActionResult]:
-        obs = self.driver.get_obs()
-        current_state, past = self.st_memory.get_state()
+        with self.driver.step():
+            obs = self.driver.get_obs()
+            current_state, past = self.st_memory.get_state()
 
-        world_model_output = self.world_model.get_instruction(
-            objective, current_state, past, obs
-        )
-        logging_print.info(world_model_output)
-        next_engine_name = extract_next_engine(world_model_output)
-        instruction = extract_world_model_instruction(world_model_output)
+            world_model_output = self.world_model.get_instruction(
+                objective, current_state, past, obs
+            )
+            logging_print.info(world_model_output)
+            next_engine_name = extract_next_engine(world_model_output)
+            instruction = extract_world_model_instruction(world_model_output)
 
-        if next_engine_name == "COMPLETE" or next_engine_name == "SUCCESS":
-            self.result.success = True
-            self.result.output = instruction
-            logging_print.info("Objective reached. Stopping...")
+            if next_engine_name == "COMPLETE" or next_engine_name == "SUCCESS":
+                self.result.success = True
+                self.result.output = instruction
+                logging_print.info("Objective reached. Stopping...")
+                self.logger.add_log(obs)
+
+                self.process_token_usage()
+                self.logger.end_step()
+                return self.result
+
+            # the page may have changed while the world model was running
+            self.driver.invalidate_snapshot()
+            action_result = self.action_engine.dispatch_instruction(
+                next_engine_name, instruction
+            )
+            if action_result.success:
+                self.result.code += action_result.code
+                self.result.output = action_result.output
+            self.st_memory.update_state(
+                instruction,
+                next_engine_name,
+                action_result.success,
+                action_result.output,
+            )
             self.logger.add_log(obs)
 
             self.process_token_usage()
             self.logger.end_step()
-            return self.result
-
-        action_result = self.action_engine.dispatch_instruction(
-            next_engine_name, instruction
-        )
-        if action_result.success:
-            self.result.code += action_result.code
-            self.result.output = action_result.output
-        self.st_memory.update_state(
-            instruction,
-            next_engine_name,
-            action_result.success,
-            action_result.output,
-        )
-        self.logger.add_log(obs)
-
-        self.process_token_usage()
-        self.logger.end_step()
 
     def prepare_run(self, display: bool = False, user_data=None):
         self.action_engine.set_display_all(display)
@@ -4,6 +4,8 @@ from pathlib import Path
 import re
 from typing import Any, Callable, Optional, Mapping, Dict, Set, List, Tuple, Union
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
 from lavague.core.utilities.format_utils import (
     extract_code_from_funct,
     extract_imports_from_lines,
@@ -11,6 +13,9 @@ from lavague.core.utilities.format_utils import (
 from enum import Enum
 from datetime import datetime
 import hashlib
+import asyncio
+import functools
+import inspect
 
 
 class InteractionType(Enum):
@@ -22,10 +27,133 @@ class InteractionType(Enum):
 
 PossibleInteractionsByXpath = Dict[str, Set[InteractionType]]
 
+# Bounding boxes (x, y, width, height) relative to the top-level viewport
+RectsByXpath = Dict[str, Tuple[float, float, float, float]]
+
 r_get_xpaths_from_html = r'xpath=["\'](.*?)["\']'
 
+# URLs of the empty page opened by the drivers, reported as None
+BLANK_URLS = frozenset(["data:,", "about:blank"])
+
+# Reads memoized within a step, with the attributes they set that are restored when the memoized value is returned
+MEMOIZED_READS: Dict[str, Tuple[str, ...]] = {
+    "get_url": (),
+    "get_html": (),
+    "get_tabs": (),
+    "get_frames_html": (),
+    "get_possible_interactions": ("interaction_rects",),
+    "snapshot": ("interaction_rects",),
+}
+
+# Methods that may change the page, the scroll position, the frame or the tab, they clear the memoized reads
+INVALIDATING_METHODS = frozenset(
+    [
+        "get",
+        "back",
+        "exec_code",
+        "click",
+        "hover",
+        "set_value",
+        "dropdown_select",
+        "upload_file",
+        "scroll",
+        "scroll_up",
+        "scroll_down",
+        "scroll_page",
+        "switch_tab",
+        "switch_frame",
+        "switch_default_frame",
+        "switch_parent_frame",
+        "resize_driver",
+        "maximize_window",
+        "wait",
+        "perform_wait",
+        "wait_for_idle",
+    ]
+)
+
+
+@dataclass
+class DriverSnapshot:
+    """Observation of the current page returned by `BaseDriver.snapshot`"""
+
+    url: Optional[str]
+    html: str
+    tabs: str
+    title: Optional[str] = None
+    # (x, y) of the scroll position, (width, height) of the page and of the viewport, None when not captured
+    scroll_position: Optional[Tuple[float, float]] = None
+    page_size: Optional[Tuple[float, float]] = None
+    viewport_size: Optional[Tuple[float, float]] = None
+    possible_interactions: Optional[PossibleInteractionsByXpath] = None
+    interaction_rects: Optional[RectsByXpath] = None
+
+
+def memoized_read(method: Callable) -> Callable:
+    """Memoize a read of the driver by its arguments within a step, see `BaseDriver.step`"""
+    signature = inspect.signature(method)
+    state = MEMOIZED_READS.get(method.__name__, ())
+
+    def get_key(driver, args, kwargs) -> tuple:
+        bound = signature.bind(driver, *args, **kwargs)
+        bound.apply_defaults()
+        return (method.__name__,) + tuple(bound.arguments.values())[1:]
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        memo = getattr(self, "_memo", None)
+        if memo is None:
+            return method(self, *args, **kwargs)
+        try:
+            key = get_key(self, args, kwargs)
+            entry = memo.get(key)
+        except TypeError:
+            # unhashable arguments
+            return method(self, *args, **kwargs)
+        if entry is None:
+            value = method(self, *args, **kwargs)
+            memo[key] = (value, {name: getattr(self, name, None) for name in state})
+            return value
+        value, attributes = entry
+        for name, attribute in attributes.items():
+            setattr(self, name, attribute)
+        return value
+
+    wrapper.memo_key = get_key
+    wrapper.is_memoized = True
+    return wrapper
+
+
+def invalidates_memo(method: Callable) -> Callable:
+    """Clear the memoized reads once the method returns or raises"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.invalidate_snapshot()
+
+    wrapper.is_memoized = True
+    return wrapper
+
 
 class BaseDriver(ABC):
+    # Whether `get_html` serializes the page as doctype + outerHTML, as `page.content()` of Playwright does.
+    # `snapshot` then captures the HTML in its script, otherwise it reads `get_html` so that both return the same HTML
+    snapshot_html: bool = False
+
+    def __init_subclass__(cls, **kwargs):
+        """Memoize the reads and invalidate them in the methods changing the page, as defined by the subclass"""
+        super().__init_subclass__(**kwargs)
+        for name, method in list(vars(cls).items()):
+            if not inspect.isfunction(method) or getattr(method, "is_memoized", False):
+                continue
+            if name in MEMOIZED_READS:
+                setattr(cls, name, memoized_read(method))
+            elif name in INVALIDATING_METHODS:
+                setattr(cls, name, invalidates_memo(method))
+
     def __init__(self, url: Optional[str], init_function: Optional[Callable[[], Any]]):
         """Init the driver with the init funtion, and then go to the desired url"""
         self.init_function = (
@@ -36,6 +164,13 @@ class BaseDriver(ABC):
         # Flag to check if the page has been previously scanned to avoid erasing screenshots from previous scan
         self.previously_scanned = False
 
+        # Bounding boxes of the elements returned by the last call to `get_possible_interactions`
+        self.interaction_rects: Optional[RectsByXpath] = None
+
+        # Reads memoized by the current step, None outside of steps
+        self._memo: Optional[Dict[tuple, tuple]] = None
+        self._step_depth = 0
+
         # extract import lines for later exec of generated code
         init_lines = extract_code_from_funct(self.init_function)
         self.import_lines = extract_imports_from_lines(init_lines)
@@ -133,6 +268,15 @@ class BaseDriver(ABC):
         """
         raise NotImplementedError()
 
+    def get_frames_html(self) -> Optional[Dict[str, str]]:
+        """
+        HTML of all the accessible same-origin frames of the current page in a single round trip,
+        keyed by the full xpath of the frame, prefixed by the xpath of its parent frames.
+        The page itself is not included, callers already have it from `get_html`.
+        Returns None when the driver cannot capture frames this way, frames are then read by switching to them.
+        """
+        return None
+
     def switch_parent_frame(self) -> None:
         """
         Switch back to the parent frame
@@ -192,9 +336,149 @@ class BaseDriver(ABC):
         """Get elements that can be interacted with as a dictionary mapped by xpath"""
         pass
 
+    def get_interaction_rects(self) -> Optional[RectsByXpath]:
+        """
+        Bounding boxes of the elements returned by the last call to `get_possible_interactions`,
+        captured in the same round trip. None when the driver does not capture them.
+        """
+        return self.interaction_rects
+
     def check_visibility(self, xpath: str) -> bool:
         pass
 
+    @contextmanager
+    def step(self):
+        """
+        Memoize the reads of the driver (`MEMOIZED_READS`) until the end of the block, so that repeated reads
+        within an agent step cost no round trip. They are cleared by the methods that may change the page,
+        the scroll position, the frame or the tab (`INVALIDATING_METHODS`), or with `invalidate_snapshot`.
+        Nested steps share the memo of the outermost one.
+        """
+        self._step_depth = getattr(self, "_step_depth", 0) + 1
+        if self._step_depth == 1:
+            self._memo = {}
+        try:
+            yield self
+        finally:
+            self._step_depth -= 1
+            if self._step_depth == 0:
+                self._memo = None
+
+    def invalidate_snapshot(self):
+        """Clear the memoized reads, to be called when the page is changed outside of the driver methods"""
+        memo = getattr(self, "_memo", None)
+        if memo is not None:
+            memo.clear()
+
+    def _seed_memo(self, name: str, value: Any, *args, **kwargs):
+        """Memoize the value of a read captured by another call"""
+        memo = getattr(self, "_memo", None)
+        method = getattr(type(self), name, None)
+        if memo is None or not hasattr(method, "memo_key"):
+            return
+        state = MEMOIZED_READS[name]
+        memo[method.memo_key(self, args, kwargs)] = (
+            value,
+            {attribute: getattr(self, attribute, None) for attribute in state},
+        )
+
+    @memoized_read
+    def snapshot(
+        self, with_interactions: bool = True, in_viewport=True, foreground_only=True
+    ) -> DriverSnapshot:
+        """
+        URL, HTML, title, scroll state and tabs of the current page, and the possible interactions with their rects
+        if `with_interactions`, captured in a single in-page script when `execute_script` accepts arguments.
+        The HTML is captured by the script only if `snapshot_html`, it is read with `get_html` otherwise.
+        Drivers without script arguments fall back to separate reads.
+        Within a step, the snapshot also memoizes the reads it captured: `get_url`, `get_html` and
+        `get_possible_interactions` with the same arguments.
+        """
+        try:
+            page = self.execute_script(
+                JS_GET_SNAPSHOT,
+                with_interactions,
+                in_viewport,
+                foreground_only,
+                self.snapshot_html,
+            )
+        except Exception:
+            page = None
+        if not isinstance(page, dict):
+            return DriverSnapshot(
+                url=self.get_url(),
+                html=self.get_html(),
+                tabs=self.get_tabs(),
+                possible_interactions=self.get_possible_interactions(
+                    in_viewport, foreground_only
+                )
+                if with_interactions
+                else None,
+                interaction_rects=self.get_interaction_rects()
+                if with_interactions
+                else None,
+            )
+
+        url = None if page["url"] in BLANK_URLS else page["url"]
+        possible_interactions = None
+        if with_interactions:
+            interactives = page["interactives"]
+            self.interaction_rects = {
+                k: tuple(v) for k, v in interactives["rects"].items()
+            }
+            possible_interactions = {
+                k: set(InteractionType[i] for i in v)
+                for k, v in interactives["interactions"].items()
+            }
+            self._seed_memo(
+                "get_possible_interactions",
+                possible_interactions,
+                in_viewport,
+                foreground_only,
+            )
+        self._seed_memo("get_url", url)
+        if self.snapshot_html:
+            html = page["html"]
+            self._seed_memo("get_html", html)
+        else:
+            html = self.get_html()
+        return DriverSnapshot(
+            url=url,
+            html=html,
+            tabs=self.get_tabs(),
+            title=page["title"],
+            scroll_position=tuple(page["scroll_position"]),
+            page_size=tuple(page["page_size"]),
+            viewport_size=tuple(page["viewport_size"]),
+            possible_interactions=possible_interactions,
+            interaction_rects=self.interaction_rects if with_interactions else None,
+        )
+
+    # Asynchronous counterparts of the driver round trips used by retrievers.
+    # Drivers with an async backend override them, by default the call runs in a worker thread.
+
+    async def aget_html(self) -> str:
+        return await asyncio.to_thread(self.get_html)
+
+    async def aget_possible_interactions(
+        self, in_viewport=True, foreground_only=True
+    ) -> PossibleInteractionsByXpath:
+        return await asyncio.to_thread(
+            self.get_possible_interactions, in_viewport, foreground_only
+        )
+
+    async def acheck_visibility(self, xpath: str) -> bool:
+        return await asyncio.to_thread(self.check_visibility, xpath)
+
+    async def aget_frames_html(self) -> Optional[Dict[str, str]]:
+        return await asyncio.to_thread(self.get_frames_html)
+
+    async def aswitch_frame(self, xpath) -> None:
+        await asyncio.to_thread(self.switch_frame, xpath)
+
+    async def aswitch_parent_frame(self) -> None:
+        await asyncio.to_thread(self.switch_parent_frame)
+
     @abstractmethod
     def get_highlighted_element(self, generated_code: str):
         """Return the page elements that generated code interact with"""
@@ -235,6 +519,11 @@ class BaseDriver(ABC):
 
     def get_obs(self) -> dict:
         """Get the current observation of the driver"""
+        with self.step():
+            return self._get_obs()
+
+    def _get_obs(self) -> dict:
+        snapshot = self.snapshot(with_interactions=False)
         current_screenshot_folder = self.get_current_screenshot_folder()
 
         if not self.previously_scanned:
@@ -259,14 +548,12 @@ class BaseDriver(ABC):
         # We take a screenshot and computes its hash to see if it already exists
         self.save_screenshot(current_screenshot_folder)
 
-        url = self.get_url()
-        html = self.get_html()
         obs = {
-            "html": html,
+            "html": snapshot.html,
             "screenshots_path": str(current_screenshot_folder),
-            "url": url,
+            "url": snapshot.url,
             "date": datetime.now().isoformat(),
-            "tab_info": self.get_tabs(),
+            "tab_info": snapshot.tabs,
         }
 
         return obs
@@ -275,6 +562,7 @@ class BaseDriver(ABC):
         import time
 
         time.sleep(duration)
+        self.invalidate_snapshot()
 
     def wait_for_idle(self):
         pass
@@ -482,7 +770,7 @@ JS_GET_INTERACTIVES = """
 const windowHeight = (window.innerHeight || document.documentElement.clientHeight);
 const windowWidth = (window.innerWidth || document.documentElement.clientWidth);
 
-return (function(inViewport, foregroundOnly) {
+return (function(inViewport, foregroundOnly, withRects) {
     function getInteractions(e) {
         const tag = e.tagName.toLowerCase();
         if (!e.checkVisibility() || e.hasAttribute('disabled') || e.hasAttribute('readonly')
@@ -555,12 +843,29 @@ return (function(inViewport, foregroundOnly) {
         return evts;
     }
 
+    function getRect(e) {
+        const rect = e.getBoundingClientRect();
+        let x = rect.x, y = rect.y;
+        let iframe = e.ownerDocument.defaultView.frameElement;
+        while (iframe) {
+            const iframeRect = iframe.getBoundingClientRect();
+            x += iframeRect.x;
+            y += iframeRect.y;
+            iframe = iframe.ownerDocument.defaultView.frameElement;
+        }
+        return [x, y, rect.width, rect.height];
+    }
+
     const results = {};
+    const rects = {};
     function traverse(node, xpath) {
         if (node.nodeType === Node.ELEMENT_NODE) {
             const interactions = getInteractions(node);
             if (interactions.length > 0) {
                 results[xpath] = interactions;
+                if (withRects) {
+                    rects[xpath] = getRect(node);
+                }
             }
         }
         const countByTag = {};
@@ -588,10 +893,69 @@ return (function(inViewport, foregroundOnly) {
         }
     }
     traverse(document.body, '/html/body');
-    return results;
-})(arguments?.[0], arguments?.[1]);
+    return withRects ? {interactions: results, rects: rects} : results;
+})(arguments?.[0], arguments?.[1], arguments?.[2]);
+"""
+
+JS_GET_FRAMES_HTML = """
+return (function() {
+    const frames = {};
+    function addDocument(doc, xpath) {
+        const doctype = doc.doctype ? new XMLSerializer().serializeToString(doc.doctype) : '';
+        frames[xpath] = doctype + doc.documentElement.outerHTML;
+        traverse(doc, xpath);
+    }
+    function traverse(node, xpath) {
+        const countByTag = {};
+        for (let child = node.firstElementChild; child; child = child.nextElementSibling) {
+            const tag = child.nodeName.toLowerCase();
+            if (tag.includes(":") || tag === 'svg') continue;
+            countByTag[tag] = (countByTag[tag] || 0) + 1;
+            let childXpath = xpath + '/' + tag;
+            if (countByTag[tag] > 1) {
+                childXpath += '[' + countByTag[tag] + ']';
+            }
+            if (tag === 'iframe') {
+                let doc = null;
+                try {
+                    doc = child.contentDocument;
+                } catch (e) {}
+                // null for cross-origin frames
+                if (doc && doc.documentElement) {
+                    addDocument(doc, childXpath);
+                }
+            } else {
+                traverse(child, childXpath);
+            }
+        }
+    }
+    traverse(document, '');
+    return frames;
+})();
 """
 
+JS_GET_SNAPSHOT = (
+    """
+const getInteractives = function() {"""
+    + JS_GET_INTERACTIVES
+    + """};
+let html = null;
+if (arguments?.[3]) {
+    html = document.doctype ? new XMLSerializer().serializeToString(document.doctype) : '';
+    if (document.documentElement) html += document.documentElement.outerHTML;
+}
+return {
+    url: window.location.href,
+    title: document.title,
+    html: html,
+    scroll_position: [window.scrollX, window.scrollY],
+    page_size: [document.documentElement.scrollWidth, document.documentElement.scrollHeight],
+    viewport_size: [window.innerWidth, window.innerHeight],
+    interactives: arguments?.[0] ? getInteractives(arguments?.[1], arguments?.[2], true) : null,
+};
+"""
+)
+
 JS_WAIT_DOM_IDLE = """
 return new Promise(resolve => {
     const timeout = arguments[0] || 10000;
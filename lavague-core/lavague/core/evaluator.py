@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 import pandas as pd
-from typing import Dict
+from typing import Dict, Sequence
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib.figure import Figure
@@ -102,7 +102,12 @@ class RetrieverEvaluator(Evaluator):
         driver: SeleniumDriver = None,  # Optional, the driver passed to the retriever
         retriever_name: str = "",
         wait_for_scroll: int = 1,
+        recall_at: Sequence[int] = (),
     ) -> pd.DataFrame:
+        """
+        Without a driver, the retriever gets the HTML of the dataset as is, which should then be annotated with xpaths.
+        `recall_at` adds a `recall@k` column per k, whether the xpath is in the first k retrieved nodes.
+        """
         result_filename = (
             (retriever_name if retriever_name else type(retriever).__name__)
             + "_evaluation_"
@@ -112,6 +117,8 @@ class RetrieverEvaluator(Evaluator):
         results = dataset.loc[dataset["validated"]].copy()
         results.insert(len(results.columns), "result_nodes", None)
         results.insert(len(results.columns), "recall", None)
+        for k in recall_at:
+            results.insert(len(results.columns), f"recall@{k}", None)
         results.insert(len(results.columns), "output_size", None)
         results.insert(len(results.columns), "time", None)
         results["dataset_index"] = results.index
@@ -131,20 +138,25 @@ class RetrieverEvaluator(Evaluator):
                         time.sleep(wait_for_scroll)
                     t_begin = datetime.now()
                     nodes = retriever.retrieve(
-                        QueryBundle(query_str=instruction), [driver.get_html()]
+                        QueryBundle(query_str=instruction),
+                        [driver.get_html() if driver else row["html"]],
                     )
                     t_end = datetime.now()
                 except:
                     print("ERROR: ", i)
                     traceback.print_exc()
                     nodes = []
+                    t_begin = t_end = datetime.now()
                 if driver:
                     driver.destroy()
+                xpath = normalize_xpath(action["args"]["xpath"])
+                for k in recall_at:
+                    results.at[i, f"recall@{k}"] = (
+                        1 if xpath in "\n".join(nodes[:k]) else 0
+                    )
                 nodes = "\n".join(nodes)
                 results.at[i, "result_nodes"] = nodes
-                results.at[i, "recall"] = (
-                    1 if normalize_xpath(action["args"]["xpath"]) in nodes else 0
-                )
+                results.at[i, "recall"] = 1 if xpath in nodes else 0
                 results.at[i, "output_size"] = len(nodes)
                 results.at[i, "time"] = pd.Timedelta(t_end - t_begin).total_seconds()
             print("Evaluation terminated successfully.")
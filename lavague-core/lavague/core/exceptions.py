@@ -29,3 +29,8 @@ class HallucinatedException(RetrievalException):
 class ElementOutOfContextException(RetrievalException):
     def __init__(self, xpath: str, message: str = None):
         super().__init__(message or f"Element exists but was not in context: {xpath}")
+
+
+class RetrievalServiceException(Exception):
+    def __init__(self, message="Retrieval service request failed"):
+        super().__init__(message)
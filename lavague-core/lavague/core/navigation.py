@@ -25,6 +25,8 @@ from PIL import Image
 from llama_index.core.base.llms.base import BaseLLM
 from llama_index.core.embeddings import BaseEmbedding
 from lavague.core.utilities.profiling import time_profiler
+from lavague.core.utilities.context_packing import ContextPacker
+from lavague.core.utilities.instruction_resolver import InstructionResolver
 
 NAVIGATION_ENGINE_PROMPT_TEMPLATE = ActionTemplate(
     """
@@ -90,6 +92,12 @@ class NavigationEngine(BaseEngine):
             Logger to log the actions taken by the agent
         embedding: (`BaseEmbedding`)
             Embedding to use for the retriever
+        context_packer: (`ContextPacker`)
+            Fits the retrieved nodes into the token budget of the prompt.
+            Disabled by default, pass a `ContextPacker` with a `token_budget` to enable it
+        instruction_resolver: (`InstructionResolver`)
+            Emits the action without the LLM when the instruction names the exact text of a single element.
+            Disabled by default, pass `InstructionResolver(driver)` to enable it
     """
 
     def __init__(
@@ -105,6 +113,8 @@ class NavigationEngine(BaseEngine):
         display: bool = False,
         raise_on_error: bool = False,
         embedding: BaseEmbedding = None,
+        context_packer: Optional[ContextPacker] = None,
+        instruction_resolver: Optional[InstructionResolver] = None,
     ):
         if llm is None:
             llm: BaseLLM = get_default_context().llm
@@ -123,6 +133,8 @@ class NavigationEngine(BaseEngine):
         self.display = display
         self.raise_on_error = raise_on_error
         self.shape_validator = JSON_SCHEMA
+        self.context_packer: Optional[ContextPacker] = context_packer
+        self.instruction_resolver: Optional[InstructionResolver] = instruction_resolver
 
     @classmethod
     def from_context(
@@ -156,17 +168,61 @@ class NavigationEngine(BaseEngine):
         """
         viewport_only = not self.driver.previously_scanned
 
-        html = self.driver.get_html()
+        # the reads of the retrievers, e.g. of the possible interactions, are made once
+        with self.driver.step():
+            html = self.driver.get_html()
 
-        with time_profiler("Retriever Inference", html_size=len(html)) as profiler:
-            source_nodes = self.retriever.retrieve(
-                QueryBundle(query_str=query), [html], viewport_only
-            )
+            with time_profiler("Retriever Inference", html_size=len(html)) as profiler:
+                source_nodes = self.retriever.retrieve(
+                    QueryBundle(query_str=query), [html], viewport_only
+                )
 
-            profiler["retrieved_nodes_size"] = sum(len(node) for node in source_nodes)
+                profiler["retrieved_nodes_size"] = sum(
+                    len(node) for node in source_nodes
+                )
+
+        if self.context_packer is not None and self.context_packer.enabled:
+            with time_profiler("Context Packing") as profiler:
+                source_nodes = self.context_packer.pack(source_nodes)
+                profiler.update(self.context_packer.stats)
 
         return source_nodes
 
+    def resolve_instruction(self, instruction: str, context: str) -> Optional[str]:
+        """Action resolved without the LLM by the instruction resolver, None if it falls through"""
+        if self.instruction_resolver is None or not self.instruction_resolver.enabled:
+            return None
+        with time_profiler("Instruction Resolver") as profiler:
+            action = self.instruction_resolver.resolve(instruction, context)
+            profiler.update(self.instruction_resolver.stats)
+        if action is not None:
+            logging_print.debug(
+                f"Instruction resolved without LLM, hit rate {self.instruction_resolver.stats['hit_rate']:.1%}"
+            )
+        return action
+
+    def _complete(self, prompt: str) -> str:
+        """LLM response to the prompt, its duration is reported to the instruction resolver"""
+        start = time.perf_counter()
+        response = self.llm.complete(prompt).text
+        if self.instruction_resolver is not None:
+            self.instruction_resolver.add_llm_time(time.perf_counter() - start)
+        return response
+
+    def _get_attempts(
+        self, instruction: str, context: str, navigation_log: dict
+    ) -> List[Optional[str]]:
+        """
+        Actions to try in turn: the action resolved without the LLM if any, then None for each of the
+        `n_attempts` LLM attempts, so that a failed resolved action does not use up an LLM attempt
+        """
+        resolved_action = self.resolve_instruction(instruction, context)
+        if self.instruction_resolver is not None and self.instruction_resolver.enabled:
+            navigation_log["instruction_resolver"] = self.instruction_resolver.stats
+        return ([resolved_action] if resolved_action is not None else []) + [
+            None
+        ] * self.n_attempts
+
     def add_knowledge(self, knowledge: str):
         self.prompt_template = self.prompt_template + knowledge
 
@@ -174,6 +230,10 @@ class NavigationEngine(BaseEngine):
         """
         Generate the code from a query and a context
         """
+        action = self.resolve_instruction(query, context)
+        if action is not None:
+            return action
+
         authorized_xpaths = extract_xpaths_from_html(context)
 
         prompt = self.prompt_template.format(
@@ -182,7 +242,7 @@ class NavigationEngine(BaseEngine):
             authorized_xpaths=authorized_xpaths,
         )
 
-        response = self.llm.complete(prompt).text
+        response = self._complete(prompt)
         code = self.extractor.extract(response)
         return code
 
@@ -241,8 +301,10 @@ class NavigationEngine(BaseEngine):
             "retrieval_name": self.retriever.__class__.__name__,
         }
 
+        attempts = self._get_attempts(instruction, llm_context, navigation_log)
+
         action_outcomes = []
-        for _ in range(self.n_attempts):
+        for resolved_action in attempts:
             if success:
                 break
             if self.display:
@@ -262,14 +324,19 @@ class NavigationEngine(BaseEngine):
                 query_str=instruction,
                 authorized_xpaths=authorized_xpaths,
             )
-            response = self.llm.complete(prompt).text
+            if resolved_action is not None:
+                response = f"```yaml\n{resolved_action}```"
+                model_name = type(self.instruction_resolver).__name__
+            else:
+                response = self._complete(prompt)
+                model_name = get_model_name(self.llm)
             end = time.time()
             action_generation_time = end - start
             action_outcome = {
                 "llm_raw_response": response,
                 "action_generation_time": action_generation_time,
                 "navigation_engine_full_prompt": prompt,
-                "navigation_engine_llm": get_model_name(self.llm),
+                "navigation_engine_llm": model_name,
             }
 
             try:
@@ -449,8 +516,10 @@ class NavigationEngine(BaseEngine):
             "retrieval_name": self.retriever.__class__.__name__,
         }
 
+        attempts = self._get_attempts(instruction, llm_context, navigation_log)
+
         action_outcomes = []
-        for _ in range(self.n_attempts):
+        for resolved_action in attempts:
             if success:
                 break
             if self.display:
@@ -471,8 +540,16 @@ class NavigationEngine(BaseEngine):
                 authorized_xpaths=authorized_xpaths,
             )
 
-            with time_profiler("Navigation Engine Inference", prompt_size=len(prompt)):
-                response = self.llm.complete(prompt).text
+            # the resolved action is tried first, the LLM takes over if it fails
+            if resolved_action is not None:
+                response = f"```yaml\n{resolved_action}```"
+                model_name = type(self.instruction_resolver).__name__
+            else:
+                with time_profiler(
+                    "Navigation Engine Inference", prompt_size=len(prompt)
+                ):
+                    response = self._complete(prompt)
+                model_name = get_model_name(self.llm)
 
             end = time.time()
             action_generation_time = end - start
@@ -480,7 +557,7 @@ class NavigationEngine(BaseEngine):
                 "llm_raw_response": response,
                 "action_generation_time": action_generation_time,
                 "navigation_engine_full_prompt": prompt,
-                "navigation_engine_llm": get_model_name(self.llm),
+                "navigation_engine_llm": model_name,
             }
 
             try:
@@ -16,10 +16,13 @@ from lavague.core.base_engine import BaseEngine, ActionResult
 
 from llama_index.legacy.readers.file.base import SimpleDirectoryReader
 from llama_index.multi_modal_llms.openai import OpenAIMultiModal
-from llama_index.core import Document, VectorStoreIndex
+from llama_index.core import Document, Settings
+from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.base.llms.base import BaseLLM
 from llama_index.core.embeddings import BaseEmbedding
 from lavague.core.extractors import DynamicExtractor
+from lavague.core.utilities.retrieval_cache import LRUCache, fingerprint
+from lavague.core.utilities.vector_index import VectorIndex, VectorIndexRetriever
 
 DEFAULT_TEMPERATURE = 0.0
 
@@ -73,11 +76,27 @@ class PythonEngine(BaseEngine):
         self.temp_screenshots_path = temp_screenshots_path
         self.n_search_attempts = n_search_attemps
         self.fallback_theshold = fallback_threshold
+        # Vector indexes of the last pages, reused when the page content did not change
+        self.indexes = LRUCache(8)
 
     @classmethod
     def from_context(cls, context: Context, driver: BaseDriver):
         return cls(llm=context.llm, embedding=context.embedding, driver=driver)
 
+    def get_index(self, page_content: str) -> VectorIndex:
+        """Split and embed the page content once per page snapshot"""
+
+        def build_index() -> VectorIndex:
+            nodes = Settings.node_parser.get_nodes_from_documents(
+                [Document(text=page_content)]
+            )
+            return VectorIndex.from_texts(
+                [node.get_content() for node in nodes], self.embedding
+            )
+
+        key = fingerprint(self.embedding.model_name, page_content)
+        return self.indexes.get_or_compute(key, build_index)
+
     def extract_structured_data(self, output: str) -> Optional[dict]:
         extractor = DynamicExtractor()
         return extractor.extract_as_object(output)
@@ -179,10 +198,10 @@ class PythonEngine(BaseEngine):
             self.display_screenshot()
 
         page_content = self.clean_html(html)
-        documents = [Document(text=page_content)]
-
-        index = VectorStoreIndex.from_documents(documents, embed_model=embedding)
-        query_engine = index.as_query_engine(llm=llm)
+        index = self.get_index(page_content)
+        query_engine = RetrieverQueryEngine.from_args(
+            VectorIndexRetriever(index, embedding), llm=llm
+        )
 
         prompt = f"""
         Based on the context provided, you must respond to query with a YAML object in the following format:
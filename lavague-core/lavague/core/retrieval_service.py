@@ -0,0 +1,467 @@
+"""
+Local retrieval service shared by the agents of a host.
+
+A `RetrievalServer` hosts named retriever pipelines, with their caches and BM25 structures, in a single process
+and runs their requests in a thread pool. Agents call them through `RemoteRetriever`, so memory and cache hits
+are shared across agents. Stages depending on the driver (e.g. `InteractiveXPathRetriever`) stay in the agent,
+see `get_remote_retriever`.
+
+On TCP, the service only listens on loopback addresses unless a shared token is set
+(`LAVAGUE_RETRIEVAL_SERVICE_TOKEN`), which clients then send with every request. UNIX sockets are only
+accessible to their owner.
+
+Run the service with `python -m lavague.core.retrieval_service`.
+"""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from llama_index.core import QueryBundle
+from llama_index.core.embeddings import BaseEmbedding
+from lavague.core.base_driver import BaseDriver
+from lavague.core.exceptions import RetrievalServiceException
+from lavague.core.retrievers import (
+    BaseHtmlRetriever,
+    FromXPathNodesExpansionRetriever,
+    InteractiveXPathRetriever,
+    RetrieversPipeline,
+    SemanticRetriever,
+)
+from lavague.core.utilities.retrieval_cache import RetrievalCache
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import logging
+import msgpack
+import os
+import socket
+import stat
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRIEVAL_SERVICE_ADDRESS = os.getenv(
+    "LAVAGUE_RETRIEVAL_SERVICE_ADDRESS",
+    os.path.join(os.path.expanduser("~"), ".cache", "lavague", "retrieval.sock"),
+)
+
+DEFAULT_RETRIEVAL_SERVICE_TOKEN = os.getenv("LAVAGUE_RETRIEVAL_SERVICE_TOKEN")
+
+# Messages are msgpack maps prefixed with their size
+HEADER = struct.Struct(">I")
+
+Address = Union[str, Tuple[str, int]]
+
+
+def parse_address(address: str) -> Address:
+    """`host:port` for TCP, otherwise the path of a UNIX socket"""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and os.sep not in address:
+        return host, int(port)
+    return address
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def encode_message(message: dict) -> bytes:
+    payload = msgpack.packb(message, use_bin_type=True)
+    return HEADER.pack(len(payload)) + payload
+
+
+def decode_message(payload: bytes) -> dict:
+    return msgpack.unpackb(payload, raw=False)
+
+
+def get_service_pipelines(
+    embedding: Optional[BaseEmbedding] = None,
+) -> Dict[str, BaseHtmlRetriever]:
+    """Pipelines hosted by default: the stages of the default retriever that do not need the driver"""
+    cache = RetrievalCache()
+    return {
+        "default": RetrieversPipeline(
+            FromXPathNodesExpansionRetriever(),
+            SemanticRetriever(embedding=embedding, cache=cache),
+            cache=cache,
+        )
+    }
+
+
+class RetrievalServer:
+    """
+    Serve retriever pipelines by name on a UNIX socket, or a TCP port for a `host:port` address.
+    Requests run in a pool of `max_workers` threads sharing the pipelines and their caches.
+    Large pages can further be offloaded to processes with the default `ProcessPool`.
+    When `token` is set, requests without it are rejected and their connection closed.
+    It is required to listen on a TCP address other than a loopback one.
+    """
+
+    def __init__(
+        self,
+        pipelines: Optional[Dict[str, BaseHtmlRetriever]] = None,
+        address: str = DEFAULT_RETRIEVAL_SERVICE_ADDRESS,
+        max_workers: Optional[int] = None,
+        token: Optional[str] = DEFAULT_RETRIEVAL_SERVICE_TOKEN,
+    ):
+        self.pipelines = get_service_pipelines() if pipelines is None else pipelines
+        self.address = parse_address(address)
+        self.token = token
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    def handle(self, request: dict) -> Any:
+        """Result of a request, run in the thread pool"""
+        method = request.get("method")
+        if method == "pipelines":
+            return list(self.pipelines)
+        if method == "stats":
+            return self.stats()
+        pipeline = self.pipelines.get(request.get("pipeline"))
+        if pipeline is None:
+            raise KeyError(f"Unknown pipeline: {request.get('pipeline')}")
+        queries = [QueryBundle(query) for query in request["queries"]]
+        html_chunks = request["html_chunks"]
+        viewport_only = request.get("viewport_only", True)
+        if method == "retrieve":
+            return pipeline.retrieve(queries[0], html_chunks, viewport_only)
+        if method == "retrieve_many":
+            return pipeline.retrieve_many(queries, html_chunks, viewport_only)
+        raise ValueError(f"Unknown method: {method}")
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "caches": {
+                name: {**pipeline.cache.stats(), "final": pipeline.results.stats()}
+                for name, pipeline in self.pipelines.items()
+                if isinstance(pipeline, RetrieversPipeline) and pipeline.cache
+            },
+        }
+
+    async def _serve_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                request = decode_message(
+                    await reader.readexactly(HEADER.unpack(header)[0])
+                )
+                if not self._authorized(request):
+                    logger.warning("Retrieval request rejected: invalid token")
+                    writer.write(encode_message({"error": "Invalid token"}))
+                    await writer.drain()
+                    break
+                self.requests += 1
+                try:
+                    result = await loop.run_in_executor(
+                        self.executor, self.handle, request
+                    )
+                    response = {"result": result}
+                except Exception as e:
+                    logger.exception("Retrieval request failed")
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(encode_message(response))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    def _authorized(self, request: dict) -> bool:
+        if self.token is None:
+            return True
+        token = request.get("token")
+        return isinstance(token, str) and hmac.compare_digest(token, self.token)
+
+    async def close(self):
+        """Stop listening and close the open connections"""
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+    async def start(self) -> asyncio.AbstractServer:
+        if isinstance(self.address, tuple):
+            host, port = self.address
+            if self.token is None and not is_loopback(host):
+                raise RetrievalServiceException(
+                    f"Listening on {host} requires a token, set LAVAGUE_RETRIEVAL_SERVICE_TOKEN"
+                )
+            self._server = await asyncio.start_server(
+                self._serve_connection, host, port
+            )
+        else:
+            # a socket left by a previous server that did not shut down cleanly
+            if os.path.exists(self.address) and stat.S_ISSOCK(
+                os.stat(self.address).st_mode
+            ):
+                os.unlink(self.address)
+            os.makedirs(os.path.dirname(self.address) or ".", exist_ok=True)
+            self._server = await asyncio.start_unix_server(
+                self._serve_connection, self.address
+            )
+            os.chmod(self.address, stat.S_IRUSR | stat.S_IWUSR)
+        return self._server
+
+    async def serve_forever(self):
+        server = await self.start()
+        logger.info(f"Retrieval service listening on {self.address}")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        asyncio.run(self.serve_forever())
+
+    def start_in_thread(self) -> "RetrievalServer":
+        """Serve from a daemon thread, e.g. next to the agents of the same process, until `stop`"""
+        started = threading.Event()
+        errors = []
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.start())
+            except Exception as e:
+                errors.append(e)
+                return
+            finally:
+                started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            self._loop.close()
+            self._loop = None
+            raise errors[0]
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.executor.shutdown(wait=False)
+
+
+class RemoteRetriever(BaseHtmlRetriever):
+    """
+    Thin client of a pipeline hosted by a `RetrievalServer`. Each thread keeps its own connection,
+    asynchronous calls open one per call. Errors of the service raise `RetrievalServiceException`.
+    A request is sent again on a new connection only if it could not be sent, so that it never runs twice.
+    """
+
+    def __init__(
+        self,
+        pipeline: str = "default",
+        address: str = DEFAULT_RETRIEVAL_SERVICE_ADDRESS,
+        timeout: Optional[float] = 120,
+        token: Optional[str] = DEFAULT_RETRIEVAL_SERVICE_TOKEN,
+    ):
+        self.pipeline = pipeline
+        self.address = parse_address(address)
+        self.timeout = timeout
+        self.token = token
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        if isinstance(self.address, tuple):
+            connection = socket.create_connection(self.address, self.timeout)
+        else:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            connection.connect(self.address)
+        return connection
+
+    @staticmethod
+    def _receive(connection: socket.socket, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            received = connection.recv(min(size - len(data), 1 << 20))
+            if not received:
+                raise ConnectionError("Retrieval service closed the connection")
+            data += received
+        return bytes(data)
+
+    def _is_closed(self, connection: socket.socket) -> bool:
+        """Whether the service closed an idle connection, e.g. because it restarted"""
+        connection.setblocking(False)
+        try:
+            return connection.recv(1, socket.MSG_PEEK) == b""
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        finally:
+            connection.settimeout(self.timeout)
+
+    def _get_connection(self) -> socket.socket:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._is_closed(connection):
+            self.close()
+            connection = None
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _message(self, method: str, **kwargs) -> bytes:
+        message = {"method": method, "pipeline": self.pipeline, **kwargs}
+        if self.token is not None:
+            message["token"] = self.token
+        return encode_message(message)
+
+    def call(self, method: str, **kwargs) -> Any:
+        message = self._message(method, **kwargs)
+        connection = self._get_connection()
+        try:
+            connection.sendall(message)
+        except OSError:
+            # the service only runs complete messages, the request can be sent again
+            self.close()
+            connection = self._get_connection()
+            connection.sendall(message)
+        try:
+            header = self._receive(connection, HEADER.size)
+            response = decode_message(
+                self._receive(connection, HEADER.unpack(header)[0])
+            )
+        except OSError:
+            # the request may have run, it is not sent again
+            self.close()
+            raise
+        return self._result(response)
+
+    async def acall(self, method: str, **kwargs) -> Any:
+        if isinstance(self.address, tuple):
+            reader, writer = await asyncio.open_connection(*self.address)
+        else:
+            reader, writer = await asyncio.open_unix_connection(self.address)
+        try:
+            writer.write(self._message(method, **kwargs))
+            await writer.drain()
+            header = await reader.readexactly(HEADER.size)
+            response = decode_message(
+                await reader.readexactly(HEADER.unpack(header)[0])
+            )
+        finally:
+            writer.close()
+        return self._result(response)
+
+    @staticmethod
+    def _result(response: dict) -> Any:
+        if "error" in response:
+            raise RetrievalServiceException(response["error"])
+        return response["result"]
+
+    def retrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        return self.call(
+            "retrieve",
+            queries=[query.query_str],
+            html_chunks=list(html_nodes),
+            viewport_only=viewport_only,
+        )
+
+    def retrieve_many(
+        self, queries: List[QueryBundle], html_nodes: List[str], viewport_only=True
+    ) -> List[List[str]]:
+        if not queries:
+            return []
+        return self.call(
+            "retrieve_many",
+            queries=[query.query_str for query in queries],
+            html_chunks=list(html_nodes),
+            viewport_only=viewport_only,
+        )
+
+    async def aretrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        return await self.acall(
+            "retrieve",
+            queries=[query.query_str],
+            html_chunks=list(html_nodes),
+            viewport_only=viewport_only,
+        )
+
+    def stats(self) -> dict:
+        return self.call("stats")
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def get_remote_retriever(
+    driver: BaseDriver,
+    pipeline: str = "default",
+    address: str = DEFAULT_RETRIEVAL_SERVICE_ADDRESS,
+) -> BaseHtmlRetriever:
+    """Same as the default retriever, with the stages after the driver ones run by the retrieval service"""
+    return RetrieversPipeline(
+        InteractiveXPathRetriever(driver, backend="table"),
+        RemoteRetriever(pipeline, address),
+    )
+
+
+if __name__ == "__main__":
+    from lavague.core.utilities.process_pool import (
+        ProcessPool,
+        set_default_process_pool,
+    )
+
+    parser = argparse.ArgumentParser(description="Local LaVague retrieval service")
+    parser.add_argument(
+        "--address",
+        default=DEFAULT_RETRIEVAL_SERVICE_ADDRESS,
+        help="Path of the UNIX socket, or host:port to listen on TCP",
+    )
+    parser.add_argument(
+        "--token",
+        default=DEFAULT_RETRIEVAL_SERVICE_TOKEN,
+        help="Token clients must send, required to listen on a non-loopback TCP address",
+    )
+    parser.add_argument(
+        "--threads", type=int, default=None, help="Threads serving requests"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Processes to offload large pages to, 0 to process them in the threads",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.workers > 0:
+        set_default_process_pool(ProcessPool(max_workers=args.workers))
+    RetrievalServer(
+        address=args.address, max_workers=args.threads, token=args.token
+    ).run()
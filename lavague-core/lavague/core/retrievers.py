@@ -1,27 +1,68 @@
 from __future__ import annotations
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from abc import ABC, abstractmethod
 from bs4 import BeautifulSoup, NavigableString
-from llama_index.retrievers.bm25 import BM25Retriever
-from llama_index.core import Document, VectorStoreIndex, QueryBundle
+from llama_index.core import QueryBundle, Settings
 from llama_index.core.schema import NodeWithScore, TextNode
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from llama_index.core.node_parser import LangchainNodeParser
 from llama_index.core.embeddings import BaseEmbedding
 from lavague.core.extractors import extract_xpaths_from_html
-from lavague.core.base_driver import BaseDriver, PossibleInteractionsByXpath
+from lavague.core.base_driver import (
+    BaseDriver,
+    PossibleInteractionsByXpath,
+    RectsByXpath,
+)
 from lavague.core.utilities.format_utils import clean_html
+from lavague.core.utilities.xpath_utils import XPathAnnotator
+from lavague.core.utilities.adaptive_cutoff import AdaptiveCutoff
+from lavague.core.utilities.profiling import add_profiling_data
+from lavague.core.utilities.bm25 import BM25Index, get_default_bm25_index, tokenize
+from lavague.core.utilities.boilerplate_index import (
+    BoilerplateIndex,
+    chunk_fingerprint,
+    get_default_boilerplate_index,
+)
+from lavague.core.utilities.candidate_ranker import (
+    CandidateRanker,
+    Candidates,
+    get_default_candidate_ranker,
+)
+from lavague.core.utilities.dom_index import expand_xpath_chunks
+from lavague.core.utilities.html_chunker import HtmlChunker, HtmlElements
+from lavague.core.utilities.hashing_embedding import HashingEmbedding
+from lavague.core.utilities.html_sanitizer import HtmlSanitizer
+from lavague.core.utilities.parsed_page import ParsedPage
+from lavague.core.utilities.process_pool import ProcessPool, get_default_process_pool
+from lavague.core.utilities.vector_index import VectorIndex, get_query_embeddings
+from lavague.core.utilities.retrieval_cache import (
+    LRUCache,
+    RetrievalCache,
+    fingerprint,
+    fingerprint_chunks,
+)
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import asyncio
+import contextvars
+import logging
 import re
 import ast
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 
 def get_default_retriever(
-    driver: BaseDriver, embedding: Optional[BaseEmbedding] = None
+    driver: BaseDriver,
+    embedding: Optional[BaseEmbedding] = None,
+    cache: Optional[RetrievalCache] = None,
 ) -> BaseHtmlRetriever:
+    cache = cache or RetrievalCache()
     return RetrieversPipeline(
-        InteractiveXPathRetriever(driver),
+        InteractiveXPathRetriever(driver, backend="table"),
         FromXPathNodesExpansionRetriever(),
-        SemanticRetriever(embedding=embedding),
+        SemanticRetriever(embedding=embedding, cache=cache),
+        cache=cache,
     )
 
 
@@ -32,6 +73,9 @@ def get_trivial_retriever(
 
 
 class BaseHtmlRetriever(ABC):
+    # True when the output does not depend on the query, so it is computed once for several queries
+    query_independent: bool = False
+
     @abstractmethod
     def retrieve(
         self, query: QueryBundle, html_nodes: List[str], viewport_only=True
@@ -41,33 +85,490 @@ class BaseHtmlRetriever(ABC):
         """
         pass
 
+    def get_cache_key(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> Optional[str]:
+        """
+        Key identifying the output of `retrieve` for these arguments, used by `RetrievalCache`.
+        None (the default) means the output cannot be cached, e.g. because it depends on the driver state.
+        """
+        return None
+
+    def get_state_key(self, html_nodes: List[str], viewport_only=True) -> Optional[str]:
+        """
+        Fingerprint of the state the output depends on besides the query and the HTML, e.g. the possible
+        interactions given by the driver, used by `RetrieversPipeline` to memoize its final results.
+        "" when there is none, None when it cannot be fingerprinted. By default, retrievers exposing
+        a cache key depend on no other state.
+        """
+        if type(self).get_cache_key is BaseHtmlRetriever.get_cache_key:
+            return None
+        return ""
+
+    async def aget_state_key(
+        self, html_nodes: List[str], viewport_only=True
+    ) -> Optional[str]:
+        """Asynchronous `get_state_key`, retrievers reading the driver override it"""
+        return self.get_state_key(html_nodes, viewport_only)
+
+    def retrieve_page(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
+    ) -> Union[ParsedPage, List[str]]:
+        """
+        Retrieve from a page shared by the stages of a pipeline. Retrievers working on the parsed tree
+        override this method, the default implementation calls `retrieve` with the HTML chunks of the page.
+        """
+        return self.retrieve(query, page.chunks, viewport_only)
+
+    def retrieve_many(
+        self, queries: List[QueryBundle], html_nodes: List[str], viewport_only=True
+    ) -> List[List[str]]:
+        """
+        Results of several queries on the same HTML, one list of chunks per query.
+        Retrievers override it to build their page-side structures once, the default implementation
+        calls `retrieve` once per query, or once for all of them if the retriever is query independent.
+        """
+        if not queries:
+            return []
+        if self.query_independent:
+            return [self.retrieve(queries[0], html_nodes, viewport_only)] * len(queries)
+        return [self.retrieve(query, html_nodes, viewport_only) for query in queries]
+
+    def retrieve_page_many(
+        self, queries: List[QueryBundle], page: ParsedPage, viewport_only=True
+    ) -> List[Union[ParsedPage, List[str]]]:
+        """Same as `retrieve_many` for a page shared by the stages of a pipeline"""
+        if not queries:
+            return []
+        if self.query_independent:
+            return [self.retrieve_page(queries[0], page, viewport_only)] * len(queries)
+        if type(self).retrieve_page is not BaseHtmlRetriever.retrieve_page:
+            return [self.retrieve_page(query, page, viewport_only) for query in queries]
+        return self.retrieve_many(queries, page.chunks, viewport_only)
+
+    async def aretrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        """
+        Asynchronous `retrieve`. Retrievers waiting on I/O (driver, embedding or reranking APIs) override it,
+        the default implementation runs `retrieve` in a worker thread so that the event loop is not blocked.
+        """
+        return await asyncio.to_thread(self.retrieve, query, html_nodes, viewport_only)
+
+    async def aretrieve_page(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
+    ) -> Union[ParsedPage, List[str]]:
+        """
+        Asynchronous `retrieve_page`. Awaits `aretrieve` with the HTML chunks of the page,
+        unless `retrieve_page` is overridden without an asynchronous counterpart, then it runs in a worker thread.
+        """
+        if type(self).retrieve_page is not BaseHtmlRetriever.retrieve_page:
+            return await asyncio.to_thread(
+                self.retrieve_page, query, page, viewport_only
+            )
+        return await self.aretrieve(query, page.chunks, viewport_only)
+
 
 class RetrieversPipeline(BaseHtmlRetriever):
-    """Executor for retrievers pipeline"""
+    """
+    Executor for retrievers pipeline.
+    Stages exchange a `ParsedPage` so that the page is parsed at most once per step.
+    When a `RetrievalCache` is provided, the output of every retriever exposing a cache key is memoized,
+    and so are the final results, by page hash, query and viewport flag (see `get_results_key`).
+    """
 
     retrievers: Tuple[BaseHtmlRetriever]
+    cache: Optional[RetrievalCache]
 
-    def __init__(self, *retrievers: BaseHtmlRetriever):
+    def __init__(
+        self,
+        *retrievers: BaseHtmlRetriever,
+        cache: Optional[RetrievalCache] = None,
+        max_results: int = 64,
+    ):
         self.retrievers = retrievers
+        self.cache = cache
+        self.results = LRUCache(max_results)
+
+    def get_state_key(self, html_nodes: List[str], viewport_only=True) -> Optional[str]:
+        states = [
+            retriever.get_state_key(html_nodes, viewport_only)
+            for retriever in self.retrievers
+        ]
+        return None if None in states else fingerprint(*states)
+
+    async def aget_state_key(
+        self, html_nodes: List[str], viewport_only=True
+    ) -> Optional[str]:
+        states = [
+            await retriever.aget_state_key(html_nodes, viewport_only)
+            for retriever in self.retrievers
+        ]
+        return None if None in states else fingerprint(*states)
+
+    def get_results_keys(
+        self, queries: List[QueryBundle], page: ParsedPage, viewport_only=True
+    ) -> List[Optional[str]]:
+        """
+        Keys of the final results of the queries: the page hash, the query and the viewport flag,
+        with the state the stages depend on. None without cache or if a stage state cannot be fingerprinted.
+        """
+        if self.cache is None or not queries:
+            return [None] * len(queries)
+        state = self.get_state_key(page.chunks, viewport_only)
+        return self._results_keys(queries, page, viewport_only, state)
+
+    def _results_keys(
+        self,
+        queries: List[QueryBundle],
+        page: ParsedPage,
+        viewport_only: bool,
+        state: Optional[str],
+    ) -> List[Optional[str]]:
+        if state is None:
+            return [None] * len(queries)
+        page_key = fingerprint_chunks(page.chunks)
+        return [
+            fingerprint(page_key, query.query_str, str(viewport_only), state)
+            for query in queries
+        ]
+
+    def get_results_key(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
+    ) -> Optional[str]:
+        return self.get_results_keys([query], page, viewport_only)[0]
 
     def retrieve(
         self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        return self.retrieve_page(query, ParsedPage(html_nodes), viewport_only)
+
+    def retrieve_page(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
+    ) -> List[str]:
+        key = self.get_results_key(query, page, viewport_only)
+        if key is None:
+            return self._retrieve_page(query, page, viewport_only)
+        results = self.results.get_or_compute(
+            key, lambda: tuple(self._retrieve_page(query, page, viewport_only))
+        )
+        return list(results)
+
+    def _retrieve_page(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
+    ) -> List[str]:
+        for retriever in self.retrievers:
+            if self.cache is None:
+                result = retriever.retrieve_page(query, page, viewport_only)
+            else:
+                result = self.cache.retrieve_page(retriever, query, page, viewport_only)
+            page = result if isinstance(result, ParsedPage) else ParsedPage(result)
+        return page.chunks
+
+    async def aretrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        return await self.aretrieve_page(query, ParsedPage(html_nodes), viewport_only)
+
+    def retrieve_many(
+        self, queries: List[QueryBundle], html_nodes: List[str], viewport_only=True
+    ) -> List[List[str]]:
+        return self.retrieve_page_many(queries, ParsedPage(html_nodes), viewport_only)
+
+    def retrieve_page_many(
+        self, queries: List[QueryBundle], page: ParsedPage, viewport_only=True
+    ) -> List[List[str]]:
+        """
+        Run the stages once per group of queries sharing the same input: query independent stages
+        run once for all queries, and queries are grouped again whenever a stage gives them the same output.
+        Only the queries whose final results are not memoized are run.
+        """
+        keys = self.get_results_keys(queries, page, viewport_only)
+        results = [None if key is None else self.results.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            computed = self._retrieve_page_many(
+                [queries[i] for i in missing], page, viewport_only
+            )
+            for i, result in zip(missing, computed):
+                results[i] = tuple(result)
+                if keys[i] is not None:
+                    self.results.put(keys[i], results[i])
+        return [list(result) for result in results]
+
+    def _retrieve_page_many(
+        self, queries: List[QueryBundle], page: ParsedPage, viewport_only=True
+    ) -> List[List[str]]:
+        # (indices of the queries, input of the stage)
+        groups = [(list(range(len(queries))), page)] if queries else []
+        for retriever in self.retrievers:
+            outputs = {}
+            for indices, page in groups:
+                group_queries = [queries[i] for i in indices]
+                if self.cache is None:
+                    results = retriever.retrieve_page_many(
+                        group_queries, page, viewport_only
+                    )
+                else:
+                    results = self.cache.retrieve_page_many(
+                        retriever, group_queries, page, viewport_only
+                    )
+                for i, result in zip(indices, results):
+                    if isinstance(result, ParsedPage):
+                        key = id(result)
+                    else:
+                        key = tuple(result)
+                        result = ParsedPage(result)
+                    outputs.setdefault(key, ([], result))[0].append(i)
+            groups = list(outputs.values())
+        results = [None] * len(queries)
+        for indices, page in groups:
+            for i in indices:
+                results[i] = page.chunks
+        return results
+
+    async def aretrieve_page(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
+    ) -> List[str]:
+        key = None
+        if self.cache is not None:
+            state = await self.aget_state_key(page.chunks, viewport_only)
+            key = self._results_keys([query], page, viewport_only, state)[0]
+        if key is None:
+            return await self._aretrieve_page(query, page, viewport_only)
+        results = self.results.get(key)
+        if results is None:
+            results = tuple(await self._aretrieve_page(query, page, viewport_only))
+            self.results.put(key, results)
+        return list(results)
+
+    async def _aretrieve_page(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
     ) -> List[str]:
         for retriever in self.retrievers:
-            html_nodes = retriever.retrieve(query, html_nodes, viewport_only)
-        return html_nodes
+            if self.cache is None:
+                result = await retriever.aretrieve_page(query, page, viewport_only)
+            else:
+                result = await self.cache.aretrieve_page(
+                    retriever, query, page, viewport_only
+                )
+            page = result if isinstance(result, ParsedPage) else ParsedPage(result)
+        return page.chunks
+
+
+class ParallelRetrievers(BaseHtmlRetriever):
+    """
+    Pipeline stage running several retrievers on the same input in a thread pool and fusing their ranked outputs.
+
+    - `fusion`: "rrf" for reciprocal rank fusion, each member adding `weight / (rrf_k + rank)` to a chunk,
+    or "weighted" where each member adds `weight * (1 - rank / len(results))`.
+    - `weights`: weight of each member, 1 by default.
+    - `timeouts`: time in seconds after which the results of a member are ignored, either for all members or one per member.
+    Members that time out or fail are skipped, so the step takes as long as the slowest member within its timeout.
+    - `top_k`: number of fused chunks passed downstream, all of them by default.
+    """
+
+    def __init__(
+        self,
+        *retrievers: BaseHtmlRetriever,
+        weights: Optional[List[float]] = None,
+        timeouts: Union[None, float, List[Optional[float]]] = None,
+        fusion: str = "rrf",
+        rrf_k: int = 60,
+        top_k: Optional[int] = None,
+        cache: Optional[RetrievalCache] = None,
+    ):
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"Unknown fusion method: {fusion}")
+        if timeouts is None or isinstance(timeouts, (int, float)):
+            timeouts = [timeouts] * len(retrievers)
+        weights = weights or [1.0] * len(retrievers)
+        if len(weights) != len(retrievers) or len(timeouts) != len(retrievers):
+            raise ValueError("There must be one weight and one timeout per retriever")
+        self.retrievers = retrievers
+        self.weights = weights
+        self.timeouts = timeouts
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.top_k = top_k
+        self.cache = cache
+
+    def _retrieve_member(
+        self,
+        retriever: BaseHtmlRetriever,
+        query: QueryBundle,
+        html_nodes: List[str],
+        viewport_only: bool,
+    ) -> List[str]:
+        if self.cache is None:
+            return retriever.retrieve(query, html_nodes, viewport_only)
+        return self.cache.retrieve(retriever, query, html_nodes, viewport_only)
+
+    def retrieve_all(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[Optional[List[str]]]:
+        """Results of every member, None for the members that timed out or failed"""
+        return self._run_members(
+            lambda retriever: self._retrieve_member(
+                retriever, query, html_nodes, viewport_only
+            )
+        )
+
+    def _run_members(self, run: Callable[[BaseHtmlRetriever], Any]) -> List[Any]:
+        """
+        Call `run` on every member in the thread pool, None for the members that timed out or failed.
+        Members run in copies of the caller's context, so that they report to its profiling records.
+        """
+        executor = ThreadPoolExecutor(max_workers=max(len(self.retrievers), 1))
+        start = time.monotonic()
+        futures = [
+            executor.submit(contextvars.copy_context().run, run, retriever)
+            for retriever in self.retrievers
+        ]
+        results = []
+        for retriever, future, timeout in zip(self.retrievers, futures, self.timeouts):
+            remaining = (
+                None if timeout is None else max(start + timeout - time.monotonic(), 0)
+            )
+            try:
+                results.append(future.result(timeout=remaining))
+            except FutureTimeoutError:
+                logger.warning(
+                    f"{type(retriever).__name__} timed out after {timeout}s, its results are ignored"
+                )
+                results.append(None)
+            except Exception as e:
+                logger.warning(
+                    f"{type(retriever).__name__} failed, its results are ignored: {e}"
+                )
+                results.append(None)
+        # Members still running are left to finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    async def aretrieve_all(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[Optional[List[str]]]:
+        """Same as `retrieve_all` with members awaited concurrently on the event loop"""
+
+        async def retrieve_member(retriever: BaseHtmlRetriever, timeout):
+            if self.cache is None:
+                results = retriever.aretrieve(query, html_nodes, viewport_only)
+            else:
+                results = self.cache.aretrieve(
+                    retriever, query, html_nodes, viewport_only
+                )
+            try:
+                return await asyncio.wait_for(results, timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"{type(retriever).__name__} timed out after {timeout}s, its results are ignored"
+                )
+            except Exception as e:
+                logger.warning(
+                    f"{type(retriever).__name__} failed, its results are ignored: {e}"
+                )
+            return None
+
+        return list(
+            await asyncio.gather(
+                *[
+                    retrieve_member(retriever, timeout)
+                    for retriever, timeout in zip(self.retrievers, self.timeouts)
+                ]
+            )
+        )
+
+    def retrieve_many(
+        self, queries: List[QueryBundle], html_nodes: List[str], viewport_only=True
+    ) -> List[List[str]]:
+        """Members run their own `retrieve_many` in parallel, results are fused per query"""
+        if not queries:
+            return []
+
+        def retrieve_member(retriever: BaseHtmlRetriever) -> List[List[str]]:
+            if self.cache is None:
+                return retriever.retrieve_many(queries, html_nodes, viewport_only)
+            return self.cache.retrieve_many(
+                retriever, queries, html_nodes, viewport_only
+            )
+
+        results = self._run_members(retrieve_member)
+        return [
+            self.fuse(
+                [
+                    None if member_results is None else member_results[i]
+                    for member_results in results
+                ]
+            )
+            for i in range(len(queries))
+        ]
+
+    def get_state_key(self, html_nodes: List[str], viewport_only=True) -> Optional[str]:
+        # the fused results depend on the members within their timeouts
+        if any(timeout is not None for timeout in self.timeouts):
+            return None
+        states = [
+            retriever.get_state_key(html_nodes, viewport_only)
+            for retriever in self.retrievers
+        ]
+        return None if None in states else fingerprint(*states)
+
+    async def aget_state_key(
+        self, html_nodes: List[str], viewport_only=True
+    ) -> Optional[str]:
+        if any(timeout is not None for timeout in self.timeouts):
+            return None
+        states = [
+            await retriever.aget_state_key(html_nodes, viewport_only)
+            for retriever in self.retrievers
+        ]
+        return None if None in states else fingerprint(*states)
+
+    def fuse(self, results: List[Optional[List[str]]]) -> List[str]:
+        scores = {}
+        for member_results, weight in zip(results, self.weights):
+            for rank, chunk in enumerate(member_results or []):
+                if self.fusion == "rrf":
+                    score = weight / (self.rrf_k + rank + 1)
+                else:
+                    score = weight * (1 - rank / len(member_results))
+                scores[chunk] = scores.get(chunk, 0) + score
+        fused = sorted(scores, key=scores.get, reverse=True)
+        return fused if self.top_k is None else fused[: self.top_k]
+
+    def retrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        return self.fuse(self.retrieve_all(query, html_nodes, viewport_only))
+
+    async def aretrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        return self.fuse(await self.aretrieve_all(query, html_nodes, viewport_only))
 
 
 class UniqueXPathRetriever(BaseHtmlRetriever):
-    """Retriever that removes rendudancy when elements have the same bounding box"""
+    """
+    Retriever that removes rendudancy when elements have the same bounding box.
+    With `offline`, boxes are not measured in the browser but taken from the rects captured
+    with the possible interactions (see `BaseDriver.get_interaction_rects`), and elements without a rect are kept.
+    It falls back to the browser when the driver has no rects.
+    """
 
-    def __init__(self, driver: BaseDriver) -> None:
+    query_independent = True
+
+    def __init__(self, driver: BaseDriver, offline: bool = False) -> None:
         self.driver = driver
+        self.offline = offline
 
     def retrieve(
         self, query: QueryBundle, html_nodes: List[str], viewport_only=True
     ) -> List[str]:
         html = merge_html_chunks(html_nodes)
+        rects = self.driver.get_interaction_rects() if self.offline else None
+        if rects is not None:
+            return self._retrieve_offline(html, rects)
         xpaths = extract_xpaths_from_html(html)
 
         js_function = """
@@ -101,51 +602,384 @@ class UniqueXPathRetriever(BaseHtmlRetriever):
 
         return html_chunks
 
+    def _retrieve_offline(self, html: str, rects: RectsByXpath) -> List[str]:
+        """Outer HTML of the first element of each bounding box, in document order"""
+        elements = HtmlElements(html)
+        first_elements: Dict[str, int] = {}
+        for element, xpath in zip(elements.marked_elements, elements.marked_xpaths):
+            first_elements.setdefault(xpath, element)
+        xpaths = list(first_elements)
+        boxes = np.array(
+            [rects.get(xpath, (np.nan,) * 4) for xpath in xpaths], dtype=float
+        ).reshape(-1, 4)
+        has_box = ~np.isnan(boxes).any(axis=1)
+        _, first_boxes = np.unique(boxes[has_box], axis=0, return_index=True)
+        kept = np.sort(
+            np.concatenate(
+                [np.flatnonzero(~has_box), np.flatnonzero(has_box)[first_boxes]]
+            )
+        )
+        return [
+            html[elements.start[element] : elements.end[element]]
+            for element in (first_elements[xpaths[i]] for i in kept)
+        ]
+
 
 class BM25HtmlRetriever(BaseHtmlRetriever):
-    """Mainly for benchmarks, do not use it as the performances are not up to par with the other retrievers"""
+    """
+    Mainly for benchmarks, do not use it as the performances are not up to par with the other retrievers.
+    With a `cutoff`, fewer than `top_k` chunks are returned when the best ones clearly dominate, see `AdaptiveCutoff`.
+    """
 
-    def __init__(self, top_k=10, xpathed_only=True) -> None:
+    def __init__(
+        self,
+        top_k=10,
+        xpathed_only=True,
+        bm25_index: Optional[BM25Index] = None,
+        chunker: Optional[HtmlChunker] = None,
+        process_pool: Optional[ProcessPool] = None,
+        cutoff: Optional[AdaptiveCutoff] = None,
+    ) -> None:
         self.top_k = top_k
         self.xpathed_only = xpathed_only
+        self.bm25_index = bm25_index or get_default_bm25_index()
+        self.chunker = chunker or HtmlChunker()
+        self.process_pool = process_pool
+        self.cutoff = cutoff
 
     def retrieve(
         self, query: QueryBundle, html_chunks: List[str], viewport_only=True
     ) -> List[str]:
-        splitter = LangchainNodeParser(
-            lc_splitter=RecursiveCharacterTextSplitter.from_language(
-                language="html",
-            )
+        results = _bm25_retrieve(
+            merge_html_chunks(html_chunks),
+            query.query_str,
+            self.chunker,
+            self.xpathed_only,
+            self.top_k if self.cutoff is None else self.cutoff.get_max_k(self.top_k),
+            self.bm25_index,
+            self.process_pool,
         )
-        nodes = splitter.get_nodes_from_documents(
-            [Document(text=merge_html_chunks(html_chunks))]
+        return _cut(self, self.cutoff, results)
+
+    def get_cache_key(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> Optional[str]:
+        return fingerprint(
+            type(self).__name__,
+            str(self.top_k),
+            str(self.xpathed_only),
+            str(self.chunker.chunk_size),
+            repr(self.cutoff),
+            query.query_str,
+            fingerprint_chunks(html_chunks),
         )
 
-        if self.xpathed_only:
-            nodes = filter_for_xpathed_nodes(nodes)
 
-        retriever = BM25Retriever.from_defaults(
-            nodes=nodes, similarity_top_k=self.top_k
+class CandidateRankerRetriever(BaseHtmlRetriever):
+    """
+    Fast pre-filter keeping the `top_k` interactive elements (annotated with an xpath) best ranked by a
+    `CandidateRanker`, best first. Runs on CPU without any network call, place it after `InteractiveXPathRetriever`
+    to narrow the candidates of the next stages. With a `driver`, the rects of the last possible interactions
+    are used as position and size features, see `BaseDriver.get_interaction_rects`.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 30,
+        ranker: Optional[CandidateRanker] = None,
+        driver: Optional[BaseDriver] = None,
+    ):
+        self.top_k = top_k
+        self.ranker = ranker or get_default_candidate_ranker()
+        self.driver = driver
+
+    def get_candidates(self, html_chunks: List[str]) -> Candidates:
+        rects = self.driver.get_interaction_rects() if self.driver else None
+        return Candidates(merge_html_chunks(html_chunks), rects)
+
+    def retrieve(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> List[str]:
+        candidates = self.get_candidates(html_chunks)
+        return [
+            candidates.html[i]
+            for i in self.ranker.rank(query.query_str, candidates, self.top_k)
+        ]
+
+    def retrieve_many(
+        self, queries: List[QueryBundle], html_chunks: List[str], viewport_only=True
+    ) -> List[List[str]]:
+        candidates = self.get_candidates(html_chunks)
+        return [
+            [
+                candidates.html[i]
+                for i in self.ranker.rank(query.query_str, candidates, self.top_k)
+            ]
+            for query in queries
+        ]
+
+    def get_cache_key(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> Optional[str]:
+        if self.driver is not None:
+            return None
+        return fingerprint(
+            type(self).__name__,
+            str(self.top_k),
+            repr(self.ranker),
+            query.query_str,
+            fingerprint_chunks(html_chunks),
         )
 
-        nodes = retriever.retrieve(query)
-        return get_nodes_text(nodes)
+    def get_state_key(self, html_nodes: List[str], viewport_only=True) -> Optional[str]:
+        # rects of the driver
+        return None if self.driver is not None else ""
 
 
 class InteractiveXPathRetriever(BaseHtmlRetriever):
-    def __init__(self, driver: BaseDriver):
+    """
+    Retriever that annotates interactive elements of the page with their xpath.
+    `backend` selects the HTML parser used for annotation, see `XPathAnnotator`.
+
+    Large pages are annotated in `process_pool` (the default one if None, see `ProcessPool`), their frames
+    being captured beforehand with `BaseDriver.get_frames_html`. Pages with frames that cannot be captured
+    are annotated inline. With the `html.parser` backend, `retrieve_page` then returns HTML instead of a soup.
+    """
+
+    query_independent = True
+
+    def __init__(
+        self,
+        driver: BaseDriver,
+        backend: str = "html.parser",
+        process_pool: Optional[ProcessPool] = None,
+    ):
         self.driver = driver
+        self.annotator = XPathAnnotator(backend)
+        self.process_pool = process_pool
+        # driver reads of `get_state_key`, handed to the retrieval that follows on the same input
+        self._state_reads: Optional[tuple] = None
+
+    def _get_process_pool(self, size: int) -> Optional[ProcessPool]:
+        """Pool to annotate a page of `size` characters in, None to annotate it inline"""
+        process_pool = self.process_pool or get_default_process_pool()
+        if process_pool is not None and process_pool.offloads(size):
+            return process_pool
+        return None
+
+    def _get_frames_html(self, html: str) -> Dict[str, str]:
+        return (self.driver.get_frames_html() or {}) if IFRAME_TAG.search(html) else {}
+
+    def get_state_key(self, html_nodes: List[str], viewport_only=True) -> Optional[str]:
+        """Fingerprint of the possible interactions and of the frames, None if the frames cannot be captured"""
+        possible_interactions = self.driver.get_possible_interactions(
+            in_viewport=viewport_only
+        )
+        frames_html = {}
+        if IFRAME_TAG.search(merge_html_chunks(html_nodes)):
+            frames_html = self.driver.get_frames_html()
+        return self._state_key(
+            html_nodes, viewport_only, possible_interactions, frames_html
+        )
+
+    async def aget_state_key(
+        self, html_nodes: List[str], viewport_only=True
+    ) -> Optional[str]:
+        possible_interactions = await self.driver.aget_possible_interactions(
+            in_viewport=viewport_only
+        )
+        frames_html = {}
+        if IFRAME_TAG.search(merge_html_chunks(html_nodes)):
+            frames_html = await self.driver.aget_frames_html()
+        return self._state_key(
+            html_nodes, viewport_only, possible_interactions, frames_html
+        )
+
+    def _state_key(
+        self,
+        html_nodes: List[str],
+        viewport_only: bool,
+        possible_interactions: PossibleInteractionsByXpath,
+        frames_html: Optional[Dict[str, str]],
+    ) -> Optional[str]:
+        self._state_reads = (
+            html_nodes,
+            viewport_only,
+            possible_interactions,
+            frames_html,
+        )
+        if frames_html is None:
+            return None
+        return fingerprint(
+            self.annotator.backend,
+            repr(
+                sorted(
+                    (xpath, sorted(str(i) for i in interactions))
+                    for xpath, interactions in possible_interactions.items()
+                )
+            ),
+            *[fingerprint(xpath, html) for xpath, html in sorted(frames_html.items())],
+        )
+
+    def _take_state_reads(
+        self, html_nodes: Optional[List[str]], viewport_only: bool
+    ) -> Optional[tuple]:
+        """(possible interactions, frames HTML) read by `get_state_key` on the same input, None otherwise"""
+        reads, self._state_reads = self._state_reads, None
+        if reads is None or reads[0] is not html_nodes or reads[1] != viewport_only:
+            return None
+        return reads[2:]
+
+    async def _aget_frames_html(self, html: str) -> Dict[str, str]:
+        if IFRAME_TAG.search(html):
+            return await self.driver.aget_frames_html() or {}
+        return {}
+
+    def _offload_args(
+        self,
+        filter_by_possible_interactions: Optional[PossibleInteractionsByXpath],
+        xpath_prefix: str,
+        frames_html: Dict[str, str],
+        serialize: bool,
+    ) -> tuple:
+        xpaths = (
+            None
+            if filter_by_possible_interactions is None
+            else frozenset(filter_by_possible_interactions)
+        )
+        return (self.annotator.backend, xpaths, xpath_prefix, frames_html, serialize)
 
     def retrieve(
         self, query: QueryBundle, html_chunks: List[str], viewport_only=True
     ) -> List[str]:
         html = merge_html_chunks(html_chunks)
-        possible_interactions = self.driver.get_possible_interactions(
-            in_viewport=viewport_only
+        reads = self._take_state_reads(html_chunks, viewport_only)
+        possible_interactions = (
+            reads[0]
+            if reads
+            else self.driver.get_possible_interactions(in_viewport=viewport_only)
         )
         html = self.get_html_with_xpath(html, possible_interactions)
         return [html]
 
+    def retrieve_page(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
+    ) -> Union[ParsedPage, List[str]]:
+        if self.annotator.backend == "lxml":
+            return self.retrieve(query, page.chunks, viewport_only)
+        reads = self._take_state_reads(
+            page.chunks if page.is_serialized else None, viewport_only
+        )
+        possible_interactions = (
+            reads[0]
+            if reads
+            else self.driver.get_possible_interactions(in_viewport=viewport_only)
+        )
+        process_pool = (
+            None if page.is_parsed else self._get_process_pool(len(page.html))
+        )
+        if process_pool is not None:
+            serialize = self.annotator.backend != "table"
+            frames_html = (
+                reads[1]
+                if reads and reads[1] is not None
+                else self._get_frames_html(page.html)
+            )
+            root = process_pool.run(
+                annotate_captured_html,
+                page.html,
+                *self._offload_args(possible_interactions, "", frames_html, serialize),
+            )
+            if root is not None:
+                return self._offloaded_page(root, serialize, possible_interactions)
+        if self.annotator.backend == "table":
+            table = self.annotate_tree(page.table, possible_interactions)
+            page.invalidate()
+            return ParsedPage(table=table, possible_interactions=possible_interactions)
+        elements_by_xpath = {}
+        soup = self.annotate_tree(
+            page.soup, possible_interactions, elements_by_xpath=elements_by_xpath
+        )
+        page.invalidate()
+        return ParsedPage(
+            soup=soup,
+            possible_interactions=possible_interactions,
+            elements_by_xpath=elements_by_xpath,
+        )
+
+    async def aretrieve(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> List[str]:
+        html = merge_html_chunks(html_chunks)
+        reads = self._take_state_reads(html_chunks, viewport_only)
+        possible_interactions = (
+            reads[0]
+            if reads
+            else await self.driver.aget_possible_interactions(in_viewport=viewport_only)
+        )
+        html = await self.aget_html_with_xpath(html, possible_interactions)
+        return [html]
+
+    async def aretrieve_page(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
+    ) -> Union[ParsedPage, List[str]]:
+        """Same as `retrieve_page`, driver round trips are awaited and parsing runs in a worker thread"""
+        if self.annotator.backend == "lxml":
+            return await self.aretrieve(query, page.chunks, viewport_only)
+        reads = self._take_state_reads(
+            page.chunks if page.is_serialized else None, viewport_only
+        )
+        possible_interactions = (
+            reads[0]
+            if reads
+            else await self.driver.aget_possible_interactions(in_viewport=viewport_only)
+        )
+        process_pool = (
+            None if page.is_parsed else self._get_process_pool(len(page.html))
+        )
+        if process_pool is not None:
+            serialize = self.annotator.backend != "table"
+            root = await process_pool.arun(
+                annotate_captured_html,
+                page.html,
+                *self._offload_args(
+                    possible_interactions,
+                    "",
+                    reads[1]
+                    if reads and reads[1] is not None
+                    else await self._aget_frames_html(page.html),
+                    serialize,
+                ),
+            )
+            if root is not None:
+                return self._offloaded_page(root, serialize, possible_interactions)
+        if self.annotator.backend == "table":
+            table = await asyncio.to_thread(getattr, page, "table")
+            table = await self.aannotate_tree(table, possible_interactions)
+            page.invalidate()
+            return ParsedPage(table=table, possible_interactions=possible_interactions)
+        elements_by_xpath = {}
+        soup = await asyncio.to_thread(getattr, page, "soup")
+        soup = await self.aannotate_tree(
+            soup, possible_interactions, elements_by_xpath=elements_by_xpath
+        )
+        page.invalidate()
+        return ParsedPage(
+            soup=soup,
+            possible_interactions=possible_interactions,
+            elements_by_xpath=elements_by_xpath,
+        )
+
+    def _offloaded_page(
+        self,
+        root,
+        serialized: bool,
+        possible_interactions: Optional[PossibleInteractionsByXpath],
+    ) -> ParsedPage:
+        if serialized:
+            return ParsedPage([root], possible_interactions=possible_interactions)
+        return ParsedPage(table=root, possible_interactions=possible_interactions)
+
     def _generate_xpath(self, element, path=""):  # used to generate dict nodes
         """Recursive function to generate the xpath of an element"""
         if element.parent is None:
@@ -167,49 +1001,267 @@ class InteractiveXPathRetriever(BaseHtmlRetriever):
                 path = f"/{tag}{path}"
             return self._generate_xpath(element.parent, path)
 
+    async def aget_html_with_xpath(
+        self,
+        html_content,
+        filter_by_possible_interactions: Optional[PossibleInteractionsByXpath],
+        xpath_prefix="",
+    ):
+        frames_html = None
+        process_pool = self._get_process_pool(len(html_content))
+        if process_pool is not None:
+            frames_html = await self._aget_frames_html(html_content)
+            html = await process_pool.arun(
+                annotate_captured_html,
+                html_content,
+                *self._offload_args(
+                    filter_by_possible_interactions, xpath_prefix, frames_html, True
+                ),
+            )
+            if html is not None:
+                return html
+        root = await asyncio.to_thread(self.annotator.parse, html_content)
+        root = await self._aannotate_tree(
+            root,
+            filter_by_possible_interactions,
+            xpath_prefix,
+            None,
+            frames_html,
+            in_driver_frame=True,
+        )
+        return await asyncio.to_thread(self.annotator.serialize, root)
+
     def get_html_with_xpath(
         self,
         html_content,
         filter_by_possible_interactions: Optional[PossibleInteractionsByXpath],
         xpath_prefix="",
     ):
-        soup = BeautifulSoup(html_content, "html.parser")
-        for element in soup.find_all(True):
-            xpath = xpath_prefix + self._generate_xpath(element)
+        frames_html = None
+        process_pool = self._get_process_pool(len(html_content))
+        if process_pool is not None:
+            frames_html = self._get_frames_html(html_content)
+            html = process_pool.run(
+                annotate_captured_html,
+                html_content,
+                *self._offload_args(
+                    filter_by_possible_interactions, xpath_prefix, frames_html, True
+                ),
+            )
+            if html is not None:
+                return html
+        root = self._annotate_tree(
+            self.annotator.parse(html_content),
+            filter_by_possible_interactions,
+            xpath_prefix,
+            None,
+            frames_html,
+            in_driver_frame=True,
+        )
+        return self.annotator.serialize(root)
+
+    def annotate_tree(
+        self,
+        root,
+        filter_by_possible_interactions: Optional[PossibleInteractionsByXpath],
+        xpath_prefix="",
+        elements_by_xpath: Optional[dict] = None,
+    ):
+        """
+        Annotate a tree parsed by the annotator in place, iframes are replaced by the annotated tree of their content.
+        Frames are read from a single `BaseDriver.get_frames_html` capture when the driver supports it,
+        the others by switching to them.
+        """
+        return self._annotate_tree(
+            root,
+            filter_by_possible_interactions,
+            xpath_prefix,
+            elements_by_xpath,
+            frames_html=None,
+            in_driver_frame=True,
+        )
+
+    def _annotate_tree(
+        self,
+        root,
+        filter_by_possible_interactions: Optional[PossibleInteractionsByXpath],
+        xpath_prefix: str,
+        elements_by_xpath: Optional[dict],
+        frames_html: Optional[Dict[str, str]],
+        in_driver_frame: bool,
+    ):
+        # `in_driver_frame` tells whether the driver is switched to the frame of `root`
+        annotator = self.annotator
+        iframes = self._annotate_elements(
+            root, filter_by_possible_interactions, xpath_prefix, elements_by_xpath
+        )
+        if iframes and frames_html is None:
+            frames_html = self.driver.get_frames_html() or {}
+        for iframe_tag, frame_xpath in iframes:
+            frame_html = frames_html.get(xpath_prefix + frame_xpath)
+            switched = frame_html is None
+            if switched:
+                if not in_driver_frame:
+                    continue
+                try:
+                    self.driver.switch_frame(frame_xpath)
+                except Exception:
+                    continue
+                frame_html = self.driver.get_html()
+            frame_root = self._annotate_tree(
+                annotator.parse(frame_html),
+                filter_by_possible_interactions,
+                xpath_prefix + frame_xpath,
+                elements_by_xpath,
+                frames_html,
+                switched,
+            )
+            annotator.replace_with_root(iframe_tag, frame_root)
+            if switched:
+                self.driver.switch_parent_frame()
+        return root
+
+    async def aannotate_tree(
+        self,
+        root,
+        filter_by_possible_interactions: Optional[PossibleInteractionsByXpath],
+        xpath_prefix="",
+        elements_by_xpath: Optional[dict] = None,
+    ):
+        """Same as `annotate_tree` with the asynchronous driver API, the tree is walked in a worker thread"""
+        return await self._aannotate_tree(
+            root,
+            filter_by_possible_interactions,
+            xpath_prefix,
+            elements_by_xpath,
+            frames_html=None,
+            in_driver_frame=True,
+        )
+
+    async def _aannotate_tree(
+        self,
+        root,
+        filter_by_possible_interactions: Optional[PossibleInteractionsByXpath],
+        xpath_prefix: str,
+        elements_by_xpath: Optional[dict],
+        frames_html: Optional[Dict[str, str]],
+        in_driver_frame: bool,
+    ):
+        annotator = self.annotator
+        iframes = await asyncio.to_thread(
+            self._annotate_elements,
+            root,
+            filter_by_possible_interactions,
+            xpath_prefix,
+            elements_by_xpath,
+        )
+        if iframes and frames_html is None:
+            frames_html = await self.driver.aget_frames_html() or {}
+        for iframe_tag, frame_xpath in iframes:
+            frame_html = frames_html.get(xpath_prefix + frame_xpath)
+            switched = frame_html is None
+            if switched:
+                if not in_driver_frame:
+                    continue
+                try:
+                    await self.driver.aswitch_frame(frame_xpath)
+                except Exception:
+                    continue
+                frame_html = await self.driver.aget_html()
+            frame_root = await self._aannotate_tree(
+                await asyncio.to_thread(annotator.parse, frame_html),
+                filter_by_possible_interactions,
+                xpath_prefix + frame_xpath,
+                elements_by_xpath,
+                frames_html,
+                switched,
+            )
+            annotator.replace_with_root(iframe_tag, frame_root)
+            if switched:
+                await self.driver.aswitch_parent_frame()
+        return root
+
+    def _annotate_elements(
+        self,
+        root,
+        filter_by_possible_interactions: Optional[PossibleInteractionsByXpath],
+        xpath_prefix: str,
+        elements_by_xpath: Optional[dict],
+    ) -> List[tuple]:
+        """Set the xpath of the elements of the tree (without their frames), returns the (iframe, xpath) to expand"""
+        annotator = self.annotator
+        iframes = []
+        for element, xpath in annotator.iter_xpaths(root):
+            if annotator.get_tag(element) == "iframe":
+                iframes.append((element, xpath))
+            xpath = xpath_prefix + xpath
             if (
                 filter_by_possible_interactions is None
                 or xpath in filter_by_possible_interactions
             ):
-                element["xpath"] = xpath
-        for iframe_tag in soup.find_all("iframe"):
-            frame_xpath = self._generate_xpath(iframe_tag)
-            try:
-                self.driver.switch_frame(frame_xpath)
-            except Exception:
-                continue
-            frame_soup_str = self.get_html_with_xpath(
-                self.driver.get_html(),
-                filter_by_possible_interactions,
+                annotator.set_xpath(element, xpath)
+                if elements_by_xpath is not None:
+                    elements_by_xpath[xpath] = element
+        return iframes
+
+
+# start of an iframe, pages without any are annotated without capturing frames
+IFRAME_TAG = re.compile(r"<iframe[\s/>]", re.I)
+
+
+def annotate_captured_html(
+    html: str,
+    backend: str,
+    xpaths: Optional[frozenset],
+    xpath_prefix: str,
+    frames_html: Dict[str, str],
+    serialize: bool,
+):
+    """
+    Annotation of `InteractiveXPathRetriever` without a driver, for the workers of a `ProcessPool`:
+    frames are read from `frames_html` only. Returns the annotated HTML, or the tree if not `serialize`,
+    None if a frame is missing.
+    """
+    retriever = InteractiveXPathRetriever(None, backend)
+    annotator = retriever.annotator
+
+    def annotate(root, xpath_prefix: str):
+        iframes = retriever._annotate_elements(root, xpaths, xpath_prefix, None)
+        for iframe_tag, frame_xpath in iframes:
+            frame_root = annotate(
+                annotator.parse(frames_html[xpath_prefix + frame_xpath]),
                 xpath_prefix + frame_xpath,
             )
-            frame_soup = BeautifulSoup(frame_soup_str, "html.parser")
-            iframe_tag.replace_with(frame_soup)
-            self.driver.switch_parent_frame()
-        return str(soup)
+            annotator.replace_with_root(iframe_tag, frame_root)
+        return root
+
+    try:
+        root = annotate(annotator.parse(html), xpath_prefix)
+    except KeyError:
+        return None
+    return annotator.serialize(root) if serialize else root
 
 
 class OpsmSplitRetriever(BaseHtmlRetriever):
+    # both BM25 rounds keep `top_k` results per slice of this many texts, to bound memory on large pages
+    slice_size = 1000
+
     def __init__(
         self,
         driver: BaseDriver,
         top_k: int = 5,
         group_by: int = 10,
         rank_fields: List[str] = ["element", "placeholder", "text", "name"],
+        bm25_index: Optional[BM25Index] = None,
+        chunker: Optional[HtmlChunker] = None,
     ):
         self.driver = driver
         self.top_k = top_k
         self.group_by = group_by
         self.rank_fields = rank_fields
+        # Groups of element attributes, a different corpus from the one of chunk retrievers
+        self.bm25_index = bm25_index or BM25Index()
+        self.chunker = chunker or HtmlChunker()
 
     def _generate_xpath(self, element, path=""):  # used to generate dict nodes
         """Recursive function to generate the xpath of an element"""
@@ -332,44 +1384,40 @@ class OpsmSplitRetriever(BaseHtmlRetriever):
         attributes_list = self._clean_attributes(attributes_list)
         # retrieving the top_k results
 
-        list_of_results = []
         attributes_list = self._chunk_dicts(attributes_list, self.group_by)
-        l = len(attributes_list)
-        # grouping the attributes_list in groups of 1000 to avoid memory errors
-        list_of_grouped_results = []
-        for j in range(0, l, 1000):
-            nodes = []
-            attr = attributes_list[j : j + 1000]
-            for d in attr:
-                xpath = d.pop("xpath")
-                nodes.append(TextNode(text=str(d), metadata={"xpath": xpath}))
-            retriever = BM25Retriever.from_defaults(
-                nodes=nodes, similarity_top_k=self.top_k
-            )
-            results = retriever.retrieve(query)
-            list_of_grouped_results += results
-        nodes = []
-        for grouped_results in list_of_grouped_results:
-            xpaths = grouped_results.metadata["xpath"]
-            ds = self._unchunk_dicts([ast.literal_eval(grouped_results.text)])
-            assert len(xpaths) == len(ds)
-            for xpath, d in zip(xpaths, ds):
-                nodes.append(TextNode(text=str(d), metadata={"xpath": xpath}))
-        l2 = len(nodes)
-        for j in range(0, l2, 1000):
-            retriever = BM25Retriever.from_defaults(
-                nodes=nodes[j : j + 1000], similarity_top_k=self.top_k
-            )
-            results = retriever.retrieve(query)
-            list_of_results += results
-        list_of_results = sorted(list_of_results, key=lambda x: x.score, reverse=True)
-        results = list_of_results[: self.top_k]
-        results_dict = [ast.literal_eval(r.text) for r in results]
-        for i in range(len(results_dict)):
-            results_dict[i]["xpath"] = results[i].metadata["xpath"]
-        scores = [r.score for r in results]
+        # first round on groups of elements, with an index kept from one page to the next
+        group_xpaths = [d.pop("xpath") for d in attributes_list]
+        group_texts = [str(d) for d in attributes_list]
+        xpaths = []
+        texts = []
+        for i, _ in self._sliced_top_k(self.bm25_index, query, group_texts):
+            ds = self._unchunk_dicts([ast.literal_eval(group_texts[i])])
+            assert len(group_xpaths[i]) == len(ds)
+            xpaths += group_xpaths[i]
+            texts += [str(d) for d in ds]
+        # second round on the elements of the best groups
+        results = self._sliced_top_k(BM25Index(), query, texts)
+        results = sorted(results, key=lambda r: r[1], reverse=True)[: self.top_k]
+        results_dict = [ast.literal_eval(texts[i]) for i, _ in results]
+        for d, (i, _) in zip(results_dict, results):
+            d["xpath"] = xpaths[i]
+        scores = [score for _, score in results]
         return results_dict, scores
 
+    def _sliced_top_k(
+        self, index: BM25Index, query: str, texts: List[str]
+    ) -> List[Tuple[int, float]]:
+        """(position in `texts`, score) of the `top_k` best texts of every slice of `slice_size` texts, scored within their slice"""
+        results = []
+        for j in range(0, len(texts), self.slice_size):
+            results += [
+                (i + j, score)
+                for i, score in index.top_k(
+                    query, texts[j : j + self.slice_size], self.top_k
+                )
+            ]
+        return results
+
     def _match_element(self, attributes, element_specs):
         i = 0
         for spec in element_specs:
@@ -379,46 +1427,142 @@ class OpsmSplitRetriever(BaseHtmlRetriever):
         return None
 
     def _return_nodes_with_xpath(self, nodes, results_dict, score):
+        """Nodes containing a result, scored by the first result they contain in document order"""
+        indices = {}
+        for i, spec in enumerate(results_dict):
+            indices.setdefault(spec["xpath"], i)
         returned_nodes = []
         for node in nodes:
-            split_html = node.text
-            soup = BeautifulSoup(split_html, "html.parser")
-            for element in soup.descendants:
-                if not isinstance(element, NavigableString):
-                    indice = self._match_element(element.attrs, results_dict)
-                    if indice is not None:
-                        node.metadata["score"] = score[indice]
-                        returned_nodes.append(node)
-                        break
+            for xpath in node.metadata["xpaths"]:
+                indice = indices.get(xpath)
+                if indice is not None:
+                    node.metadata["score"] = score[indice]
+                    returned_nodes.append(node)
+                    break
         return returned_nodes
 
+    async def _aget_results(self, query, html):
+        """Asynchronous `_get_results`, backends calling a remote API override it, by default it runs in a worker thread"""
+        return await asyncio.to_thread(self._get_results, query, html)
+
+    def _split_nodes(self, html: str) -> List[TextNode]:
+        return [
+            TextNode(text=chunk.text, metadata={"xpaths": chunk.xpaths})
+            for chunk in self.chunker.chunk(html)
+        ]
+
+    def _get_nodes_text(self, nodes, results_dict, score) -> List[str]:
+        results_nodes = self._return_nodes_with_xpath(nodes, results_dict, score)
+        results = [
+            NodeWithScore(node=node, score=node.metadata["score"])
+            for node in results_nodes
+        ]
+        return get_nodes_text(results)
+
     def retrieve(
         self, query: QueryBundle, html_nodes: List[str], viewport_only=True
     ) -> List[str]:
         html = self._add_xpath_attributes(merge_html_chunks(html_nodes))
-        text_list = [html]
-        documents = [Document(text=t) for t in text_list]
-        splitter = LangchainNodeParser(
-            lc_splitter=RecursiveCharacterTextSplitter.from_language(
-                language="html",
-            )
-        )
-        nodes = splitter.get_nodes_from_documents(documents)
+        nodes = self._split_nodes(html)
         results_dict, score = self._get_results(query.query_str, html)
         for r in results_dict:
             if not self.driver.check_visibility(r["xpath"]):
                 i = results_dict.index(r)
                 results_dict.remove(r)
                 score.pop(i)
-        results_nodes = self._return_nodes_with_xpath(nodes, results_dict, score)
-        results = [
-            NodeWithScore(node=node, score=node.metadata["score"])
-            for node in results_nodes
-        ]
-        return get_nodes_text(results)
+        return self._get_nodes_text(nodes, results_dict, score)
+
+    async def aretrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        html = await asyncio.to_thread(
+            self._add_xpath_attributes, merge_html_chunks(html_nodes)
+        )
+        nodes = await asyncio.to_thread(self._split_nodes, html)
+        results_dict, score = await self._aget_results(query.query_str, html)
+        for r in results_dict:
+            if not await self.driver.acheck_visibility(r["xpath"]):
+                i = results_dict.index(r)
+                results_dict.remove(r)
+                score.pop(i)
+        return await asyncio.to_thread(self._get_nodes_text, nodes, results_dict, score)
+
+
+# text and labelling attributes of a chunk, matched against the query by `BoilerplateRetriever`
+VISIBLE_TEXT = re.compile(
+    r"""(?:aria-label|placeholder|title|alt|value)\s*=\s*(?:"([^"]*)"|'([^']*)')|>([^<]+)"""
+)
+
+
+class BoilerplateRetriever(BaseHtmlRetriever):
+    """
+    Pipeline stage removing the chunks repeated on most pages of the site (navigation bars, cookie banners,
+    menus...) as found by a `BoilerplateIndex`, unless they share a keyword with the query.
+
+    Every call records the chunks of the current page in the index. A single chunk, e.g. the whole page,
+    is split with `chunker`, several chunks are taken as is: place it after the stage producing the chunks
+    and before the ranking one. With `mode="demote"`, boilerplate chunks are moved after the others instead.
+    The number of chunks and characters removed is added to `boilerplate` in the running `time_profiler` record.
+    """
+
+    def __init__(
+        self,
+        driver: BaseDriver,
+        index: Optional[BoilerplateIndex] = None,
+        mode: str = "drop",
+        chunker: Optional[HtmlChunker] = None,
+    ):
+        if mode not in ("drop", "demote"):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.driver = driver
+        self.index = index or get_default_boilerplate_index()
+        self.mode = mode
+        self.chunker = chunker or HtmlChunker()
+
+    def retrieve(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> List[str]:
+        if len(html_chunks) == 1:
+            html_chunks = self.chunker.split(html_chunks[0])
+        url = self.driver.get_url()
+        if not url:
+            return html_chunks
+        fingerprints = [chunk_fingerprint(chunk) for chunk in html_chunks]
+        self.index.add_page(url, fingerprints)
+        query_tokens = set(tokenize(query.query_str))
+        kept, boilerplate = [], []
+        for chunk, is_boilerplate in zip(
+            html_chunks, self.index.is_boilerplate(url, fingerprints)
+        ):
+            if is_boilerplate and query_tokens.isdisjoint(self.get_keywords(chunk)):
+                boilerplate.append(chunk)
+            else:
+                kept.append(chunk)
+        if not kept:
+            return html_chunks
+        add_profiling_data(
+            "boilerplate",
+            {
+                "chunks": len(html_chunks),
+                "boilerplate_chunks": len(boilerplate),
+                "saved_size": sum(len(chunk) for chunk in boilerplate)
+                if self.mode == "drop"
+                else 0,
+            },
+        )
+        return kept + boilerplate if self.mode == "demote" else kept
+
+    @staticmethod
+    def get_keywords(chunk: str) -> List[str]:
+        """Keywords of the text and labels of a chunk, tokenized like BM25 queries"""
+        return tokenize(
+            " ".join("".join(groups) for groups in VISIBLE_TEXT.findall(chunk))
+        )
 
 
 class XPathedChunkRetriever(BaseHtmlRetriever):
+    query_independent = True
+
     def retrieve(
         self, query: QueryBundle, html_chunks: List[str], viewport_only=True
     ) -> List[str]:
@@ -430,6 +1574,11 @@ class XPathedChunkRetriever(BaseHtmlRetriever):
                 interactive_chunks.append(chunk)
         return interactive_chunks
 
+    def get_cache_key(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> Optional[str]:
+        return fingerprint(type(self).__name__, fingerprint_chunks(html_chunks))
+
 
 class FromXPathNodesExpansionRetriever(BaseHtmlRetriever):
     """
@@ -440,6 +1589,8 @@ class FromXPathNodesExpansionRetriever(BaseHtmlRetriever):
     When interactive chunks intersect, they are merged together.
     """
 
+    query_independent = True
+
     def __init__(
         self,
         chunk_size: int = 750,
@@ -455,8 +1606,15 @@ class FromXPathNodesExpansionRetriever(BaseHtmlRetriever):
         return xpaths
 
     def get_expanded_chunks(self, html_chunks: List[str]) -> List[str]:
-        html = merge_html_chunks(html_chunks)
-        soup = BeautifulSoup(html, "html.parser")
+        return self.get_expanded_page_chunks(ParsedPage(html_chunks))
+
+    def get_expanded_page_chunks(self, page: ParsedPage) -> List[str]:
+        if page.dom_index is not None:
+            return expand_xpath_chunks(page.dom_index, self.chunk_size)
+        return self.get_expanded_chunks_from_soup(page.soup)
+
+    def get_expanded_chunks_from_soup(self, soup: BeautifulSoup) -> List[str]:
+        """Expansion walking the tree, quadratic in the number of elements, see `expand_xpath_chunks`"""
         elements = soup.find_all(attrs={"xpath": True})
         chunks = []
         processed_xpaths = set()
@@ -525,10 +1683,27 @@ class FromXPathNodesExpansionRetriever(BaseHtmlRetriever):
         results = self.get_expanded_chunks(html_chunks)
         return results
 
+    def retrieve_page(
+        self, query: QueryBundle, page: ParsedPage, viewport_only=True
+    ) -> List[str]:
+        return self.get_expanded_page_chunks(page)
+
+    def get_cache_key(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> Optional[str]:
+        return fingerprint(
+            type(self).__name__, str(self.chunk_size), fingerprint_chunks(html_chunks)
+        )
+
 
 class SemanticRetriever(BaseHtmlRetriever):
     """
     Semantic retriever up to `top_k` results (number of chunks)
+
+    Chunks are embedded into a `VectorIndex`, reused for every query on the same HTML.
+    Set `quantize` to store embeddings as int8. Large pages are chunked in `process_pool`, see `ProcessPool`.
+    Without `embedding`, the model of llama-index `Settings` is used, or a local `HashingEmbedding` if none can be loaded.
+    With a `cutoff`, fewer than `top_k` chunks are returned when the best ones clearly dominate, see `AdaptiveCutoff`.
     """
 
     def __init__(
@@ -536,76 +1711,232 @@ class SemanticRetriever(BaseHtmlRetriever):
         embedding: Optional[BaseEmbedding],
         top_k: int = 10,
         xpathed_only=True,
+        cache: Optional[RetrievalCache] = None,
+        quantize: bool = False,
+        max_cached_indexes: int = 8,
+        chunker: Optional[HtmlChunker] = None,
+        process_pool: Optional[ProcessPool] = None,
+        cutoff: Optional[AdaptiveCutoff] = None,
     ):
         self.top_k = top_k
         self.xpathed_only = xpathed_only
         self.embedding = embedding
+        self.cache = cache
+        self.quantize = quantize
+        self.indexes = LRUCache(max_cached_indexes)
+        self.chunker = chunker or HtmlChunker()
+        self.process_pool = process_pool
+        self.cutoff = cutoff
+
+    def get_embedding(self) -> BaseEmbedding:
+        """`embedding`, or the model of llama-index `Settings`, or a local `HashingEmbedding` if it cannot be loaded"""
+        if self.embedding is None:
+            try:
+                return Settings.embed_model
+            except (ImportError, ValueError) as e:
+                logger.warning(
+                    f"No embedding model available, falling back to HashingEmbedding: {e}"
+                )
+                self.embedding = HashingEmbedding()
+        return self.embedding
+
+    def get_index(self, html_chunks: List[str]) -> VectorIndex:
+        """Index of the chunks of the given HTML, built once per page snapshot"""
+        embedding = self.get_embedding()
+        return self.indexes.get_or_compute(
+            self._get_index_key(html_chunks),
+            lambda: VectorIndex.from_texts(
+                self._get_index_texts(html_chunks),
+                embedding,
+                quantize=self.quantize,
+                embedding_store=self.cache.embeddings if self.cache else None,
+            ),
+        )
+
+    async def aget_index(self, html_chunks: List[str]) -> VectorIndex:
+        """Same as `get_index`, chunks are embedded with the asynchronous API of the model"""
+        embedding = self.get_embedding()
+        key = self._get_index_key(html_chunks)
+        index = self.indexes.get(key)
+        if index is None:
+            texts = await asyncio.to_thread(self._get_index_texts, html_chunks)
+            index = await VectorIndex.afrom_texts(
+                texts,
+                embedding,
+                quantize=self.quantize,
+                embedding_store=self.cache.embeddings if self.cache else None,
+            )
+            self.indexes.put(key, index)
+        return index
+
+    def _get_index_key(self, html_chunks: List[str]) -> str:
+        embedding = self.get_embedding()
+        return fingerprint(
+            embedding.model_name,
+            str(self.xpathed_only),
+            str(self.quantize),
+            str(self.chunker.chunk_size),
+            fingerprint_chunks(html_chunks),
+        )
+
+    def _get_index_texts(self, html_chunks: List[str]) -> List[str]:
+        """Chunks of the merged HTML, the layouts of the input chunks seen in previous steps being reused from `cache`"""
+        process_pool = self.process_pool or get_default_process_pool()
+        if self.cache is not None:
+            layouts = self.cache.layouts(self.chunker, html_chunks, process_pool)
+        else:
+            args = ("".join(html_chunks), [len(chunk) for chunk in html_chunks])
+            layouts = (
+                self.chunker.layout_parts(*args)
+                if process_pool is None
+                else process_pool.run(self.chunker.layout_parts, *args)
+            )
+        chunks = self.chunker.chunk_layouts(html_chunks, layouts)
+        if self.xpathed_only:
+            chunks = [chunk for chunk in chunks if chunk.xpaths] or chunks
+        return [chunk.text for chunk in chunks]
 
     def retrieve(
         self, query: QueryBundle, html_chunks: List[str], viewport_only=True
     ) -> List[str]:
-        splitter = LangchainNodeParser(
-            lc_splitter=RecursiveCharacterTextSplitter.from_language(
-                language="html",
+        index = self.get_index(html_chunks)
+        if len(index) == 0:
+            return []
+        embedding = self.get_embedding()
+        query_embedding = embedding.get_agg_embedding_from_queries(query.embedding_strs)
+        return self._get_results(index, index.top_k(query_embedding, self._max_k()))
+
+    def retrieve_many(
+        self, queries: List[QueryBundle], html_chunks: List[str], viewport_only=True
+    ) -> List[List[str]]:
+        """The page is indexed once and the queries are embedded together, then scored with a single matrix product"""
+        if not queries:
+            return []
+        index = self.get_index(html_chunks)
+        if len(index) == 0:
+            return [[] for _ in queries]
+        embedding = self.get_embedding()
+        return [
+            self._get_results(index, results)
+            for results in index.top_k_many(
+                get_query_embeddings(embedding, queries), self._max_k()
             )
+        ]
+
+    async def aretrieve(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> List[str]:
+        index = await self.aget_index(html_chunks)
+        if len(index) == 0:
+            return []
+        embedding = self.get_embedding()
+        query_embedding = await embedding.aget_agg_embedding_from_queries(
+            query.embedding_strs
         )
-        nodes = splitter.get_nodes_from_documents(
-            [Document(text=merge_html_chunks(html_chunks))]
-        )
+        return self._get_results(index, index.top_k(query_embedding, self._max_k()))
 
-        if self.xpathed_only:
-            nodes = filter_for_xpathed_nodes(nodes)
+    def _max_k(self) -> int:
+        return self.top_k if self.cutoff is None else self.cutoff.get_max_k(self.top_k)
 
-        index = VectorStoreIndex(nodes=nodes, embed_model=self.embedding)
-        query_engine = index.as_retriever(similarity_top_k=self.top_k)
+    def _get_results(
+        self, index: VectorIndex, results: List[Tuple[int, float]]
+    ) -> List[str]:
+        return _cut(
+            self, self.cutoff, [(index.texts[i], score) for i, score in results]
+        )
 
-        retrieved_nodes = query_engine.retrieve(query)
-        return get_nodes_text(retrieved_nodes)
+    def get_cache_key(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> Optional[str]:
+        embedding = self.get_embedding()
+        return fingerprint(
+            type(self).__name__,
+            embedding.model_name,
+            str(self.top_k),
+            str(self.xpathed_only),
+            str(self.quantize),
+            str(self.chunker.chunk_size),
+            repr(self.cutoff),
+            query.query_str,
+            fingerprint_chunks(html_chunks),
+        )
 
 
 class SyntaxicRetriever(BaseHtmlRetriever):
     """
-    Syntaxic retriever up to `top_k` results (number of chunks)
+    Syntaxic retriever up to `top_k` results (number of chunks).
+    Large pages are chunked and scored in `process_pool`, see `ProcessPool`.
+    With a `cutoff`, fewer than `top_k` chunks are returned when the best ones clearly dominate, see `AdaptiveCutoff`.
     """
 
     def __init__(
         self,
         top_k: int = 5,
         xpathed_only=True,
+        bm25_index: Optional[BM25Index] = None,
+        chunker: Optional[HtmlChunker] = None,
+        process_pool: Optional[ProcessPool] = None,
+        cutoff: Optional[AdaptiveCutoff] = None,
     ):
         self.top_k = top_k
         self.xpathed_only = xpathed_only
+        self.bm25_index = bm25_index or get_default_bm25_index()
+        self.chunker = chunker or HtmlChunker()
+        self.process_pool = process_pool
+        self.cutoff = cutoff
 
     def retrieve(
         self, query: QueryBundle, html_chunks: List[str], viewport_only=True
     ) -> List[str]:
-        documents = [Document(text=merge_html_chunks(html_chunks))]
-        splitter = LangchainNodeParser(
-            lc_splitter=RecursiveCharacterTextSplitter.from_language(
-                language="html",
-            )
+        results = _bm25_retrieve(
+            merge_html_chunks(html_chunks),
+            query.query_str,
+            self.chunker,
+            self.xpathed_only,
+            self.top_k if self.cutoff is None else self.cutoff.get_max_k(self.top_k),
+            self.bm25_index,
+            self.process_pool,
         )
-        nodes = splitter.get_nodes_from_documents(documents)
-        if self.xpathed_only:
-            nodes = filter_for_xpathed_nodes(nodes)
+        return _cut(self, self.cutoff, results)
 
-        retriever = BM25Retriever.from_defaults(
-            nodes=nodes, similarity_top_k=self.top_k
+    def get_cache_key(
+        self, query: QueryBundle, html_chunks: List[str], viewport_only=True
+    ) -> Optional[str]:
+        return fingerprint(
+            type(self).__name__,
+            str(self.top_k),
+            str(self.xpathed_only),
+            str(self.chunker.chunk_size),
+            repr(self.cutoff),
+            query.query_str,
+            fingerprint_chunks(html_chunks),
         )
-        results = retriever.retrieve(query)
-        return get_nodes_text(results)
 
 
 class CleanHTMLRetriever(BaseHtmlRetriever):
-    def __init__(self, drop_base_64: bool = True, drop_svg: bool = True) -> None:
+    """
+    Retriever that removes SVG elements and base64 data URIs from the chunks in a single pass.
+    A `sanitizer` can be given instead for other rules, see `HtmlSanitizer`.
+    """
+
+    query_independent = True
+
+    def __init__(
+        self,
+        drop_base_64: bool = True,
+        drop_svg: bool = True,
+        sanitizer: Optional[HtmlSanitizer] = None,
+    ) -> None:
         self.drop_base_64 = drop_base_64
         self.drop_svg = drop_svg
+        self.sanitizer = sanitizer or HtmlSanitizer(
+            drop_tags=["svg"] if drop_svg else [], drop_base64=drop_base_64
+        )
 
     def _clean_chunk(self, html: str) -> str:
-        if self.drop_base_64:
-            html = re.sub('src="data:image/png;base64,([^"]*?)"', "", html)
-        if self.drop_svg:
-            html = re.sub("<svg.*?>(.+?)</svg>", "", html)
+        stream = self.sanitizer.stream()
+        html = stream.feed(html) + stream.close()
+        logger.debug(f"CleanHTMLRetriever removed {stream.bytes_removed} bytes")
         return html
 
     def retrieve(
@@ -613,15 +1944,14 @@ class CleanHTMLRetriever(BaseHtmlRetriever):
     ) -> List[str]:
         return [self._clean_chunk(html) for html in html_nodes]
 
-
-def filter_for_xpathed_nodes(nodes: List):
-    pattern = re.compile(r'xpath="([^"]+)"')
-    compatibles = []
-    for node in nodes:
-        match = re.search(pattern, node.text)
-        if match:
-            compatibles.append(node)
-    return compatibles if len(compatibles) > 0 else nodes
+    def get_cache_key(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> Optional[str]:
+        return fingerprint(
+            type(self).__name__,
+            repr(self.sanitizer),
+            fingerprint_chunks(html_nodes),
+        )
 
 
 def get_nodes_text(nodes: List[NodeWithScore]) -> List[str]:
@@ -630,3 +1960,49 @@ def get_nodes_text(nodes: List[NodeWithScore]) -> List[str]:
 
 def merge_html_chunks(html_chunks: List[str], separator="\n") -> str:
     return separator.join(html_chunks)
+
+
+def _split_top_k(
+    html: str, query_str: str, chunker: HtmlChunker, xpathed_only: bool, top_k: int
+) -> List[Tuple[str, float]]:
+    """Chunks of `html` with the best scores in the BM25 index of the process, with their scores"""
+    texts = chunker.split(html, xpathed_only)
+    results = get_default_bm25_index().top_k(query_str, texts, top_k)
+    return [(texts[i], score) for i, score in results]
+
+
+def _bm25_retrieve(
+    html: str,
+    query_str: str,
+    chunker: HtmlChunker,
+    xpathed_only: bool,
+    top_k: int,
+    bm25_index: BM25Index,
+    process_pool: Optional[ProcessPool] = None,
+) -> List[Tuple[str, float]]:
+    """
+    `top_k` chunks of `html` for the query with their scores, chunked and scored in `process_pool`
+    (the default one if None) when `bm25_index` is the default index, each worker then scoring with its own.
+    """
+    process_pool = process_pool or get_default_process_pool()
+    if process_pool is not None and bm25_index is get_default_bm25_index():
+        return process_pool.run(
+            _split_top_k, html, query_str, chunker, xpathed_only, top_k
+        )
+    texts = chunker.split(html, xpathed_only)
+    results = bm25_index.top_k(query_str, texts, top_k)
+    return [(texts[i], score) for i, score in results]
+
+
+def _cut(
+    retriever: BaseHtmlRetriever,
+    cutoff: Optional[AdaptiveCutoff],
+    results: List[Tuple[str, float]],
+) -> List[str]:
+    """Texts of (text, score) results sorted best first, cut by `cutoff` if any"""
+    texts = [text for text, _ in results]
+    if cutoff is None:
+        return texts
+    return cutoff.apply(
+        type(retriever).__name__, texts, [score for _, score in results]
+    )
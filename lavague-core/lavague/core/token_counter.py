@@ -9,9 +9,7 @@ from lavague.core.world_model import WorldModel
 from lavague.core.action_engine import ActionEngine
 from lavague.core.base_engine import ActionResult
 from lavague.core.world_model import WORLD_MODEL_PROMPT_TEMPLATE
-
-# used by gpt-4* models
-DEFAULT_TOKENIZER = "o200k_base"
+from lavague.core.utilities.context_packing import DEFAULT_TOKENIZER
 
 
 class TokenCounter:
@@ -0,0 +1,83 @@
+from typing import List, Optional, Sequence
+from lavague.core.utilities.profiling import add_profiling_data
+import numpy as np
+
+
+class AdaptiveCutoff:
+    """
+    Number of results to keep given their scores, best first, so that fewer chunks are sent
+    when the best matches clearly dominate.
+
+    Drops between consecutive scores are measured relative to the best score (scores are similarities,
+    BM25 scores... the higher the better). Results are cut at the largest drop if it is at least `min_gap`.
+    Otherwise, if the scores of the `max_k` candidates (the `top_k` of the retriever if None) spread over
+    at least `min_gap`, they are cut at the elbow of their curve rescaled to [0, 1], the point farthest
+    below the line joining the first and last scores, if it is at least `min_elbow` below it.
+    Otherwise all candidates are kept. The result is always between `min_k` and `max_k`.
+
+    Every cut is added to the `top_k_cutoffs` of the running `time_profiler` record: the retriever,
+    the chosen k, the candidate scores and the number of characters left out.
+    """
+
+    def __init__(
+        self,
+        min_k: int = 1,
+        max_k: Optional[int] = None,
+        min_gap: float = 0.3,
+        min_elbow: float = 0.2,
+    ):
+        if min_k < 1 or (max_k is not None and max_k < min_k):
+            raise ValueError("Bounds must satisfy 1 <= min_k <= max_k")
+        self.min_k = min_k
+        self.max_k = max_k
+        self.min_gap = min_gap
+        self.min_elbow = min_elbow
+
+    def __repr__(self) -> str:
+        return (
+            f"AdaptiveCutoff(min_k={self.min_k}, max_k={self.max_k}, "
+            f"min_gap={self.min_gap}, min_elbow={self.min_elbow})"
+        )
+
+    def get_max_k(self, top_k: int) -> int:
+        return top_k if self.max_k is None else self.max_k
+
+    def cutoff(self, scores: Sequence[float]) -> int:
+        """Number of results to keep among candidates sorted by decreasing score"""
+        n = len(scores)
+        if n <= self.min_k:
+            return n
+        curve = np.asarray(scores, dtype=np.float64)
+        top = curve[0]
+        if top <= 0 or curve[-1] >= top:
+            return n
+        # drops[i] is the drop after the first i + 1 results
+        drops = (curve[:-1] - curve[1:]) / top
+        best = int(np.argmax(drops[self.min_k - 1 :])) + self.min_k - 1
+        if drops[best] >= self.min_gap:
+            return best + 1
+        if (top - curve[-1]) / top < self.min_gap:
+            return n
+        # distance below the chord from (0, 1) to (1, 0)
+        below = 1 - np.linspace(0, 1, n) - (curve - curve[-1]) / (top - curve[-1])
+        elbow = int(np.argmax(below[self.min_k - 1 :])) + self.min_k - 1
+        if below[elbow] >= self.min_elbow:
+            return elbow + 1
+        return n
+
+    def apply(
+        self, retriever_name: str, texts: List[str], scores: Sequence[float]
+    ) -> List[str]:
+        """Keep the first texts, given as candidates best first, and add the cut to the profile"""
+        k = self.cutoff(scores)
+        add_profiling_data(
+            "top_k_cutoffs",
+            {
+                "retriever": retriever_name,
+                "k": k,
+                "candidates": len(texts),
+                "scores": [round(float(score), 4) for score in scores],
+                "saved_size": sum(len(text) for text in texts[k:]),
+            },
+        )
+        return texts[:k]
@@ -0,0 +1,209 @@
+from collections import Counter
+from functools import lru_cache
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Tuple
+from llama_index.core.utils import globals_helper
+from nltk.stem import PorterStemmer
+from lavague.core.utilities.retrieval_cache import LRUCache, fingerprint
+import numpy as np
+import math
+import re
+
+WORD_PATTERN = re.compile(r"\w+")
+
+_stemmer = PorterStemmer()
+
+
+@lru_cache(maxsize=100_000)
+def stem(word: str) -> str:
+    return _stemmer.stem(word)
+
+
+def tokenize(text: str) -> List[str]:
+    """Same tokens as the default tokenizer of llama-index BM25Retriever: stemmed keywords without stopwords"""
+    words = {word.lower() for word in WORD_PATTERN.findall(text)}
+    return [stem(word) for word in words if word not in globals_helper.stopwords]
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over a multiset of texts, scoring the same way as llama-index BM25Retriever.
+
+    Texts are tokenized once and kept as sparse rows (term ids, term frequencies). The term-document
+    weight matrix is built lazily with NumPy once per snapshot, i.e. after a batch of `add`/`remove`/`update`,
+    and a query is then scored against every document with a single sparse matrix-vector product.
+    Use `update` to move the index to the chunks of a new page: only new chunks are tokenized.
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+        max_cached_rows: int = 50_000,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocabulary: Dict[str, int] = {}
+        # Documents by text, with the number of times each text is in the corpus
+        self.slots: Dict[str, int] = {}
+        self.counts: List[int] = []
+        self.rows: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.free_slots: List[int] = []
+        self.row_cache = LRUCache(max_cached_rows)
+        self.lock = RLock()
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return sum(self.counts)
+
+    def _row(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        key = fingerprint(text)
+        row = self.row_cache.get(key)
+        if row is None:
+            frequencies = Counter(tokenize(text))
+            terms = np.fromiter(
+                (
+                    self.vocabulary.setdefault(t, len(self.vocabulary))
+                    for t in frequencies
+                ),
+                dtype=np.int64,
+                count=len(frequencies),
+            )
+            row = (terms, np.fromiter(frequencies.values(), dtype=np.float64))
+            self.row_cache.put(key, row)
+        return row
+
+    def add(self, text: str, count: int = 1):
+        with self.lock:
+            slot = self.slots.get(text)
+            if slot is None:
+                row = self._row(text)
+                if self.free_slots:
+                    slot = self.free_slots.pop()
+                    self.rows[slot] = row
+                else:
+                    slot = len(self.rows)
+                    self.rows.append(row)
+                    self.counts.append(0)
+                self.slots[text] = slot
+            self.counts[slot] += count
+            self._matrix = None
+
+    def remove(self, text: str, count: int = 1):
+        with self.lock:
+            slot = self.slots.get(text)
+            if slot is None:
+                return
+            self.counts[slot] = max(self.counts[slot] - count, 0)
+            if self.counts[slot] == 0:
+                del self.slots[text]
+                self.rows[slot] = (np.empty(0, np.int64), np.empty(0, np.float64))
+                self.free_slots.append(slot)
+            self._matrix = None
+
+    def update(self, texts: Iterable[str]):
+        """Add and remove texts so that the corpus is exactly `texts`"""
+        with self.lock:
+            target = Counter(texts)
+            current = {text: self.counts[slot] for text, slot in self.slots.items()}
+            if target == current:
+                return
+            for text, count in current.items():
+                if target[text] < count:
+                    self.remove(text, count - target[text])
+            for text, count in target.items():
+                if current.get(text, 0) < count:
+                    self.add(text, count - current.get(text, 0))
+
+    def _build_matrix(self):
+        """Term-document BM25 weights, as CSC arrays: column pointers by term id, document slots, weights"""
+        counts = np.asarray(self.counts, dtype=np.float64)
+        lengths = np.fromiter((len(r[0]) for r in self.rows), np.int64, len(self.rows))
+        documents = np.repeat(np.arange(len(self.rows)), lengths)
+        terms = np.concatenate([r[0] for r in self.rows] or [np.empty(0, np.int64)])
+        frequencies = np.concatenate(
+            [r[1] for r in self.rows] or [np.empty(0, np.float64)]
+        )
+
+        corpus_size = counts.sum()
+        document_lengths = np.bincount(
+            documents, weights=frequencies, minlength=len(self.rows)
+        )
+        average_length = (document_lengths * counts).sum() / max(corpus_size, 1)
+
+        # Same idf as rank_bm25, with a floor for terms present in more than half of the documents
+        document_frequencies = np.bincount(
+            terms, weights=counts[documents], minlength=len(self.vocabulary)
+        )
+        idf = np.zeros(len(self.vocabulary))
+        present = np.flatnonzero(document_frequencies)
+        idf[present] = [
+            math.log(corpus_size - df + 0.5) - math.log(df + 0.5)
+            for df in document_frequencies[present].tolist()
+        ]
+        if len(present) > 0:
+            average_idf = sum(idf[present].tolist()) / len(present)
+            idf[present[idf[present] < 0]] = self.epsilon * average_idf
+
+        weights = idf[terms] * (
+            frequencies
+            * (self.k1 + 1)
+            / (
+                frequencies
+                + self.k1
+                * (
+                    1
+                    - self.b
+                    + self.b * document_lengths[documents] / max(average_length, 1e-9)
+                )
+            )
+        )
+        order = np.argsort(terms, kind="stable")
+        pointers = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)), out=pointers[1:])
+        self._matrix = (pointers, documents[order], weights[order])
+
+    def get_scores(self, queries: List[str]) -> np.ndarray:
+        """BM25 scores of every document slot for every query, shape (len(queries), slots)"""
+        with self.lock:
+            if self._matrix is None:
+                self._build_matrix()
+            pointers, documents, weights = self._matrix
+            scores = np.zeros((len(queries), len(self.rows)))
+            for i, query in enumerate(queries):
+                # Sparse matrix-vector product, column by column in query order
+                for term in tokenize(query):
+                    term_id = self.vocabulary.get(term)
+                    if term_id is not None:
+                        column = slice(pointers[term_id], pointers[term_id + 1])
+                        scores[i, documents[column]] += weights[column]
+            return scores
+
+    def score_texts(self, queries: List[str], texts: List[str]) -> np.ndarray:
+        """Update the corpus to `texts` and return the scores of each text for each query"""
+        with self.lock:
+            self.update(texts)
+            slots = np.fromiter((self.slots[t] for t in texts), np.int64, len(texts))
+            return self.get_scores(queries)[:, slots]
+
+    def top_k(
+        self, query: str, texts: List[str], top_k: int
+    ) -> List[Tuple[int, float]]:
+        """(position in `texts`, score) of the `top_k` best texts, in the same order as BM25Retriever"""
+        if not texts:
+            return []
+        scores = self.score_texts([query], texts)[0]
+        return [(int(i), float(scores[i])) for i in scores.argsort()[::-1][:top_k]]
+
+
+_default_bm25_index: Optional[BM25Index] = None
+
+
+def get_default_bm25_index() -> BM25Index:
+    """BM25 index shared by the chunk retrievers of the process"""
+    global _default_bm25_index
+    if _default_bm25_index is None:
+        _default_bm25_index = BM25Index()
+    return _default_bm25_index
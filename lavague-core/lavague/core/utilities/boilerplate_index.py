@@ -0,0 +1,181 @@
+from collections import Counter, OrderedDict
+from pathlib import Path
+from threading import RLock
+from typing import Dict, FrozenSet, Iterable, List, Optional
+from urllib.parse import urldefrag, urlparse
+from lavague.core.utilities.html_chunker import XPATH_ATTRIBUTE
+from lavague.core.utilities.retrieval_cache import fingerprint
+import os
+import re
+
+DEFAULT_BOILERPLATE_INDEX_PATH = os.getenv(
+    "LAVAGUE_BOILERPLATE_INDEX_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "lavague", "boilerplate"),
+)
+
+FINGERPRINT_SIZE = 16
+
+# files are rewritten with the retained pages only once they have this many times `max_pages` lines
+COMPACTION_FACTOR = 4
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def chunk_fingerprint(chunk: str) -> str:
+    """Fingerprint of a chunk ignoring whitespace and annotated xpaths, which change with the layout of the page"""
+    text = WHITESPACE.sub(" ", XPATH_ATTRIBUTE.sub("", chunk)).strip()
+    return fingerprint(text)[:FINGERPRINT_SIZE]
+
+
+class SiteChunks:
+    """Chunk fingerprints of the last `max_pages` pages seen on a site, with the number of pages each is on"""
+
+    def __init__(self, max_pages: int):
+        self.max_pages = max_pages
+        self.pages: OrderedDict[str, FrozenSet[str]] = OrderedDict()
+        self.counts: Counter = Counter()
+
+    def set_page(self, page: str, fingerprints: FrozenSet[str]) -> bool:
+        """Replace the chunks of a page, returns whether they changed"""
+        previous = self.pages.pop(page, None)
+        self.pages[page] = fingerprints
+        if previous == fingerprints:
+            return False
+        if previous is not None:
+            self._remove(previous)
+        self.counts.update(fingerprints)
+        while len(self.pages) > self.max_pages:
+            self._remove(self.pages.popitem(last=False)[1])
+        return True
+
+    def _remove(self, fingerprints: FrozenSet[str]):
+        for f in fingerprints:
+            self.counts[f] -= 1
+            if self.counts[f] <= 0:
+                del self.counts[f]
+
+
+class BoilerplateIndex:
+    """
+    Site-level index of the chunks repeated across pages: navigation bars, cookie banners, menus...
+
+    Pages are grouped by domain and identified by their URL without fragment, a page seen again replaces
+    its previous chunks so that steps on the same page are counted once. A chunk is boilerplate once
+    the site has at least `min_pages` pages and the chunk is on at least `min_share` of them.
+    Only the last `max_pages` pages of each site are kept.
+
+    Pages are appended to one text file per domain in `path`, with a single write per page, so that
+    the index is shared across runs and processes. A file is rewritten with only the retained pages once
+    it has `COMPACTION_FACTOR` times `max_pages` lines. Set `path` to None to only keep it in memory.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_BOILERPLATE_INDEX_PATH,
+        min_pages: int = 3,
+        min_share: float = 0.6,
+        max_pages: int = 200,
+    ):
+        self.path = Path(path) if path else None
+        self.min_pages = min_pages
+        self.min_share = min_share
+        self.max_pages = max_pages
+        self.sites: Dict[str, SiteChunks] = {}
+        self._read_sizes: Dict[str, int] = {}
+        self._read_lines: Dict[str, int] = {}
+        self._read_inodes: Dict[str, int] = {}
+        self.lock = RLock()
+
+    @staticmethod
+    def get_domain(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def _get_file(self, domain: str) -> Optional[Path]:
+        if self.path is None:
+            return None
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", domain) or "_"
+        return self.path / f"{name}.txt"
+
+    def _get_site(self, domain: str) -> SiteChunks:
+        """Chunks of a site, with the pages appended to its file since the last call, possibly by other processes"""
+        site = self.sites.get(domain)
+        if site is None:
+            site = self.sites[domain] = SiteChunks(self.max_pages)
+        file = self._get_file(domain)
+        if file is None or not file.exists():
+            return site
+        stat = file.stat()
+        if self._read_inodes.get(domain) != stat.st_ino:
+            # new or compacted by another process, read again from the start
+            site = self.sites[domain] = SiteChunks(self.max_pages)
+            self._read_sizes[domain] = self._read_lines[domain] = 0
+            self._read_inodes[domain] = stat.st_ino
+        read_size = self._read_sizes[domain]
+        if stat.st_size > read_size:
+            with open(file, "rb") as f:
+                f.seek(read_size)
+                data = f.read()
+            # a partially written last line is read on next call
+            data = data[: data.rfind(b"\n") + 1]
+            lines = data.decode("utf-8").splitlines()
+            for line in lines:
+                page, _, fingerprints = line.partition("\t")
+                site.set_page(page, frozenset(fingerprints.split()))
+            self._read_sizes[domain] = read_size + len(data)
+            self._read_lines[domain] += len(lines)
+            if self._read_lines[domain] >= COMPACTION_FACTOR * self.max_pages:
+                self._compact(domain, site, file)
+        return site
+
+    def _compact(self, domain: str, site: SiteChunks, file: Path):
+        """Replace the file of a site with its retained pages, pages appended meanwhile by other processes are lost"""
+        data = "".join(self._format_page(p, f) for p, f in site.pages.items())
+        temporary = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+        temporary.write_bytes(data.encode("utf-8"))
+        stat = temporary.stat()
+        os.replace(temporary, file)
+        self._read_sizes[domain] = stat.st_size
+        self._read_lines[domain] = len(site.pages)
+        self._read_inodes[domain] = stat.st_ino
+
+    @staticmethod
+    def _format_page(page: str, fingerprints: FrozenSet[str]) -> str:
+        line = page.replace("\t", " ").replace("\n", " ")
+        return line + "\t" + " ".join(sorted(fingerprints)) + "\n"
+
+    def add_page(self, url: str, fingerprints: Iterable[str]):
+        """Record the chunks of a page, given by `chunk_fingerprint`"""
+        page = urldefrag(url)[0]
+        domain = self.get_domain(page)
+        fingerprints = frozenset(fingerprints)
+        with self.lock:
+            site = self._get_site(domain)
+            if not site.set_page(page, fingerprints):
+                return
+            file = self._get_file(domain)
+            if file is not None:
+                file.parent.mkdir(parents=True, exist_ok=True)
+                with open(file, "ab") as f:
+                    f.write(self._format_page(page, fingerprints).encode("utf-8"))
+
+    def get_shares(self, url: str, fingerprints: List[str]) -> List[float]:
+        """Share of the pages of the site containing each chunk, 0 until the site has `min_pages` pages"""
+        with self.lock:
+            site = self._get_site(self.get_domain(url))
+            if len(site.pages) < self.min_pages:
+                return [0.0] * len(fingerprints)
+            return [site.counts[f] / len(site.pages) for f in fingerprints]
+
+    def is_boilerplate(self, url: str, fingerprints: List[str]) -> List[bool]:
+        return [share >= self.min_share for share in self.get_shares(url, fingerprints)]
+
+
+_default_boilerplate_index: Optional[BoilerplateIndex] = None
+
+
+def get_default_boilerplate_index() -> BoilerplateIndex:
+    """Boilerplate index shared by the retrievers of the process"""
+    global _default_boilerplate_index
+    if _default_boilerplate_index is None:
+        _default_boilerplate_index = BoilerplateIndex()
+    return _default_boilerplate_index
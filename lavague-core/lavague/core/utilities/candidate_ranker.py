@@ -0,0 +1,344 @@
+from html import unescape
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from lavague.core.base_driver import RectsByXpath
+from lavague.core.utilities.bm25 import stem, tokenize
+from lavague.core.utilities.html_chunker import HtmlElements
+import numpy as np
+import math
+import os
+import re
+
+DEFAULT_CANDIDATE_RANKER_PATH = os.getenv("LAVAGUE_CANDIDATE_RANKER_PATH")
+
+ATTRIBUTE = re.compile(
+    r"""([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+)))?"""
+)
+TAG = re.compile(r"<[^>]*>")
+START_TAG = re.compile(r"<([^\s/>]+)(.*)>", re.S)
+WHITESPACE = re.compile(r"\s+")
+
+# Only the start of the content of an element is read, its text being mostly in the first characters
+MAX_CONTENT_SIZE = 1000
+
+# Attributes naming the element for the user, and the ones naming it for the developer
+LABEL_ATTRIBUTES = ("aria-label", "placeholder", "title", "alt", "value")
+NAME_ATTRIBUTES = ("id", "name", "class", "href", "for", "data-testid")
+
+TAGS = ("a", "button", "input", "select", "textarea", "option", "label", "img")
+TAGS += ("li", "div", "span")
+ROLES = ("button", "link", "checkbox", "textbox", "menuitem", "tab", "option")
+ROLE_GROUPS = {
+    "radio": "checkbox",
+    "switch": "checkbox",
+    "searchbox": "textbox",
+    "combobox": "textbox",
+    "menuitemcheckbox": "menuitem",
+    "menuitemradio": "menuitem",
+}
+TEXT_INPUT_TYPES = frozenset(
+    ["text", "search", "email", "password", "tel", "url", "number", "date"]
+)
+CHECK_INPUT_TYPES = frozenset(["checkbox", "radio"])
+BUTTON_INPUT_TYPES = frozenset(["submit", "button", "reset", "image"])
+
+TYPING_WORDS = frozenset(
+    stem(word) for word in ["type", "enter", "fill", "write", "search", "input"]
+)
+SELECTING_WORDS = frozenset(
+    stem(word) for word in ["select", "choose", "pick", "option", "dropdown"]
+)
+
+# Rects are scaled by a reference viewport, the driver viewport size being unknown offline
+REFERENCE_WIDTH = 1280
+REFERENCE_HEIGHT = 800
+
+QUERY_FEATURES = [
+    "text_query_share",
+    "text_element_share",
+    "label_query_share",
+    "name_query_share",
+    "exact_text",
+    "typing_match",
+    "selecting_match",
+]
+STATIC_FEATURES = (
+    ["bias", "empty_text", "log_text_length"]
+    + [f"tag_{tag}" for tag in TAGS]
+    + ["tag_other", "input_text", "input_check", "input_button"]
+    + [f"role_{role}" for role in ROLES]
+    + ["role_other", "depth", "document_position"]
+    + ["has_rect", "x", "y", "log_area", "in_viewport"]
+)
+FEATURE_NAMES = QUERY_FEATURES + STATIC_FEATURES
+STATIC_INDEX = {name: i for i, name in enumerate(STATIC_FEATURES)}
+
+# Used until weights are trained with `CandidateRanker.fit`: mostly lexical overlap with the query
+DEFAULT_WEIGHTS = {
+    "text_query_share": 4.0,
+    "text_element_share": 1.0,
+    "label_query_share": 3.0,
+    "name_query_share": 1.5,
+    "exact_text": 2.0,
+    "typing_match": 2.0,
+    "selecting_match": 1.5,
+    "empty_text": -0.5,
+    "tag_div": -0.5,
+    "tag_span": -0.3,
+    "tag_other": -0.5,
+    "in_viewport": 0.5,
+}
+
+
+def _keywords(text: str) -> Set[str]:
+    return set(tokenize(text.replace("_", " ").replace("-", " ")))
+
+
+class Candidates:
+    """
+    Interactive candidates of a page, the elements annotated with an xpath, with their query-independent
+    features computed once for all queries. `rects` are the bounding boxes of the elements by xpath,
+    see `BaseDriver.get_interaction_rects`. The first element is kept when an xpath is repeated.
+    """
+
+    def __init__(self, html: str, rects: Optional[RectsByXpath] = None):
+        elements = HtmlElements(html)
+        self.xpaths: List[str] = []
+        self.html: List[str] = []
+        self.tags: List[str] = []
+        # visible text and label attribute values, lowercased with collapsed whitespace
+        self.texts: List[str] = []
+        self.labels: List[List[str]] = []
+        self.text_keywords: List[Set[str]] = []
+        self.label_keywords: List[Set[str]] = []
+        self.name_keywords: List[Set[str]] = []
+        rows = []
+        seen = set()
+        for element, xpath in zip(elements.marked_elements, elements.marked_xpaths):
+            if xpath in seen:
+                continue
+            seen.add(xpath)
+            start, open_end = elements.start[element], elements.open_end[element]
+            content = html[
+                open_end : min(
+                    elements.close_start[element], open_end + MAX_CONTENT_SIZE
+                )
+            ]
+            tag, attributes = self._parse_start_tag(html[start:open_end])
+            text = WHITESPACE.sub(" ", unescape(TAG.sub(" ", content))).strip().lower()
+            labels = [
+                WHITESPACE.sub(" ", attributes[a]).strip().lower()
+                for a in LABEL_ATTRIBUTES
+                if attributes.get(a)
+            ]
+            self.xpaths.append(xpath)
+            self.html.append(html[start : elements.end[element]])
+            self.tags.append(tag)
+            self.texts.append(text)
+            self.labels.append(labels)
+            self.text_keywords.append(_keywords(text))
+            self.label_keywords.append(_keywords(" ".join(labels)))
+            self.name_keywords.append(
+                _keywords(" ".join(attributes.get(a, "") for a in NAME_ATTRIBUTES))
+            )
+            rows.append(
+                self._static_features(
+                    tag, attributes, xpath, rects.get(xpath) if rects else None
+                )
+            )
+        self.static = np.array(rows, dtype=np.float64).reshape(-1, len(STATIC_FEATURES))
+        if len(rows) > 1:
+            self.static[:, STATIC_INDEX["document_position"]] = np.linspace(
+                0, 1, len(rows)
+            )
+        self.typeable = self._has_any("tag_textarea", "input_text", "role_textbox")
+        self.selectable = self._has_any("tag_select", "tag_option", "role_option")
+
+    def __len__(self) -> int:
+        return len(self.xpaths)
+
+    @staticmethod
+    def _parse_start_tag(start_tag: str) -> Tuple[str, Dict[str, str]]:
+        tag, rest = START_TAG.match(start_tag).groups()
+        attributes = {}
+        for match in ATTRIBUTE.finditer(rest):
+            name, *values = match.groups()
+            attributes[name.lower()] = unescape(
+                next((v for v in values if v is not None), "")
+            )
+        return tag.lower(), attributes
+
+    def _static_features(
+        self,
+        tag: str,
+        attributes: Dict[str, str],
+        xpath: str,
+        rect: Optional[Tuple[float, float, float, float]],
+    ) -> np.ndarray:
+        row = np.zeros(len(STATIC_FEATURES))
+
+        def set_feature(name: str, value: float = 1.0):
+            row[STATIC_INDEX[name]] = value
+
+        set_feature("bias")
+        text_length = len(self.text_keywords[-1])
+        set_feature("empty_text", not text_length and not self.label_keywords[-1])
+        set_feature("log_text_length", math.log1p(text_length) / 5)
+        set_feature(f"tag_{tag}" if tag in TAGS else "tag_other")
+        if tag == "input":
+            input_type = attributes.get("type", "text").lower()
+            if input_type in TEXT_INPUT_TYPES:
+                set_feature("input_text")
+            elif input_type in CHECK_INPUT_TYPES:
+                set_feature("input_check")
+            elif input_type in BUTTON_INPUT_TYPES:
+                set_feature("input_button")
+        role = attributes.get("role", "").lower()
+        if role:
+            role = ROLE_GROUPS.get(role, role)
+            set_feature(f"role_{role}" if role in ROLES else "role_other")
+        set_feature("depth", min(xpath.count("/"), 30) / 30)
+        if rect is not None:
+            x, y, width, height = rect
+            center_x = (x + width / 2) / REFERENCE_WIDTH
+            center_y = (y + height / 2) / REFERENCE_HEIGHT
+            set_feature("has_rect")
+            set_feature("x", min(max(center_x, 0), 2))
+            set_feature("y", min(max(center_y, -1), 4))
+            set_feature("log_area", math.log1p(max(width * height, 0)) / 15)
+            set_feature("in_viewport", 0 <= center_x <= 1 and 0 <= center_y <= 1)
+        return row
+
+    def _has_any(self, *names: str) -> np.ndarray:
+        return self.static[:, [STATIC_INDEX[name] for name in names]].any(axis=1)
+
+    def features(self, query: str) -> np.ndarray:
+        """Feature matrix of the candidates for a query, one row per candidate in `FEATURE_NAMES` order"""
+        query_keywords = _keywords(query)
+        query_text = WHITESPACE.sub(" ", query).lower()
+        size = max(len(query_keywords), 1)
+        dynamic = np.zeros((len(self), len(QUERY_FEATURES)))
+        for i, (text, keywords, labels, names) in enumerate(
+            zip(self.texts, self.text_keywords, self.label_keywords, self.name_keywords)
+        ):
+            if keywords:
+                common = len(query_keywords & keywords)
+                dynamic[i, 0] = common / size
+                dynamic[i, 1] = common / len(keywords)
+            if labels:
+                dynamic[i, 2] = len(query_keywords & labels) / size
+            if names:
+                dynamic[i, 3] = len(query_keywords & names) / size
+            dynamic[i, 4] = bool(text) and len(text) < 100 and text in query_text
+        dynamic[:, 5] = self.typeable * bool(query_keywords & TYPING_WORDS)
+        dynamic[:, 6] = self.selectable * bool(query_keywords & SELECTING_WORDS)
+        return np.hstack([dynamic, self.static])
+
+
+class CandidateRanker:
+    """
+    Linear ranker of the interactive candidates of a page for an instruction, see `Candidates` for the features.
+
+    Weights are trained offline with `fit` on (instruction, annotated HTML, xpath) rows such as the
+    `RetrieverEvaluator` datasets, by minimizing the cross-entropy of the softmax of the scores of each page,
+    and stored as a small `.npz` file with `save`. Without weights, `DEFAULT_WEIGHTS` are used.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        weights = DEFAULT_WEIGHTS if weights is None else weights
+        self.weights = np.array([weights.get(name, 0.0) for name in FEATURE_NAMES])
+
+    def __repr__(self) -> str:
+        return f"CandidateRanker({self.weights.round(6).tolist()})"
+
+    def get_weights(self) -> Dict[str, float]:
+        return dict(zip(FEATURE_NAMES, self.weights.tolist()))
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, weights=self.weights, feature_names=np.array(FEATURE_NAMES))
+
+    @classmethod
+    def load(cls, path: str) -> "CandidateRanker":
+        """Load weights saved with `save`, features missing from the file get a null weight"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                dict(zip(data["feature_names"].tolist(), data["weights"].tolist()))
+            )
+
+    def score(self, query: str, candidates: Candidates) -> np.ndarray:
+        return candidates.features(query) @ self.weights
+
+    def rank(self, query: str, candidates: Candidates, top_k: int) -> List[int]:
+        """Indices of the `top_k` best candidates, best first"""
+        scores = self.score(query, candidates)
+        if top_k >= len(scores):
+            return np.argsort(-scores, kind="stable").tolist()
+        best = np.argpartition(-scores, top_k)[:top_k]
+        return best[np.argsort(-scores[best], kind="stable")].tolist()
+
+    @classmethod
+    def fit(
+        cls,
+        rows: Iterable[Sequence],
+        epochs: int = 300,
+        learning_rate: float = 0.05,
+        l2: float = 1e-3,
+    ) -> "CandidateRanker":
+        """
+        Train on (instruction, annotated HTML, xpath) rows, optionally followed by the rects of the page.
+        xpaths are compared without `[1]` like in `RetrieverEvaluator`, rows whose xpath is not
+        among the candidates are skipped. Weights start from `DEFAULT_WEIGHTS` and are optimized with Adam.
+        """
+        features, offsets, targets = [], [0], []
+        for row in rows:
+            instruction, html, xpath = row[:3]
+            candidates = Candidates(html, row[3] if len(row) > 3 else None)
+            xpaths = [normalize_xpath(x) for x in candidates.xpaths]
+            target = normalize_xpath(xpath)
+            if target not in xpaths:
+                continue
+            features.append(candidates.features(instruction))
+            targets.append(offsets[-1] + xpaths.index(target))
+            offsets.append(offsets[-1] + len(candidates))
+        if not features:
+            raise ValueError("No row has its xpath among the candidates of its page")
+        matrix = np.vstack(features)
+        starts = np.array(offsets[:-1])
+        pages = np.repeat(np.arange(len(starts)), np.diff(offsets))
+        ranker = cls()
+        weights = ranker.weights.copy()
+        moment, velocity = np.zeros_like(weights), np.zeros_like(weights)
+        for epoch in range(1, epochs + 1):
+            scores = matrix @ weights
+            scores -= np.maximum.reduceat(scores, starts)[pages]
+            exp = np.exp(scores)
+            probabilities = exp / np.add.reduceat(exp, starts)[pages]
+            probabilities[targets] -= 1
+            gradient = matrix.T @ probabilities / len(starts) + 2 * l2 * weights
+            moment = 0.9 * moment + 0.1 * gradient
+            velocity = 0.999 * velocity + 0.001 * gradient**2
+            step = moment / (1 - 0.9**epoch)
+            weights -= (
+                learning_rate * step / (np.sqrt(velocity / (1 - 0.999**epoch)) + 1e-8)
+            )
+        ranker.weights = weights
+        return ranker
+
+
+def normalize_xpath(xpath: str) -> str:
+    return xpath.replace("[1]", "")
+
+
+_default_candidate_ranker: Optional[CandidateRanker] = None
+
+
+def get_default_candidate_ranker() -> CandidateRanker:
+    """Ranker loaded from LAVAGUE_CANDIDATE_RANKER_PATH if set, with `DEFAULT_WEIGHTS` otherwise"""
+    global _default_candidate_ranker
+    if _default_candidate_ranker is None:
+        _default_candidate_ranker = (
+            CandidateRanker.load(DEFAULT_CANDIDATE_RANKER_PATH)
+            if DEFAULT_CANDIDATE_RANKER_PATH
+            else CandidateRanker()
+        )
+    return _default_candidate_ranker
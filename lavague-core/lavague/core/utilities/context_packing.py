@@ -0,0 +1,137 @@
+from typing import Callable, List, Optional
+from lavague.core.utilities.html_chunker import HtmlChunker
+from lavague.core.utilities.retrieval_cache import LRUCache, fingerprint
+import tiktoken
+
+# used by gpt-4* models
+DEFAULT_TOKENIZER = "o200k_base"
+
+# no packing by default, the retrievers already bound the number of chunks
+DEFAULT_CONTEXT_TOKEN_BUDGET = None
+
+
+class ContextPacker:
+    """
+    Fit retrieved chunks into a token budget before they are joined into the prompt.
+
+    Chunks are expected from the most to the least relevant. They are packed greedily in that order,
+    a chunk that does not fit is skipped so that smaller, lower-ranked chunks can still use the remaining budget.
+    Duplicates and chunks contained in a chunk already packed are dropped, a chunk containing packed chunks
+    replaces them and takes the best of their ranks.
+    If not even the best chunk fits, it is cut on an element boundary, or dropped if its first element does not fit.
+    Tokens are counted with `tokenizer`, by default the same tiktoken encoding as `TokenCounter`.
+    `token_budget` is usually set from the context window of the LLM, with None (the default) every chunk is kept.
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = DEFAULT_CONTEXT_TOKEN_BUDGET,
+        tokenizer: Optional[Callable[[str], List]] = None,
+        separator: str = "\n",
+        max_cached_counts: int = 10_000,
+    ):
+        self.token_budget = token_budget
+        self._tokenizer = tokenizer
+        self.separator = separator
+        self.counts = LRUCache(max_cached_counts)
+        # statistics of the last call to `pack`
+        self.stats = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether `pack` can drop chunks, i.e. a token budget is set"""
+        return self.token_budget is not None
+
+    @property
+    def tokenizer(self) -> Callable[[str], List]:
+        if self._tokenizer is None:
+            self._tokenizer = tiktoken.get_encoding(DEFAULT_TOKENIZER).encode
+        return self._tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        key = fingerprint(text)
+        count = self.counts.get(key)
+        if count is None:
+            count = len(self.tokenizer(text))
+            self.counts.put(key, count)
+        return count
+
+    def truncate(self, text: str, token_budget: int) -> str:
+        """
+        Longest prefix of the HTML `text` within the budget ending on a piece boundary of `HtmlChunker`:
+        the pieces are sized from the budget, and the first one that does not fit is truncated the same way,
+        so that smaller elements are never cut. Empty if the first start tag or word does not fit.
+        """
+        tokens = self.count_tokens(text)
+        if tokens <= token_budget:
+            return text
+        if token_budget <= 0:
+            return ""
+        chunk_size = max(1, len(text) * token_budget // tokens)
+        ends = [hi for _, hi in HtmlChunker(chunk_size).layout(text).pieces]
+        # number of pieces of the prefix
+        lo, hi = 0, len(ends)
+        while lo < hi:
+            middle = (lo + hi + 1) // 2
+            if self.count_tokens(text[: ends[middle - 1]]) <= token_budget:
+                lo = middle
+            else:
+                hi = middle - 1
+        prefix = text[: ends[lo - 1]] if lo else ""
+        piece = text[len(prefix) : ends[lo]]
+        if len(piece) < len(text):
+            tail = self.truncate(piece, token_budget - self.count_tokens(prefix))
+            # tokens may merge across the cut
+            if tail and self.count_tokens(prefix + tail) <= token_budget:
+                prefix += tail
+        return prefix.rstrip()
+
+    def pack(self, chunks: List[str]) -> List[str]:
+        """Best chunks fitting in the token budget once joined with `separator`, in their original order of relevance"""
+        if self.token_budget is None:
+            self.stats = {"retrieved_chunks": len(chunks)}
+            return list(chunks)
+        separator_tokens = self.count_tokens(self.separator) if chunks else 0
+        # (rank, chunk, tokens) of the packed chunks
+        packed = []
+        used = 0
+        duplicates = 0
+        for rank, chunk in enumerate(chunks):
+            if any(chunk in other for _, other, _ in packed):
+                duplicates += 1
+                continue
+            contained = [p for p in packed if p[1] in chunk]
+            tokens = self.count_tokens(chunk)
+            freed = sum(p[2] + separator_tokens for p in contained)
+            if used - freed + tokens + (separator_tokens if packed else 0) > (
+                self.token_budget
+            ):
+                continue
+            if contained:
+                duplicates += len(contained)
+                packed = [p for p in packed if p not in contained]
+                used -= freed
+                rank = min(p[0] for p in contained)
+            used += tokens + (separator_tokens if packed else 0)
+            packed.append((rank, chunk, tokens))
+
+        if not packed and chunks and self.token_budget > 0:
+            best = self.truncate(chunks[0], self.token_budget)
+            if best:
+                packed.append((0, best, self.count_tokens(best)))
+
+        packed.sort()
+        result = [chunk for _, chunk, _ in packed]
+        # Tokens may merge across separators, the joined context is the reference
+        while len(result) > 1 and (
+            self.count_tokens(self.separator.join(result)) > self.token_budget
+        ):
+            result.pop()
+        self.stats = {
+            "token_budget": self.token_budget,
+            "context_tokens": self.count_tokens(self.separator.join(result)),
+            "retrieved_chunks": len(chunks),
+            "packed_chunks": len(result),
+            "deduplicated_chunks": duplicates,
+        }
+        return result
@@ -0,0 +1,247 @@
+from typing import Dict, List, Optional, Tuple
+from bs4 import BeautifulSoup, NavigableString, Tag
+import re
+
+# Only characters changed by the default formatter when serializing strings
+ESCAPED_CHARACTERS = re.compile("[&<>]")
+
+
+class DomIndex:
+    """
+    Flat index of a parsed HTML document used to expand context around xpath-annotated elements
+    without re-serializing or re-searching the tree.
+
+    Nodes are numbered in document order, node 0 being the document itself. For every node we keep:
+    - its parent and siblings,
+    - its span `[start, end)` in the serialized document, so that `str(element)` is a slice of `html`,
+    - the range `[marked_lo, marked_hi)` of xpath-annotated elements it contains, numbered by DFS enter/exit.
+    """
+
+    def __init__(self, html: str):
+        self.html = html
+        self.parent: List[int] = []
+        self.previous_sibling: List[int] = []
+        self.next_sibling: List[int] = []
+        self.start: List[int] = []
+        self.end: List[int] = []
+        self.marked_lo: List[int] = []
+        self.marked_hi: List[int] = []
+        # Strings are not serialized the same way standalone and in their parent (entities, comments)
+        self.text: Dict[int, str] = {}
+        # xpath-annotated elements, in document order
+        self.marked_nodes: List[int] = []
+        self.marked_xpaths: List[str] = []
+
+    def add_node(self, parent: int, start: int) -> int:
+        node = len(self.parent)
+        self.parent.append(parent)
+        self.previous_sibling.append(-1)
+        self.next_sibling.append(-1)
+        self.start.append(start)
+        self.end.append(start)
+        self.marked_lo.append(len(self.marked_xpaths))
+        self.marked_hi.append(len(self.marked_xpaths))
+        return node
+
+    def piece(self, node: int) -> str:
+        """Same as `str(element)`"""
+        if node in self.text:
+            return self.text[node]
+        return self.html[self.start[node] : self.end[node]]
+
+    def is_truthy(self, node: int) -> bool:
+        """Same as `bool(element)`: tags are always truthy, strings only when not empty"""
+        return node >= 0 and (node not in self.text or len(self.text[node]) > 0)
+
+    @classmethod
+    def from_soup(cls, soup: BeautifulSoup) -> Optional["DomIndex"]:
+        """
+        Build the index from a BeautifulSoup tree. Spans are computed by walking the serialization of the whole
+        document once, None is returned if the serialization does not have the expected layout.
+        """
+        html = str(soup)
+        index = cls(html)
+        position = 0
+        # stack of (bs4 element, parent node, entered node or None)
+        stack = [(soup, -1, None)]
+        last_child: Dict[int, int] = {}
+        while stack:
+            element, parent, entered = stack.pop()
+            if entered is not None:
+                # closing a tag once all of its children have been visited
+                if not element.is_empty_element and not element.hidden:
+                    prefix = element.prefix + ":" if element.prefix else ""
+                    position += len(prefix) + len(element.name) + 3
+                index.end[entered] = position
+                index.marked_hi[entered] = len(index.marked_xpaths)
+                continue
+
+            node = index.add_node(parent, position)
+            if parent >= 0:
+                previous = last_child.get(parent, -1)
+                index.previous_sibling[node] = previous
+                if previous >= 0:
+                    index.next_sibling[previous] = node
+                last_child[parent] = node
+
+            if isinstance(element, Tag):
+                if "xpath" in element.attrs:
+                    index.marked_nodes.append(node)
+                    index.marked_xpaths.append(element["xpath"])
+                if not element.hidden:
+                    if not html.startswith("<", position):
+                        return None
+                    position = html.index(">", position) + 1
+                stack.append((element, parent, node))
+                stack.extend(
+                    (child, node, None) for child in reversed(element.contents)
+                )
+            else:
+                text = str(element)
+                if type(element) is NavigableString and not ESCAPED_CHARACTERS.search(
+                    text
+                ):
+                    position += len(text)
+                else:
+                    position += len(element.output_ready())
+                index.end[node] = position
+                index.text[node] = text
+
+        if position != len(html):
+            return None
+        return index
+
+
+class ProcessedXPaths:
+    """
+    Set of processed xpaths supporting "is any element of a marked range processed" queries in O(log n)
+    (Fenwick tree) and marking whole ranges in amortized O(log n) per newly processed element (skip pointers).
+    """
+
+    def __init__(self, marked_xpaths: List[str]):
+        self.n = len(marked_xpaths)
+        self.tree = [0] * (self.n + 1)
+        self.skip = list(range(self.n + 1))
+        self.xpaths = marked_xpaths
+        self.positions: Dict[str, List[int]] = {}
+        for i, xpath in enumerate(marked_xpaths):
+            self.positions.setdefault(xpath, []).append(i)
+        self.processed = set()
+
+    def __contains__(self, xpath: str) -> bool:
+        return xpath in self.processed
+
+    def _next_unprocessed(self, i: int) -> int:
+        root = i
+        while self.skip[root] != root:
+            root = self.skip[root]
+        while self.skip[i] != root:
+            self.skip[i], i = root, self.skip[i]
+        return root
+
+    def _count(self, i: int) -> int:
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def is_disjoint(self, lo: int, hi: int) -> bool:
+        return lo >= hi or self._count(hi) == self._count(lo)
+
+    def add(self, xpath: str):
+        if xpath in self.processed:
+            return
+        self.processed.add(xpath)
+        for i in self.positions.get(xpath, []):
+            self.skip[i] = i + 1
+            j = i + 1
+            while j <= self.n:
+                self.tree[j] += 1
+                j += j & -j
+
+    def add_range(self, lo: int, hi: int):
+        i = self._next_unprocessed(lo)
+        while i < hi:
+            self.add(self.xpaths[i])
+            i = self._next_unprocessed(i + 1)
+
+
+def expand_xpath_chunks(index: DomIndex, chunk_size: int) -> List[str]:
+    """
+    Expand the context around every xpath-annotated element, see `FromXPathNodesExpansionRetriever`.
+    Each element starts a chunk which grows with its siblings, closest first, then with its parent,
+    until `chunk_size` characters are reached. Earlier chunks included in a parent chunk are dropped.
+    """
+    processed = ProcessedXPaths(index.marked_xpaths)
+    # (start of the first sibling included in the chunk, chunk)
+    chunks: List[Tuple[int, str]] = []
+
+    def include_html(node: int) -> Optional[str]:
+        lo, hi = index.marked_lo[node], index.marked_hi[node]
+        if processed.is_disjoint(lo, hi):
+            processed.add_range(lo, hi)
+            return index.piece(node)
+
+    # For each marked element
+    for i, node in enumerate(index.marked_nodes):
+        if index.marked_xpaths[i] in processed:
+            continue
+
+        chunk = index.piece(node)
+        chunk_start = index.start[node]
+        processed.add_range(index.marked_lo[node], index.marked_hi[node])
+        expanding = len(chunk) < chunk_size
+
+        # Expand to siblings, then parent until we reach the chunk size
+        while expanding:
+            pieces = [chunk]
+            size = previous_size = len(chunk)
+            previous_sibling = index.previous_sibling[node]
+            next_sibling = index.next_sibling[node]
+
+            # Add siblings to the chunk, from the closest to the farthest ones
+            while size < chunk_size and (
+                index.is_truthy(previous_sibling) or index.is_truthy(next_sibling)
+            ):
+                if index.is_truthy(previous_sibling):
+                    add_html = include_html(previous_sibling)
+                    if add_html:
+                        pieces.append(add_html)
+                        size += len(add_html)
+                        chunk_start = index.start[previous_sibling]
+                        previous_sibling = index.previous_sibling[previous_sibling]
+                    else:
+                        previous_sibling = -1
+                if index.is_truthy(next_sibling):
+                    add_html = include_html(next_sibling)
+                    if add_html:
+                        pieces.append(add_html)
+                        size += len(add_html)
+                        next_sibling = index.next_sibling[next_sibling]
+                    else:
+                        next_sibling = -1
+            chunk = "".join(pieces)
+
+            # Move to parent if no more siblings can be added
+            if size < chunk_size and index.parent[node] >= 0:
+                node = index.parent[node]
+                chunk = index.piece(node)
+                chunk_start = index.start[node]
+                processed.add_range(index.marked_lo[node], index.marked_hi[node])
+
+                # Remove previous chunks that are now included in the parent.
+                # Chunks are appended in document order, so only the last ones can be inside the parent.
+                kept = []
+                while chunks and chunks[-1][0] >= chunk_start:
+                    previous_chunk = chunks.pop()
+                    if previous_chunk[1] not in chunk:
+                        kept.append(previous_chunk)
+                chunks.extend(reversed(kept))
+
+            expanding = len(chunk) < chunk_size and len(chunk) > previous_size
+
+        if chunk.strip():
+            chunks.append((chunk_start, chunk))
+
+    return [chunk for _, chunk in chunks]
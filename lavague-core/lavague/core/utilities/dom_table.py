@@ -0,0 +1,516 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+from bs4.builder import HTMLParserTreeBuilder
+from bs4.builder._htmlparser import BeautifulSoupHTMLParser
+from bs4.element import (
+    AttributeValueWithCharsetSubstitution,
+    CData,
+    Comment,
+    Declaration,
+    Doctype,
+    NavigableString,
+    PreformattedString,
+    ProcessingInstruction,
+    RubyParenthesisString,
+    RubyTextString,
+    Script,
+    Stylesheet,
+    TemplateString,
+)
+from bs4.formatter import HTMLFormatter
+from lavague.core.utilities.xpath_utils import xpath_step
+
+DOCUMENT = 0
+ELEMENT = 1
+# Kinds of string nodes, in the order of their kind id starting at 2
+STRING_CLASSES: List[Type[NavigableString]] = [
+    NavigableString,
+    Comment,
+    CData,
+    ProcessingInstruction,
+    Declaration,
+    Doctype,
+    Script,
+    Stylesheet,
+    TemplateString,
+    RubyTextString,
+    RubyParenthesisString,
+]
+STRING_KINDS = {string_class: i + 2 for i, string_class in enumerate(STRING_CLASSES)}
+# Strings returned by `get_text`, unless the tag is a string container such as script
+TEXT_CLASSES = (NavigableString, CData)
+
+
+class _StartedTag:
+    """What BeautifulSoupHTMLParser needs to know about a tag it just opened"""
+
+    def __init__(self, is_empty_element: bool):
+        self.is_empty_element = is_empty_element
+
+
+_EMPTY_STARTED_TAG = _StartedTag(True)
+_STARTED_TAG = _StartedTag(False)
+
+
+class _MetaTag(dict):
+    """Attributes of a meta tag, to let the tree builder set up charset substitutions"""
+
+    name = "meta"
+
+    def get_attribute_list(self, key: str) -> list:
+        value = self.get(key)
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+
+class DomTable:
+    """
+    Compact array-backed DOM, built once from the HTML of the driver.
+
+    Every node (document, element or string) is a row in parallel arrays: kind, tag name id, parent,
+    first child, last child, previous and next sibling, attribute range and text offsets.
+    Tag names and attribute names and values are interned, the text of all strings lives in one buffer.
+    The tree is the one BeautifulSoup builds with `html.parser`, and `serialize` gives the same HTML as
+    `str(soup)`, at a fraction of the memory of a soup.
+
+    After `serialize`, the table exposes the same interface as `DomIndex` for `expand_xpath_chunks`.
+    """
+
+    def __init__(self):
+        self.kind = array("b")
+        self.name = array("i")
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.last_child = array("i")
+        self.previous_sibling = array("i")
+        self.next_sibling = array("i")
+        self.attribute_start = array("i")
+        self.attribute_count = array("i")
+        self.attribute_names = array("i")
+        self.attribute_values = array("i")
+        self.text_start = array("i")
+        self.text_end = array("i")
+        self.text = ""
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        # xpath attributes by node, set by annotation or parsed from annotated HTML
+        self.xpaths: Dict[int, str] = {}
+        self._serialized = False
+        self.add_node(DOCUMENT, -1)
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def intern(self, string: str) -> int:
+        string_id = self._string_ids.get(string)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(string)
+            self._string_ids[string] = string_id
+        return string_id
+
+    def add_node(self, kind: int, parent: int, name: int = -1) -> int:
+        node = len(self.kind)
+        self.kind.append(kind)
+        self.name.append(name)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.last_child.append(-1)
+        self.next_sibling.append(-1)
+        self.attribute_start.append(len(self.attribute_names))
+        self.attribute_count.append(0)
+        self.text_start.append(0)
+        self.text_end.append(0)
+        if parent >= 0:
+            previous = self.last_child[parent]
+            self.previous_sibling.append(previous)
+            if previous >= 0:
+                self.next_sibling[previous] = node
+            else:
+                self.first_child[parent] = node
+            self.last_child[parent] = node
+        else:
+            self.previous_sibling.append(-1)
+        self._serialized = False
+        return node
+
+    @classmethod
+    def from_html(cls, html: str) -> "DomTable":
+        builder = _DomTableBuilder()
+        builder.feed(html)
+        return builder.table
+
+    def children(self, node: int) -> Iterator[int]:
+        child = self.first_child[node]
+        while child >= 0:
+            yield child
+            child = self.next_sibling[child]
+
+    def is_element(self, node: int) -> bool:
+        return self.kind[node] == ELEMENT
+
+    def tag_name(self, node: int) -> Optional[str]:
+        return self.strings[self.name[node]] if self.kind[node] == ELEMENT else None
+
+    def string_class(self, node: int) -> Optional[Type[NavigableString]]:
+        kind = self.kind[node]
+        return STRING_CLASSES[kind - 2] if kind > ELEMENT else None
+
+    def get_string(self, node: int) -> str:
+        """Text of a string node, same as `str(string)`"""
+        return self.text[self.text_start[node] : self.text_end[node]]
+
+    def attributes(self, node: int) -> Dict[str, str]:
+        start = self.attribute_start[node]
+        end = start + self.attribute_count[node]
+        attributes = {
+            self.strings[name]: self.strings[value]
+            for name, value in zip(
+                self.attribute_names[start:end], self.attribute_values[start:end]
+            )
+        }
+        if node in self.xpaths:
+            attributes["xpath"] = self.xpaths[node]
+        return attributes
+
+    def get_attribute(self, node: int, name: str) -> Optional[str]:
+        if name == "xpath" and node in self.xpaths:
+            return self.xpaths[node]
+        name_id = self._string_ids.get(name)
+        start = self.attribute_start[node]
+        for i in range(start, start + self.attribute_count[node]):
+            if self.attribute_names[i] == name_id:
+                return self.strings[self.attribute_values[i]]
+        return None
+
+    def iter_descendants(self, node: int) -> Iterator[int]:
+        """Descendants of a node in document order"""
+        stack = list(reversed(list(self.children(node))))
+        while stack:
+            descendant = stack.pop()
+            yield descendant
+            child = self.last_child[descendant]
+            while child >= 0:
+                stack.append(child)
+                child = self.previous_sibling[child]
+
+    def get_text(self, node: int = 0) -> str:
+        """Same as BeautifulSoup `get_text()`: text of the strings below a node, without comments or scripts"""
+        if self.kind[node] > ELEMENT:
+            return self.get_string(node)
+        string_container = HTMLParserTreeBuilder.DEFAULT_STRING_CONTAINERS.get(
+            self.tag_name(node)
+        )
+        kinds = (
+            {STRING_KINDS[string_container]}
+            if string_container
+            else {STRING_KINDS[string_class] for string_class in TEXT_CLASSES}
+        )
+        return "".join(
+            self.get_string(descendant)
+            for descendant in self.iter_descendants(node)
+            if self.kind[descendant] in kinds
+        )
+
+    def iter_xpaths(self) -> Iterator[Tuple[int, str]]:
+        """Same as `iter_soup_xpaths`: every element with its xpath, in document order"""
+        stack = [(0, "")]
+        while stack:
+            node, xpath = stack.pop()
+            if node != 0:
+                yield node, xpath
+            counters = {}
+            children = []
+            for child in self.children(node):
+                if self.kind[child] == ELEMENT:
+                    name = self.strings[self.name[child]]
+                    counters[name] = counters.get(name, 0) + 1
+                    children.append((child, xpath + xpath_step(name, counters[name])))
+            stack.extend(reversed(children))
+
+    def set_xpath(self, node: int, xpath: str):
+        self.xpaths[node] = xpath
+        self._serialized = False
+
+    def replace_with_table(self, node: int, other: "DomTable"):
+        """
+        Replace a node (usually an iframe) by the document of another table.
+        Like a BeautifulSoup object inserted in a soup, the children of the document take the place of the node.
+        """
+        offset = len(self)
+        string_ids = array("i", (self.intern(s) for s in other.strings))
+        text_offset = len(self.text)
+        self.text += other.text
+
+        def shift(links: array) -> array:
+            return array("i", (i + offset if i >= 0 else -1 for i in links))
+
+        self.kind.extend(other.kind)
+        self.name.extend(
+            array("i", (string_ids[i] if i >= 0 else i for i in other.name))
+        )
+        self.parent.extend(shift(other.parent))
+        self.first_child.extend(shift(other.first_child))
+        self.last_child.extend(shift(other.last_child))
+        self.previous_sibling.extend(shift(other.previous_sibling))
+        self.next_sibling.extend(shift(other.next_sibling))
+        attribute_offset = len(self.attribute_names)
+        self.attribute_start.extend(
+            array("i", (i + attribute_offset for i in other.attribute_start))
+        )
+        self.attribute_count.extend(other.attribute_count)
+        self.attribute_names.extend(
+            array("i", (string_ids[i] for i in other.attribute_names))
+        )
+        self.attribute_values.extend(
+            array("i", (string_ids[i] for i in other.attribute_values))
+        )
+        self.text_start.extend(array("i", (i + text_offset for i in other.text_start)))
+        self.text_end.extend(array("i", (i + text_offset for i in other.text_end)))
+        for other_node, xpath in other.xpaths.items():
+            self.xpaths[other_node + offset] = xpath
+
+        # Move the children of the document in place of the node
+        parent, previous, next = (
+            self.parent[node],
+            self.previous_sibling[node],
+            self.next_sibling[node],
+        )
+        children = list(self.children(offset))
+        for child in children:
+            self.parent[child] = parent
+        if children:
+            self.previous_sibling[children[0]] = previous
+            self.next_sibling[children[-1]] = next
+            first, last = children[0], children[-1]
+        else:
+            first, last = next, previous
+        if previous >= 0:
+            self.next_sibling[previous] = first
+        elif parent >= 0:
+            self.first_child[parent] = first
+        if next >= 0:
+            self.previous_sibling[next] = last
+        elif parent >= 0:
+            self.last_child[parent] = last
+        self.parent[node] = -1
+        self.first_child[offset] = self.last_child[offset] = -1
+        self._serialized = False
+
+    def serialize(self) -> str:
+        """
+        Serialize the document as BeautifulSoup would. This also computes the span of every node in `html`
+        and the ranges of xpath-annotated elements used by `expand_xpath_chunks`.
+        """
+        if self._serialized:
+            return self.html
+        formatter = HTMLFormatter.REGISTRY["minimal"]
+        size = len(self)
+        self.start = array("i", bytes(4 * size))
+        self.end = array("i", bytes(4 * size))
+        self.marked_lo = array("i", bytes(4 * size))
+        self.marked_hi = array("i", bytes(4 * size))
+        self.marked_nodes: List[int] = []
+        self.marked_xpaths: List[str] = []
+        parts = []
+        position = 0
+        stack = [(0, False)]
+        while stack:
+            node, closing = stack.pop()
+            kind = self.kind[node]
+            if closing:
+                if kind == ELEMENT and not self._is_empty_element(node):
+                    part = "</" + self.strings[self.name[node]] + ">"
+                    parts.append(part)
+                    position += len(part)
+                self.end[node] = position
+                self.marked_hi[node] = len(self.marked_nodes)
+                continue
+
+            self.start[node] = position
+            if kind > ELEMENT:
+                string = self.get_string(node)
+                string_class = STRING_CLASSES[kind - 2]
+                if issubclass(string_class, PreformattedString):
+                    part = string_class.PREFIX + string + string_class.SUFFIX
+                elif (
+                    self.tag_name(self.parent[node]) in formatter.cdata_containing_tags
+                ):
+                    part = string
+                else:
+                    part = formatter.substitute(string)
+                parts.append(part)
+                position += len(part)
+                self.end[node] = position
+                self.marked_lo[node] = self.marked_hi[node] = len(self.marked_nodes)
+                continue
+
+            self.marked_lo[node] = len(self.marked_nodes)
+            if kind == ELEMENT:
+                if node in self.xpaths:
+                    self.marked_nodes.append(node)
+                    self.marked_xpaths.append(self.xpaths[node])
+                part = self._format_start_tag(node, formatter)
+                parts.append(part)
+                position += len(part)
+            stack.append((node, True))
+            child = self.last_child[node]
+            while child >= 0:
+                stack.append((child, False))
+                child = self.previous_sibling[child]
+
+        self.html = "".join(parts)
+        self._serialized = True
+        return self.html
+
+    def _is_empty_element(self, node: int) -> bool:
+        return (
+            self.first_child[node] < 0
+            and self.strings[self.name[node]]
+            in HTMLParserTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS
+        )
+
+    def _format_start_tag(self, node: int, formatter: HTMLFormatter) -> str:
+        attributes = sorted(self.attributes(node).items())
+        part = "<" + self.strings[self.name[node]]
+        for key, value in attributes:
+            part += (
+                " "
+                + key
+                + "="
+                + formatter.quoted_attribute_value(formatter.attribute_value(value))
+            )
+        if self._is_empty_element(node):
+            return part + "/>"
+        return part + ">"
+
+    def piece(self, node: int) -> str:
+        """Same as `str(element)`, available after `serialize`"""
+        if self.kind[node] > ELEMENT:
+            return self.get_string(node)
+        return self.html[self.start[node] : self.end[node]]
+
+    def is_truthy(self, node: int) -> bool:
+        """Same as `bool(element)`: tags are always truthy, strings only when not empty"""
+        return node >= 0 and (
+            self.kind[node] <= ELEMENT or self.text_end[node] > self.text_start[node]
+        )
+
+
+class _DomTableBuilder:
+    """
+    Receives the events of the BeautifulSoup html.parser tree builder and builds the same tree
+    as BeautifulSoup does, but in a `DomTable`.
+    """
+
+    ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+    def __init__(self):
+        self.builder = HTMLParserTreeBuilder()
+        self.table = DomTable()
+        self.text_parts: List[str] = []
+        self.text_size = 0
+        self.current_data: List[str] = []
+        # stack of (node, tag name)
+        self.tag_stack: List[Tuple[int, str]] = [(0, "[document]")]
+        self.open_tag_counter: Dict[str, int] = {}
+        self.preserve_whitespace_depth = 0
+        self.string_container_stack: List[int] = []
+        self.contains_replacement_characters = False
+
+    def feed(self, html: str):
+        args, kwargs = self.builder.parser_args
+        try:
+            parser = BeautifulSoupHTMLParser(self, *args, **kwargs)
+        except TypeError:
+            # Beautiful Soup < 4.13
+            parser = BeautifulSoupHTMLParser(*args, **kwargs)
+            parser.soup = self
+        parser.feed(html)
+        parser.close()
+        self.endData()
+        self.table.text = "".join(self.text_parts)
+
+    def handle_starttag(
+        self,
+        name,
+        namespace,
+        nsprefix,
+        attrs,
+        sourceline=None,
+        sourcepos=None,
+        namespaces=None,
+    ):
+        self.endData()
+        table = self.table
+        node = table.add_node(ELEMENT, self.tag_stack[-1][0], table.intern(name))
+        attrs = self.builder._replace_cdata_list_attribute_values(name, dict(attrs))
+        if name == "meta":
+            meta = _MetaTag(attrs)
+            self.builder.set_up_substitutions(meta)
+            attrs = meta
+        for key, value in attrs.items():
+            if isinstance(value, AttributeValueWithCharsetSubstitution):
+                value = value.substitute_encoding("utf-8")
+            elif isinstance(value, (list, tuple)):
+                value = " ".join(value)
+            if key == "xpath":
+                # Already annotated HTML, the element is marked for context expansion
+                table.xpaths[node] = str(value)
+                continue
+            table.attribute_names.append(table.intern(key))
+            table.attribute_values.append(table.intern(str(value)))
+            table.attribute_count[node] += 1
+
+        self.tag_stack.append((node, name))
+        self.open_tag_counter[name] = self.open_tag_counter.get(name, 0) + 1
+        if name in self.builder.preserve_whitespace_tags:
+            self.preserve_whitespace_depth += 1
+        if name in self.builder.string_containers:
+            self.string_container_stack.append((node, name))
+        return (
+            _EMPTY_STARTED_TAG
+            if self.builder.can_be_empty_element(name)
+            else _STARTED_TAG
+        )
+
+    def handle_endtag(self, name, nsprefix=None):
+        self.endData()
+        for i in range(len(self.tag_stack) - 1, 0, -1):
+            if not self.open_tag_counter.get(name):
+                break
+            popped_name = self._pop_tag()
+            if popped_name == name:
+                break
+
+    def _pop_tag(self) -> str:
+        node, name = self.tag_stack.pop()
+        self.open_tag_counter[name] -= 1
+        if name in self.builder.preserve_whitespace_tags:
+            self.preserve_whitespace_depth -= 1
+        if self.string_container_stack and self.string_container_stack[-1][0] == node:
+            self.string_container_stack.pop()
+        return name
+
+    def handle_data(self, data: str):
+        self.current_data.append(data)
+
+    def endData(self, containerClass=None):
+        if not self.current_data:
+            return
+        data = "".join(self.current_data)
+        self.current_data = []
+        if not self.preserve_whitespace_depth and not data.strip(self.ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        container = containerClass or NavigableString
+        if container is NavigableString and self.string_container_stack:
+            container = self.builder.string_containers[
+                self.string_container_stack[-1][1]
+            ]
+        table = self.table
+        node = table.add_node(STRING_KINDS[container], self.tag_stack[-1][0])
+        table.text_start[node] = self.text_size
+        self.text_size += len(data)
+        table.text_end[node] = self.text_size
+        self.text_parts.append(data)
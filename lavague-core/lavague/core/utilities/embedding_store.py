@@ -0,0 +1,222 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from llama_index.core.embeddings import BaseEmbedding
+from lavague.core.utilities.retrieval_cache import LRUCache, fingerprint
+import numpy as np
+import os
+import re
+
+DEFAULT_EMBEDDING_STORE_PATH = os.getenv(
+    "LAVAGUE_EMBEDDING_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "lavague", "embeddings"),
+)
+
+KEY_SIZE = 16
+
+
+class EmbeddingFile:
+    """
+    Append-only file of (text hash, float32 vector) records for a single embedding model.
+    Records are appended with a single write per batch, so the file can be shared by several processes.
+    A partial record left by an interrupted write is ignored, and dropped before the next append.
+    """
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype([("key", f"S{KEY_SIZE}"), ("vector", "<f4", (dim,))])
+        self.rows: Dict[bytes, int] = {}
+        self._records: Optional[np.memmap] = None
+        self._read_size = 0
+
+    def refresh(self):
+        """Index records appended since the last refresh, possibly by other processes"""
+        if not self.path.exists():
+            return
+        size = self.path.stat().st_size
+        size -= size % self.dtype.itemsize
+        if size < self._read_size:
+            # truncated by another process, index it again
+            self.rows = {}
+            self._records = None
+            self._read_size = 0
+        if size <= self._read_size:
+            return
+        self._records = np.memmap(
+            self.path, dtype=self.dtype, mode="r", shape=(size // self.dtype.itemsize,)
+        )
+        first_row = self._read_size // self.dtype.itemsize
+        for row, key in enumerate(self._records["key"][first_row:], first_row):
+            self.rows[bytes(key)] = row
+        self._read_size = size
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._records["vector"][row])
+
+    def append(self, keys: List[bytes], vectors: np.ndarray):
+        records = np.empty(len(keys), dtype=self.dtype)
+        records["key"] = keys
+        records["vector"] = vectors
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size % self.dtype.itemsize:
+                f.truncate(size - size % self.dtype.itemsize)
+            f.write(records.tobytes())
+
+
+class EmbeddingStore:
+    """
+    Content-addressed store of text embeddings keyed by (embedding model, text hash).
+
+    An in-memory LRU sits in front of one append-only float32 file per model in `path`,
+    so embeddings are shared across steps, agents and runs. Set `path` to None to only keep them in memory.
+    Lookups are counted in `hits` and `misses`.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_EMBEDDING_STORE_PATH,
+        max_memory_entries: int = 50_000,
+    ):
+        self.path = Path(path) if path else None
+        self.memory = LRUCache(max_memory_entries)
+        self.files: Dict[str, EmbeddingFile] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get_file(
+        self, model_name: str, dim: Optional[int] = None
+    ) -> Optional[EmbeddingFile]:
+        if self.path is None:
+            return None
+        if model_name not in self.files:
+            prefix = (
+                re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+                + "-"
+                + fingerprint(model_name)[:8]
+            )
+            if dim is None:
+                existing = sorted(self.path.glob(f"{prefix}-*.f32"))
+                if not existing:
+                    return None
+                dim = int(existing[0].stem.rsplit("-", 1)[1])
+            self.files[model_name] = EmbeddingFile(
+                self.path / f"{prefix}-{dim}.f32", dim
+            )
+        return self.files[model_name]
+
+    def refresh(self, model_name: str):
+        """Index the embeddings of the model stored on disk since the last refresh, possibly by other processes"""
+        file = self._get_file(model_name)
+        if file is not None:
+            file.refresh()
+
+    def get(
+        self, model_name: str, text: str, refresh: bool = True
+    ) -> Optional[List[float]]:
+        """
+        Stored embedding of the text, None if missing. Set `refresh` to False when looking up
+        a batch of texts, after a single call to `refresh`.
+        """
+        key = (model_name, fingerprint(text))
+        embedding = self.memory.get(key)
+        if embedding is None:
+            file = self._get_file(model_name)
+            if file is not None:
+                if refresh:
+                    file.refresh()
+                vector = file.get(bytes.fromhex(key[1]))
+                if vector is not None:
+                    embedding = vector.tolist()
+                    self.memory.put(key, embedding)
+        if embedding is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return embedding
+
+    def put_many(
+        self, model_name: str, texts: List[str], embeddings: List[List[float]]
+    ):
+        if not texts:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        keys = [fingerprint(text) for text in texts]
+        for key, vector in zip(keys, vectors):
+            self.memory.put((model_name, key), vector.tolist())
+        file = self._get_file(model_name, vectors.shape[1])
+        if file is not None:
+            file.append([bytes.fromhex(key) for key in keys], vectors)
+
+    def get_text_embeddings(
+        self, embedding: BaseEmbedding, texts: List[str]
+    ) -> List[List[float]]:
+        """Embed texts with the given model, only the texts missing from the store are sent to the model, as a single batch"""
+        results, missing_texts = self._lookup(embedding.model_name, texts)
+        if missing_texts:
+            new_embeddings = embedding.get_text_embedding_batch(missing_texts)
+            results = self._complete(
+                embedding.model_name, texts, results, missing_texts, new_embeddings
+            )
+        return results
+
+    async def aget_text_embeddings(
+        self, embedding: BaseEmbedding, texts: List[str]
+    ) -> List[List[float]]:
+        """Same as `get_text_embeddings` with the asynchronous API of the model"""
+        results, missing_texts = self._lookup(embedding.model_name, texts)
+        if missing_texts:
+            new_embeddings = await embedding.aget_text_embedding_batch(missing_texts)
+            results = self._complete(
+                embedding.model_name, texts, results, missing_texts, new_embeddings
+            )
+        return results
+
+    def _lookup(
+        self, model_name: str, texts: List[str]
+    ) -> Tuple[List[Optional[List[float]]], List[str]]:
+        """Stored embeddings, None where missing, and the distinct missing texts"""
+        self.refresh(model_name)
+        results = [self.get(model_name, text, refresh=False) for text in texts]
+        missing = {text: None for text, result in zip(texts, results) if result is None}
+        return results, list(missing.keys())
+
+    def _complete(
+        self,
+        model_name: str,
+        texts: List[str],
+        results: List[Optional[List[float]]],
+        missing_texts: List[str],
+        new_embeddings: List[List[float]],
+    ) -> List[List[float]]:
+        self.put_many(model_name, missing_texts, new_embeddings)
+        missing = dict(
+            zip(missing_texts, np.asarray(new_embeddings, dtype=np.float32).tolist())
+        )
+        return [
+            result if result is not None else missing[text]
+            for text, result in zip(texts, results)
+        ]
+
+    def clear_memory(self):
+        self.memory.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self.memory), "hits": self.hits, "misses": self.misses}
+
+
+_default_embedding_store: Optional[EmbeddingStore] = None
+
+
+def get_default_embedding_store() -> EmbeddingStore:
+    """Embedding store shared by every retriever of the process"""
+    global _default_embedding_store
+    if _default_embedding_store is None:
+        _default_embedding_store = EmbeddingStore()
+    return _default_embedding_store
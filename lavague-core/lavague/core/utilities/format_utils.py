@@ -2,6 +2,7 @@ from typing import Callable, List
 import inspect
 import re
 import ast
+from lavague.core.utilities.html_sanitizer import HtmlSanitizer
 
 DEFAULT_ENGINES: List[str] = [
     "Navigation Controls",
@@ -206,6 +207,7 @@ def clean_html(
 ) -> str:
     """
     Clean HTML content by removing specified tags and attributes while keeping specified attributes.
+    The page is cleaned in a single pass, see `HtmlSanitizer`.
 
     Args:
         html_to_clean (str): The HTML content to clean.
@@ -219,12 +221,9 @@ def clean_html(
     >>> from clean_html_for_llm import clean_html
     >>> cleaned_html = clean_html('<div id="main" style="color:red">Hello <script>alert("World")</script></div>', tags_to_remove=['script'], attributes_to_keep=['id'])
     """
-    for tag in tags_to_remove:
-        html_to_clean = re.sub(
-            rf"<{tag}[^>]*>.*?</{tag}>", "", html_to_clean, flags=re.DOTALL
-        )
-
-    attributes_to_keep = "|".join(attributes_to_keep)
-    pattern = rf'\b(?!({attributes_to_keep})\b)\w+(?:-\w+)?\s*=\s*["\'][^"\']*["\']'
-    cleaned_html = re.sub(pattern, "", html_to_clean)
-    return cleaned_html
+    sanitizer = HtmlSanitizer(
+        drop_tags=tags_to_remove,
+        keep_attributes=attributes_to_keep,
+        drop_base64=False,
+    )
+    return sanitizer.sanitize(html_to_clean)
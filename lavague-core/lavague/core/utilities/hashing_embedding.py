@@ -0,0 +1,163 @@
+from collections import Counter
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.utils import globals_helper
+from lavague.core.utilities.bm25 import stem
+import numpy as np
+import math
+import re
+import zlib
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+# xpaths annotated by the retrievers are the same for every chunk and not part of the page
+XPATH_ATTRIBUTE = re.compile(r"""\sxpath\s*=\s*(?:"[^"]*"|'[^']*')""")
+
+# Markup words found in every chunk of HTML, weighted down like terms with a low idf
+MARKUP_WORDS = frozenset(
+    [
+        "html",
+        "head",
+        "body",
+        "div",
+        "span",
+        "p",
+        "li",
+        "ul",
+        "class",
+        "id",
+        "style",
+        "href",
+        "src",
+        "type",
+        "data",
+        "aria",
+        "role",
+        "svg",
+        "path",
+        "g",
+        "img",
+        "width",
+        "height",
+        "http",
+        "https",
+        "www",
+        "com",
+    ]
+)
+MARKUP_WEIGHT = 0.1
+
+# Share of the weight of a word spread over its character n-grams
+NGRAM_WEIGHT = 0.5
+
+
+def _hash(feature: str, dimensions: int) -> Tuple[int, float]:
+    """Bucket and sign of a feature, stable across processes unlike `hash`"""
+    value = zlib.crc32(feature.encode("utf-8", "surrogatepass"))
+    return value % dimensions, -1.0 if value & 0x80000000 else 1.0
+
+
+@lru_cache(maxsize=200_000)
+def word_features(
+    word: str, dimensions: int, ngram_size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Buckets and signed weights of a lowercase word: its stem, then its character n-grams"""
+    features = [("w " + stem(word), 1.0)]
+    if ngram_size > 0:
+        padded = f"<{word}>"
+        ngrams = [
+            padded[i : i + ngram_size]
+            for i in range(max(len(padded) - ngram_size + 1, 1))
+        ]
+        features.extend(("n " + ngram, NGRAM_WEIGHT / len(ngrams)) for ngram in ngrams)
+    buckets = np.empty(len(features), dtype=np.int64)
+    weights = np.empty(len(features), dtype=np.float32)
+    for i, (feature, weight) in enumerate(features):
+        buckets[i], sign = _hash(feature, dimensions)
+        weights[i] = sign * weight
+    return buckets, weights
+
+
+class HashingEmbedding(BaseEmbedding):
+    """
+    Local lexical embedding, free and deterministic: the stemmed words of a text and their character n-grams,
+    weighted by sublinear term frequency and feature-hashed into `dimensions` signed buckets, then L2-normalized.
+
+    Stopwords are ignored and HTML markup words weighted down, standing in for the idf of a corpus
+    so that a text is embedded independently of the others. Annotated xpaths are ignored.
+    Character n-grams (of `ngram_size`, 0 to disable) match word variants the stemmer misses.
+    Use it where no embedding API is available or for offline benchmarks, see `SemanticRetriever`.
+    """
+
+    dimensions: int = Field(default=4096, description="Number of hashed features.")
+    ngram_size: int = Field(default=3, description="Character n-gram size.")
+
+    def __init__(
+        self,
+        dimensions: int = 4096,
+        ngram_size: int = 3,
+        model_name: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        super().__init__(
+            dimensions=dimensions,
+            ngram_size=ngram_size,
+            model_name=model_name or f"lavague-hashing-{dimensions}-{ngram_size}",
+            **kwargs,
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashingEmbedding"
+
+    def embed(self, text: str) -> np.ndarray:
+        """Normalized float32 embedding of a text"""
+        counts = Counter(WORD_PATTERN.findall(XPATH_ATTRIBUTE.sub("", text).lower()))
+        stopwords = globals_helper.stopwords
+        buckets, weights, scales, lengths = [], [], [], []
+        for word, count in counts.items():
+            if word in stopwords:
+                continue
+            word_buckets, word_weights = word_features(
+                word, self.dimensions, self.ngram_size
+            )
+            scale = 1 + math.log(count)
+            if word in MARKUP_WORDS:
+                scale *= MARKUP_WEIGHT
+            buckets.append(word_buckets)
+            weights.append(word_weights)
+            scales.append(scale)
+            lengths.append(len(word_buckets))
+        if not buckets:
+            return np.zeros(self.dimensions, dtype=np.float32)
+        vector = np.bincount(
+            np.concatenate(buckets),
+            np.concatenate(weights) * np.repeat(np.float32(scales), lengths),
+            minlength=self.dimensions,
+        ).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings of several texts as the rows of a matrix. Used directly by `VectorIndex`,
+        llama-index validating every float of the lists returned through the `BaseEmbedding` API.
+        """
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for i, text in enumerate(texts):
+            matrix[i] = self.embed(text)
+        return matrix
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self.embed(query).tolist()
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self.embed(text).tolist()
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_many(texts).tolist()
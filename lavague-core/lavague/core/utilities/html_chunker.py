@@ -0,0 +1,321 @@
+from array import array
+from bisect import bisect_left
+from typing import List, NamedTuple, Tuple
+import re
+
+DEFAULT_CHUNK_SIZE = 4000
+
+VOID_ELEMENTS = frozenset(
+    [
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "param",
+        "source",
+        "track",
+        "wbr",
+    ]
+)
+
+# Elements whose content is not parsed, same as `html.parser`
+RAW_TEXT_ELEMENTS = frozenset(["script", "style"])
+
+TOKEN = re.compile(
+    r"<!--.*?-->"
+    r"|<[!?][^>]*>"
+    r"|</([a-zA-Z][^\s/>]*)[^>]*>"
+    r"|<([a-zA-Z][^\s/>]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>",
+    re.S,
+)
+
+XPATH_ATTRIBUTE = re.compile(r"""\sxpath\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+RAW_TEXT_END = {tag: re.compile(rf"</{tag}\s*>", re.I) for tag in RAW_TEXT_ELEMENTS}
+
+
+class HtmlChunk(NamedTuple):
+    text: str
+    # xpaths of the annotated elements whose start tag is in the chunk, in document order
+    xpaths: Tuple[str, ...]
+
+
+class HtmlLayout(NamedTuple):
+    """
+    Result of the scan of an HTML string by `HtmlChunker.layout`: the pieces chunks are packed from
+    and the offsets of the xpath-annotated start tags with their xpaths. It only depends on the HTML
+    and the chunk size, so layouts of unchanged subtrees can be reused, see `RetrievalCache.layouts`.
+    """
+
+    length: int
+    pieces: Tuple[Tuple[int, int], ...]
+    marked_positions: Tuple[int, ...]
+    marked_xpaths: Tuple[str, ...]
+
+
+class HtmlElements:
+    """
+    Spans of the elements of an HTML string, found with a single regex scan instead of a full parse.
+    Element 0 is the document. For every element we keep `[start, end)`, the end of its start tag
+    and the start of its end tag (`end` if it has none), and its first child and next sibling (-1 if none),
+    in arrays like `DomTable`. The start offsets of the xpath-annotated start tags are kept
+    in `marked_positions` with their elements and xpaths. Unclosed elements end where their parent ends, like with `html.parser`.
+    """
+
+    def __init__(self, html: str):
+        self.html = html
+        self.start = array("q", [0])
+        self.open_end = array("q", [0])
+        self.close_start = array("q", [len(html)])
+        self.end = array("q", [len(html)])
+        self.first_child = array("q", [-1])
+        self.last_child = array("q", [-1])
+        self.next_sibling = array("q", [-1])
+        self.marked_positions = array("q")
+        self.marked_elements = array("q")
+        self.marked_xpaths: List[str] = []
+        self._scan()
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def _add(self, parent: int, start: int, open_end: int) -> int:
+        element = len(self.start)
+        self.start.append(start)
+        self.open_end.append(open_end)
+        self.close_start.append(open_end)
+        self.end.append(open_end)
+        self.first_child.append(-1)
+        self.last_child.append(-1)
+        self.next_sibling.append(-1)
+        if self.last_child[parent] < 0:
+            self.first_child[parent] = element
+        else:
+            self.next_sibling[self.last_child[parent]] = element
+        self.last_child[parent] = element
+        return element
+
+    def children(self, element: int) -> List[int]:
+        children = []
+        child = self.first_child[element]
+        while child >= 0:
+            children.append(child)
+            child = self.next_sibling[child]
+        return children
+
+    def _scan(self):
+        html = self.html
+        # (element, tag) of the open elements
+        stack = [(0, "")]
+        position = 0
+        while True:
+            match = TOKEN.search(html, position)
+            if match is None:
+                break
+            position = match.end()
+            end_tag, start_tag, attributes = match.groups()
+            parent = stack[-1][0]
+            if start_tag is not None:
+                tag = start_tag.lower()
+                element = self._add(parent, match.start(), position)
+                if "xpath" in attributes:
+                    xpath = XPATH_ATTRIBUTE.search(attributes)
+                    if xpath is not None:
+                        self.marked_positions.append(match.start())
+                        self.marked_elements.append(element)
+                        self.marked_xpaths.append(
+                            xpath.group(1)
+                            if xpath.group(1) is not None
+                            else xpath.group(2)
+                        )
+                if tag in VOID_ELEMENTS or attributes.endswith("/"):
+                    continue
+                if tag in RAW_TEXT_ELEMENTS:
+                    close = RAW_TEXT_END[tag].search(html, position)
+                    close_start = close.start() if close else len(html)
+                    position = close.end() if close else len(html)
+                    self.close_start[element] = close_start
+                    self.end[element] = position
+                    continue
+                stack.append((element, tag))
+            elif end_tag is not None:
+                tag = end_tag.lower()
+                depth = len(stack) - 1
+                while depth > 0 and stack[depth][1] != tag:
+                    depth -= 1
+                if depth == 0:
+                    # stray end tag, kept as text
+                    continue
+                for element, _ in stack[depth + 1 :]:
+                    self.close_start[element] = self.end[element] = match.start()
+                self.close_start[stack[depth][0]] = match.start()
+                self.end[stack[depth][0]] = position
+                del stack[depth:]
+            else:
+                # comment, doctype or processing instruction, kept as a leaf
+                self._add(parent, match.start(), position)
+        for element, _ in stack[1:]:
+            self.close_start[element] = self.end[element] = len(html)
+
+    def xpaths(self, lo: int, hi: int) -> Tuple[str, ...]:
+        """xpaths of the annotated start tags beginning in `[lo, hi)`"""
+        return tuple(
+            self.marked_xpaths[
+                bisect_left(self.marked_positions, lo) : bisect_left(
+                    self.marked_positions, hi
+                )
+            ]
+        )
+
+
+class HtmlChunker:
+    """
+    Split HTML into chunks of up to `chunk_size` characters aligned on element boundaries,
+    a replacement of LangChain's `RecursiveCharacterTextSplitter` for HTML.
+
+    Elements that fit are never cut. Larger elements are split between their children, their start tag
+    staying with the first children, and text longer than `chunk_size` is split on whitespace.
+    Consecutive pieces are then packed greedily, so a chunk is always a slice of the input.
+    Each chunk comes with the xpaths of the annotated elements it contains, so that chunks
+    can be filtered without searching their text. A single start tag larger than `chunk_size` is kept whole.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def chunk(self, html: str) -> List[HtmlChunk]:
+        return self.chunk_layouts([html], [self.layout(html)])
+
+    def layout(self, html: str) -> HtmlLayout:
+        elements = HtmlElements(html)
+        return HtmlLayout(
+            len(html),
+            tuple(self._pieces(elements)),
+            tuple(elements.marked_positions),
+            tuple(elements.marked_xpaths),
+        )
+
+    def layout_parts(self, html: str, lengths: List[int]) -> List[HtmlLayout]:
+        """Layouts of the consecutive parts of `html` of the given lengths, to scan several strings in one call"""
+        layouts = []
+        offset = 0
+        for length in lengths:
+            layouts.append(self.layout(html[offset : offset + length]))
+            offset += length
+        return layouts
+
+    def chunk_layouts(
+        self, htmls: List[str], layouts: List[HtmlLayout], separator: str = "\n"
+    ) -> List[HtmlChunk]:
+        """
+        Chunks of the HTML strings joined with `separator`, given their layouts. The strings are expected
+        to be well-formed subtrees, so that their pieces are the pieces of the joined HTML.
+        """
+        html = separator.join(htmls)
+        pieces: List[Tuple[int, int]] = []
+        marked_positions: List[int] = []
+        marked_xpaths: List[str] = []
+        offset = 0
+        for i, layout in enumerate(layouts):
+            if i > 0 and separator:
+                pieces.append((offset, offset + len(separator)))
+                offset += len(separator)
+            pieces.extend((offset + lo, offset + hi) for lo, hi in layout.pieces)
+            marked_positions.extend(offset + p for p in layout.marked_positions)
+            marked_xpaths.extend(layout.marked_xpaths)
+            offset += layout.length
+        chunks = []
+        for lo, hi in self._pack(pieces):
+            text = html[lo:hi]
+            stripped = text.strip()
+            if stripped:
+                lo += len(text) - len(text.lstrip())
+                chunks.append(
+                    HtmlChunk(
+                        stripped,
+                        tuple(
+                            marked_xpaths[
+                                bisect_left(marked_positions, lo) : bisect_left(
+                                    marked_positions, hi
+                                )
+                            ]
+                        ),
+                    )
+                )
+        return chunks
+
+    def split(self, html: str, xpathed_only: bool = False) -> List[str]:
+        """
+        Text of the chunks. With `xpathed_only`, only chunks containing xpath-annotated elements are kept,
+        unless there are none.
+        """
+        chunks = self.chunk(html)
+        if xpathed_only:
+            chunks = [chunk for chunk in chunks if chunk.xpaths] or chunks
+        return [chunk.text for chunk in chunks]
+
+    def _pieces(self, elements: HtmlElements) -> List[Tuple[int, int]]:
+        """Contiguous spans covering the document, elements larger than `chunk_size` being opened"""
+        chunk_size = self.chunk_size
+        pieces = []
+        # spans to emit and elements to open, in reverse document order
+        stack: List[Tuple[int, int]] = [(0, -1)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi >= 0:
+                self._add_text(pieces, elements.html, lo, hi)
+                continue
+            element = lo
+            start, end = elements.start[element], elements.end[element]
+            if end - start <= chunk_size and element != 0:
+                pieces.append((start, end))
+                continue
+            open_end = elements.open_end[element]
+            close_start = elements.close_start[element]
+            if end > close_start:
+                stack.append((close_start, end))
+            position = close_start
+            for child in reversed(elements.children(element)):
+                if elements.end[child] < position:
+                    stack.append((elements.end[child], position))
+                stack.append((child, -1))
+                position = elements.start[child]
+            if position > open_end:
+                stack.append((open_end, position))
+            if open_end > start:
+                pieces.append((start, open_end))
+        return pieces
+
+    def _add_text(self, pieces: List[Tuple[int, int]], html: str, lo: int, hi: int):
+        """Text spans, cut on the last whitespace before `chunk_size` when too long"""
+        while hi - lo > self.chunk_size:
+            cut = max(
+                html.rfind(" ", lo + 1, lo + self.chunk_size),
+                html.rfind("\n", lo + 1, lo + self.chunk_size),
+            )
+            if cut <= lo:
+                cut = lo + self.chunk_size
+            pieces.append((lo, cut))
+            lo = cut
+        if hi > lo:
+            pieces.append((lo, hi))
+
+    def _pack(self, pieces: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        spans = []
+        lo = hi = None
+        for start, end in pieces:
+            if lo is not None and end - lo > self.chunk_size:
+                spans.append((lo, hi))
+                lo = None
+            if lo is None:
+                lo = start
+            hi = end
+        if lo is not None:
+            spans.append((lo, hi))
+        return spans
@@ -0,0 +1,286 @@
+from typing import Iterable, Iterator, List, Optional
+import re
+from lavague.core.utilities.html_chunker import (
+    RAW_TEXT_ELEMENTS,
+    RAW_TEXT_END,
+    VOID_ELEMENTS,
+)
+
+# attributes of a start tag, quoted values may contain `>`
+ATTRIBUTES = r"""[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*"""
+
+ATTRIBUTE = re.compile(
+    r"""(([^\s"'=/>]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'=<>`]+))?)""",
+)
+
+BASE64_VALUE = re.compile(r"""["']?\s*data:[^,]*;base64,""", re.I)
+
+# start of a base64 data URI, the data is then skipped up to the closing quote
+BASE64_DATA = r"""data:[^,"'\s>]*;(?i:base64),"""
+
+# name, equal sign and opening quote preceding a base64 value
+BASE64_ATTRIBUTE_START = re.compile(r"""\s+[^\s"'=<>/]+\s*=\s*(["']?)\s*$""")
+
+UNQUOTED_VALUE_END = re.compile(r"[\s>]")
+
+
+class HtmlSanitizer:
+    """
+    Single pass HTML sanitizer.
+
+    - `drop_tags`: elements removed with their content, nested elements of the same tag included.
+    - `keep_attributes`: attributes kept in the remaining tags, all of them if None.
+    - `drop_base64`: remove attributes holding base64 data URIs, e.g. inlined images.
+    - `collapse_whitespace`: replace whitespace runs in text by a single space, or a newline if they contain one.
+
+    The page is scanned with one regex built from these rules, matching only the constructs to rewrite
+    and the comments and raw text elements to skip, everything else is copied as is.
+    Comments are kept. An unclosed dropped element is removed up to the end of the page.
+    """
+
+    def __init__(
+        self,
+        drop_tags: Iterable[str] = ("style", "svg", "script"),
+        keep_attributes: Optional[Iterable[str]] = None,
+        drop_base64: bool = True,
+        collapse_whitespace: bool = False,
+    ):
+        self.drop_tags = frozenset(tag.lower() for tag in drop_tags)
+        self.keep_attributes = (
+            None
+            if keep_attributes is None
+            else frozenset(attribute.lower() for attribute in keep_attributes)
+        )
+        self.drop_base64 = drop_base64
+        self.collapse_whitespace = collapse_whitespace
+        # start and end tags of the dropped elements, raw text elements being skipped up to their end tag
+        self._drop_ends = {
+            tag: re.compile(rf"<(/?){re.escape(tag)}(?=[\s/>])[^>]*>", re.I)
+            for tag in self.drop_tags - RAW_TEXT_ELEMENTS
+        }
+        self._pattern = self._build_pattern()
+
+    def __repr__(self) -> str:
+        keep_attributes = (
+            None if self.keep_attributes is None else sorted(self.keep_attributes)
+        )
+        return (
+            f"HtmlSanitizer(drop_tags={sorted(self.drop_tags)}, keep_attributes={keep_attributes}, "
+            f"drop_base64={self.drop_base64}, collapse_whitespace={self.collapse_whitespace})"
+        )
+
+    def _build_pattern(self) -> re.Pattern:
+        """
+        Alternatives after a `<` are grouped so that the regex engine can skip to the next `<`,
+        base64 data URIs are found from their `data:` scheme, the attribute name being removed afterwards.
+        """
+        raw_tags = "|".join(sorted(RAW_TEXT_ELEMENTS))
+        tags = [
+            # unclosed comments are matched by their start only
+            r"(?P<comment>!--(?:.*?-->)?)",
+            rf"(?P<raw>(?P<raw_tag>(?i:{raw_tags}))(?=[\s/>])(?P<raw_attributes>{ATTRIBUTES})>)",
+        ]
+        drop_tags = "|".join(
+            re.escape(tag)
+            for tag in sorted(self.drop_tags - RAW_TEXT_ELEMENTS, key=len, reverse=True)
+        )
+        if drop_tags:
+            tags.append(
+                rf"(?P<drop>(?P<drop_tag>(?i:{drop_tags}))(?=[\s/>])(?P<drop_attributes>{ATTRIBUTES})>)"
+            )
+            tags.append(rf"(?P<drop_end>/(?i:{drop_tags})(?=[\s>])[^>]*>)")
+        alternatives = []
+        if self.keep_attributes is not None or self.collapse_whitespace:
+            # every start tag is visited, to filter its attributes or to skip the whitespace it contains
+            tags.append(
+                rf"(?P<tag>(?P<tag_name>[a-zA-Z][^\s/>]*)(?P<attributes>{ATTRIBUTES})>)"
+            )
+        elif self.drop_base64:
+            alternatives.append(rf"(?P<base64>{BASE64_DATA})")
+        if self.collapse_whitespace:
+            alternatives.append(r"(?P<space>\s{2,}|[^\S ])")
+        alternatives.insert(0, "<(?:" + "|".join(tags) + ")")
+        # case insensitive only where needed, the regex engine being much slower otherwise
+        return re.compile("|".join(alternatives), re.S)
+
+    def sanitize(self, html: str) -> str:
+        stream = self.stream()
+        return stream.feed(html) + stream.close()
+
+    def sanitize_chunks(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Sanitize a page received in chunks, tags may span several chunks"""
+        stream = self.stream()
+        for chunk in chunks:
+            output = stream.feed(chunk)
+            if output:
+                yield output
+        output = stream.close()
+        if output:
+            yield output
+
+    def stream(self) -> "SanitizerStream":
+        return SanitizerStream(self)
+
+    def _clean_tag(self, token: str, tag_end: int, attributes: str) -> str:
+        """Start tag without the removed attributes, unchanged if none is removed"""
+        keep_attributes = self.keep_attributes
+        check_base64 = self.drop_base64 and "base64" in attributes
+        if keep_attributes is None and not check_base64:
+            return token
+        attributes = attributes.rstrip()
+        # a final slash closes the tag unless it ends an unquoted value
+        self_closing = attributes.endswith("/") and (
+            len(attributes) == 1 or attributes[-2] in " \t\n\r\f\"'"
+        )
+        if self_closing:
+            attributes = attributes[:-1]
+        kept: List[str] = []
+        removed = False
+        for attribute, name, value in ATTRIBUTE.findall(attributes):
+            if (
+                keep_attributes is not None and name.lower() not in keep_attributes
+            ) or (check_base64 and BASE64_VALUE.match(value)):
+                removed = True
+            else:
+                kept.append(attribute)
+        if not removed:
+            return token
+        end = "/>" if self_closing else ">"
+        return token[:tag_end] + "".join(" " + attribute for attribute in kept) + end
+
+
+class SanitizerStream:
+    """
+    State of an `HtmlSanitizer` over one page fed in chunks: the unprocessed tail of the input
+    and the dropped element being skipped. Counts the UTF-8 bytes read and written.
+    """
+
+    def __init__(self, sanitizer: HtmlSanitizer):
+        self.sanitizer = sanitizer
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._buffer = ""
+        # tag of the dropped element being skipped, with its nesting depth
+        self._dropping: Optional[str] = None
+        self._depth = 0
+
+    @property
+    def bytes_removed(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def feed(self, chunk: str) -> str:
+        self.bytes_in += len(chunk.encode("utf-8", "surrogatepass"))
+        self._buffer += chunk
+        return self._process(final=False)
+
+    def close(self) -> str:
+        return self._process(final=True)
+
+    def _process(self, final: bool) -> str:
+        sanitizer = self.sanitizer
+        pattern = sanitizer._pattern
+        html = self._buffer
+        output: List[str] = []
+        length = len(html)
+        # before the end of the page, only complete tags are processed
+        limit = length if final else html.rfind(">") + 1
+        position = 0
+        while position < limit:
+            if self._dropping is not None:
+                position = self._skip(html, position, final)
+                if self._dropping is not None:
+                    break
+                continue
+            match = pattern.search(html, position, limit)
+            if match is None:
+                output.append(html[position:limit])
+                position = limit
+                break
+            start = match.start()
+            output.append(html[position:start])
+            position = match.end()
+            kind = match.lastgroup
+            if kind == "comment":
+                if not final and not match.group().endswith("-->"):
+                    position = start
+                    break
+                output.append(html[start:position])
+            elif kind == "raw":
+                tag = match.group("raw_tag").lower()
+                close = RAW_TEXT_END[tag].search(html, position)
+                if close is None and not final:
+                    position = start
+                    break
+                close_end = close.end() if close else length
+                if tag not in sanitizer.drop_tags:
+                    output.append(
+                        sanitizer._clean_tag(
+                            html[start:position],
+                            len(tag) + 1,
+                            match.group("raw_attributes"),
+                        )
+                    )
+                    output.append(html[position:close_end])
+                position = close_end
+            elif kind == "drop":
+                tag = match.group("drop_tag").lower()
+                if tag not in VOID_ELEMENTS and not match.group(
+                    "drop_attributes"
+                ).endswith("/"):
+                    self._dropping = tag
+                    self._depth = 1
+            elif kind == "tag":
+                output.append(
+                    sanitizer._clean_tag(
+                        match.group(),
+                        len(match.group("tag_name")) + 1,
+                        match.group("attributes"),
+                    )
+                )
+            elif kind == "space":
+                output.append("\n" if "\n" in match.group() else " ")
+            elif kind == "base64":
+                text = output[-1]
+                attribute_start = BASE64_ATTRIBUTE_START.search(
+                    text, max(len(text) - 256, 0)
+                )
+                if attribute_start is None:
+                    # not an attribute value, e.g. in a style
+                    output.append(match.group())
+                    continue
+                quote = attribute_start.group(1)
+                if quote:
+                    value_end = html.find(quote, position, limit) + 1
+                else:
+                    value_end = UNQUOTED_VALUE_END.search(html, position, limit)
+                    value_end = value_end.start() if value_end else 0
+                output[-1] = text[: attribute_start.start()]
+                position = value_end or limit
+            # stray end tags of dropped elements are removed
+        self._buffer = html[position:]
+        if final:
+            self._buffer = ""
+            self._dropping = None
+        result = "".join(output)
+        self.bytes_out += len(result.encode("utf-8", "surrogatepass"))
+        return result
+
+    def _skip(self, html: str, position: int, final: bool) -> int:
+        """Position after the end of the dropped element, or where to resume once more input is fed"""
+        tag = self._dropping
+        pattern = self.sanitizer._drop_ends[tag]
+        while True:
+            match = pattern.search(html, position)
+            if match is None:
+                if final:
+                    return len(html)
+                # keep what may be the beginning of the next tag to match
+                return max(position, html.rfind("<", position))
+            position = match.end()
+            if match.group(1):
+                self._depth -= 1
+            elif not match.group().endswith("/>"):
+                self._depth += 1
+            if self._depth == 0:
+                self._dropping = None
+                return position
@@ -0,0 +1,128 @@
+from typing import List, Optional, Tuple
+from lavague.core.base_driver import BaseDriver
+from lavague.core.utilities.candidate_ranker import Candidates
+import time
+import re
+import yaml
+
+# Instructions naming the quoted text of a single element, e.g. Click on 'Contact Us'
+INSTRUCTION = re.compile(
+    r"""^\s*(click|press|tap|hover)(?:\s+(?:on|over))?(?:\s+the)?\s+
+    ["'“‘]([^"'“”‘’]+)["'”’]
+    (?:\s+(?:button|link|tab|icon|option|menu\s+item|checkbox))?\s*[.!]?\s*$""",
+    re.IGNORECASE | re.VERBOSE,
+)
+ACTIONS = {"click": "click", "press": "click", "tap": "click", "hover": "hover"}
+
+# Elements preferred when the text is matched by nested elements, e.g. the link inside its list item
+INTERACTIVE_TAGS = frozenset(
+    ["a", "button", "input", "select", "option", "label", "summary", "textarea"]
+)
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_label(text: str) -> str:
+    return WHITESPACE.sub(" ", text).strip().strip(".:!?").strip().lower()
+
+
+class InstructionResolver:
+    """
+    Resolve instructions naming the exact text of the element to act on, such as `Click on 'Contact Us'`,
+    without the LLM. The quoted label is looked up in the text and label attributes (aria-label, placeholder,
+    title, alt, value) of the elements annotated with an xpath in the retrieved context. The action is emitted
+    only if exactly one visible element matches the whole label, nested matches counting as one element.
+    Visibility is given by the rects of the driver when it captures them, see `BaseDriver.get_interaction_rects`.
+    Other instructions fall through to the LLM. Set `enabled` to False to always use the LLM.
+
+    `stats` describes the last resolution: whether it resolved the instruction, the hit rate so far and the
+    latency saved, estimated from the mean duration of the LLM calls reported with `add_llm_time`.
+    """
+
+    def __init__(self, driver: Optional[BaseDriver] = None, enabled: bool = True):
+        self.driver = driver
+        self.enabled = enabled
+        self.steps = 0
+        self.hits = 0
+        self.llm_calls = 0
+        self.llm_time = 0.0
+        self.stats = {}
+
+    def parse(self, instruction: str) -> Optional[Tuple[str, str]]:
+        """Action name and normalized label of an instruction naming a single element, None otherwise"""
+        match = INSTRUCTION.match(instruction)
+        if match is None:
+            return None
+        label = normalize_label(match.group(2))
+        return (ACTIONS[match.group(1).lower()], label) if label else None
+
+    def find_element(self, label: str, context: str) -> Optional[str]:
+        """xpath of the only visible element of the context matching the label, None if there is not exactly one"""
+        candidates = Candidates(context)
+        rects = self.driver.get_interaction_rects() if self.driver else None
+        matches: List[int] = []
+        for i, (xpath, text, labels) in enumerate(
+            zip(candidates.xpaths, candidates.texts, candidates.labels)
+        ):
+            if normalize_label(text) != label and label not in map(
+                normalize_label, labels
+            ):
+                continue
+            if rects is not None:
+                rect = rects.get(xpath)
+                if rect is None or rect[2] * rect[3] <= 0:
+                    continue
+            matches.append(i)
+        xpaths = [candidates.xpaths[i] for i in matches]
+        leaves = [
+            xpath
+            for xpath in xpaths
+            if not any(other.startswith(xpath + "/") for other in xpaths)
+        ]
+        if len(leaves) != 1:
+            return None
+        # all the matches are then the leaf and its ancestors, in document order
+        for i in reversed(matches):
+            if candidates.tags[i] in INTERACTIVE_TAGS:
+                return candidates.xpaths[i]
+        return leaves[0]
+
+    def resolve(self, instruction: str, context: str) -> Optional[str]:
+        """Action YAML for the instruction on the context HTML, None to fall through to the LLM"""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        action = None
+        parsed = self.parse(instruction)
+        if parsed is not None:
+            name, label = parsed
+            xpath = self.find_element(label, context)
+            if xpath is not None:
+                action = yaml.safe_dump(
+                    [
+                        {
+                            "actions": [
+                                {"action": {"args": {"xpath": xpath}, "name": name}}
+                            ]
+                        }
+                    ],
+                    sort_keys=False,
+                )
+        resolution_time = time.perf_counter() - start
+        self.steps += 1
+        self.hits += action is not None
+        mean_llm_time = self.llm_time / self.llm_calls if self.llm_calls else None
+        self.stats = {
+            "resolved": action is not None,
+            "hit_rate": self.hits / self.steps,
+            "resolution_time": resolution_time,
+            "saved_time": None
+            if mean_llm_time is None
+            else (mean_llm_time if action is not None else 0.0) - resolution_time,
+        }
+        return action
+
+    def add_llm_time(self, duration: float):
+        """Report the duration of an LLM call, to estimate the latency saved by resolutions"""
+        self.llm_calls += 1
+        self.llm_time += duration
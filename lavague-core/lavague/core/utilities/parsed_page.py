@@ -0,0 +1,117 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Union, TYPE_CHECKING
+from bs4 import BeautifulSoup, Tag
+from lavague.core.utilities.dom_index import DomIndex
+from lavague.core.utilities.dom_table import DomTable
+
+if TYPE_CHECKING:
+    from lavague.core.base_driver import PossibleInteractionsByXpath
+
+
+class ParsedPage:
+    """
+    HTML exchanged between the stages of a `RetrieversPipeline`, parsed at most once per step.
+
+    A page is created either from HTML chunks, parsed lazily with BeautifulSoup when a stage needs the tree,
+    or from a tree (a soup or a `DomTable`), serialized lazily when a stage needs strings. It also carries
+    the xpath index of annotated elements and the possible interactions returned by the driver, when known.
+    Stages modifying the tree in place must call `invalidate` so that derived data is recomputed.
+    """
+
+    def __init__(
+        self,
+        html_chunks: Optional[List[str]] = None,
+        soup: Optional[BeautifulSoup] = None,
+        possible_interactions: Optional[PossibleInteractionsByXpath] = None,
+        elements_by_xpath: Optional[Dict[str, Tag]] = None,
+        table: Optional[DomTable] = None,
+    ):
+        if sum(tree is not None for tree in (html_chunks, soup, table)) != 1:
+            raise ValueError(
+                "Exactly one of html_chunks, soup or table must be provided"
+            )
+        self._chunks = html_chunks
+        self._soup = soup
+        self._table = table
+        self._is_table_page = table is not None
+        self._dom_index: Optional[Union[DomIndex, DomTable]] = None
+        self._dom_index_built = False
+        self.possible_interactions = possible_interactions
+        self._elements_by_xpath = elements_by_xpath
+
+    @property
+    def is_parsed(self) -> bool:
+        return self._soup is not None
+
+    @property
+    def is_serialized(self) -> bool:
+        return self._chunks is not None
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html, "html.parser")
+        return self._soup
+
+    @property
+    def table(self) -> DomTable:
+        """Compact tree of the page, built from its HTML when the page has not been parsed with BeautifulSoup"""
+        if self._table is None:
+            self._table = DomTable.from_html(self.html)
+        return self._table
+
+    @property
+    def html(self) -> str:
+        if self._chunks is None:
+            if self._soup is None:
+                self._chunks = [self.table.serialize()]
+            else:
+                self._chunks = [
+                    self.dom_index.html if self.dom_index else str(self._soup)
+                ]
+        return "\n".join(self._chunks)
+
+    @property
+    def chunks(self) -> List[str]:
+        if self._chunks is None:
+            self.html
+        return self._chunks
+
+    @property
+    def dom_index(self) -> Optional[Union[DomIndex, DomTable]]:
+        """Index of the tree used for context expansion, None when it cannot be built"""
+        if not self._dom_index_built:
+            if self._soup is None:
+                self.table.serialize()
+                self._dom_index = self.table
+            else:
+                self._dom_index = DomIndex.from_soup(self._soup)
+            self._dom_index_built = True
+        return self._dom_index
+
+    @property
+    def elements_by_xpath(self) -> Dict[str, Tag]:
+        """Elements annotated with an `xpath` attribute"""
+        if self._elements_by_xpath is None:
+            self._elements_by_xpath = {
+                element["xpath"]: element
+                for element in self.soup.find_all(attrs={"xpath": True})
+            }
+        return self._elements_by_xpath
+
+    def get_element(self, xpath: str) -> Optional[Tag]:
+        return self.elements_by_xpath.get(xpath)
+
+    def invalidate(self):
+        """Forget everything derived from the tree after an in-place modification"""
+        if self._table is not None and (self._is_table_page or self._soup is None):
+            # The table is the tree of the page, a soup would be a stale copy
+            self._soup = None
+            self._is_table_page = True
+        else:
+            self.soup
+            self._table = None
+        self._chunks = None
+        self._dom_index = None
+        self._dom_index_built = False
+        self._elements_by_xpath = None
@@ -0,0 +1,210 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from threading import Lock
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Pages smaller than this number of characters are processed inline
+DEFAULT_MIN_SIZE = 200_000
+
+# Results smaller than this number of characters are returned pickled
+SHARED_RESULT_MIN_SIZE = 100_000
+
+
+class SharedText:
+    """
+    Text written once as UTF-8 to a shared memory block, pickled as the name of the block
+    so that workers read it without going through the pipe of the pool.
+    The process that creates it must `unlink` it once read.
+    """
+
+    def __init__(self, text: str):
+        data = text.encode("utf-8", "surrogatepass")
+        self.size = len(data)
+        self._memory: Optional[shared_memory.SharedMemory] = shared_memory.SharedMemory(
+            create=True, size=max(self.size, 1)
+        )
+        self._memory.buf[: self.size] = data
+        self.name = self._memory.name
+
+    def __getstate__(self) -> dict:
+        return {"name": self.name, "size": self.size}
+
+    def __setstate__(self, state: dict):
+        self.name = state["name"]
+        self.size = state["size"]
+        self._memory = None
+
+    def _attach(self) -> shared_memory.SharedMemory:
+        if self._memory is None:
+            self._memory = shared_memory.SharedMemory(self.name)
+        return self._memory
+
+    def read(self) -> str:
+        with self._attach().buf[: self.size] as data:
+            return str(data, "utf-8", "surrogatepass")
+
+    def close(self):
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+    def unlink(self):
+        memory = self._attach()
+        self.close()
+        memory.unlink()
+
+
+def _init_worker():
+    global _in_worker
+    _in_worker = True
+
+
+def _run_in_worker(fn: Callable, text: SharedText, args: tuple) -> Any:
+    try:
+        html = text.read()
+    finally:
+        text.close()
+    result = fn(html, *args)
+    if isinstance(result, str) and len(result) >= SHARED_RESULT_MIN_SIZE:
+        result = SharedText(result)
+        result.close()
+    return result
+
+
+def _receive(result: Any) -> Any:
+    if isinstance(result, SharedText):
+        try:
+            return result.read()
+        finally:
+            result.unlink()
+    return result
+
+
+def _discard(future: Future):
+    if not future.cancelled() and future.exception() is None:
+        result = future.result()
+        if isinstance(result, SharedText):
+            result.unlink()
+
+
+class ProcessPool:
+    """
+    Worker processes for the CPU-bound stages of the retrievers (annotation, chunking, BM25 scoring),
+    so that large pages do not hold the GIL of the process running the agents, e.g. `lavague-server`.
+
+    - `max_workers`: number of worker processes, the number of CPUs by default.
+    - `min_size`: pages of fewer characters are processed inline, shipping them would cost more than processing them.
+
+    Workers are started on first use with `start_method`, `spawn` by default so that they do not inherit
+    the threads and drivers of the process: scripts must then be guarded by `if __name__ == "__main__"`.
+    Pages are written once to shared memory instead of being pickled, and so are the large strings returned.
+    If the pool breaks, e.g. a worker is killed, the call runs inline and the pool is restarted on next use.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        min_size: int = DEFAULT_MIN_SIZE,
+        start_method: str = "spawn",
+    ):
+        self.max_workers = max_workers
+        self.min_size = min_size
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+
+    def offloads(self, size: int) -> bool:
+        """Whether a page of `size` characters is sent to the workers"""
+        return size >= self.min_size
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=get_context(self.start_method),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        logger.warning("Process pool broken, running inline and restarting it")
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn: Callable, text: str, *args) -> Any:
+        """`fn(text, *args)` in a worker, or inline for small pages. `fn` and `args` must be picklable"""
+        if not self.offloads(len(text)):
+            return fn(text, *args)
+        executor = self._get_executor()
+        shared = SharedText(text)
+        try:
+            future = executor.submit(_run_in_worker, fn, shared, args)
+            return _receive(future.result())
+        except BrokenProcessPool:
+            self._reset(executor)
+            return fn(text, *args)
+        finally:
+            shared.unlink()
+
+    async def arun(self, fn: Callable, text: str, *args) -> Any:
+        """Same as `run` without blocking the event loop, small pages are processed in a worker thread"""
+        if not self.offloads(len(text)):
+            return await asyncio.to_thread(fn, text, *args)
+        executor = self._get_executor()
+        shared = SharedText(text)
+        try:
+            future = executor.submit(_run_in_worker, fn, shared, args)
+            try:
+                return _receive(await asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                future.add_done_callback(_discard)
+                raise
+        except BrokenProcessPool:
+            self._reset(executor)
+            return await asyncio.to_thread(fn, text, *args)
+        finally:
+            shared.unlink()
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_in_worker = False
+
+_default_process_pool: Optional[ProcessPool] = None
+
+
+def get_default_process_pool() -> Optional[ProcessPool]:
+    """
+    Pool used by the retrievers when none is given, None unless set with `set_default_process_pool`
+    or the `LAVAGUE_PROCESS_POOL_WORKERS` environment variable (and `LAVAGUE_PROCESS_POOL_MIN_SIZE`).
+    Always None in the workers.
+    """
+    global _default_process_pool
+    if _in_worker:
+        return None
+    if _default_process_pool is None:
+        workers = int(os.getenv("LAVAGUE_PROCESS_POOL_WORKERS", "0") or 0)
+        if workers > 0:
+            _default_process_pool = ProcessPool(
+                workers,
+                int(os.getenv("LAVAGUE_PROCESS_POOL_MIN_SIZE", DEFAULT_MIN_SIZE)),
+            )
+    return _default_process_pool
+
+
+def set_default_process_pool(pool: Optional[ProcessPool]):
+    global _default_process_pool
+    _default_process_pool = pool
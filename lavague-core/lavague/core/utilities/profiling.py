@@ -6,6 +6,8 @@ import io
 from IPython.display import Image
 from itertools import cycle
 from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
 
 # stores llm and retriever calls
 agent_events = []
@@ -13,6 +15,9 @@ agent_events = []
 # stores total runtime of each step
 agent_steps = []
 
+# record of the innermost `time_profiler` running in the current context
+_current_record: ContextVar[Optional[dict]] = ContextVar("current_record", default=None)
+
 
 # call before each agent step to group events by steps
 def start_new_step():
@@ -26,6 +31,13 @@ def clear_profiling_data():
     agent_steps = []
 
 
+def add_profiling_data(key: str, value):
+    """Append `value` to the list `key` of the innermost running `time_profiler` record, if any"""
+    record = _current_record.get()
+    if record is not None:
+        record.setdefault(key, []).append(value)
+
+
 @contextmanager
 def time_profiler(
     event_name, prompt_size=None, html_size=None, full_step_profiling=False
@@ -40,11 +52,13 @@ def time_profiler(
     - full_step_profiling: Boolean indicating whether to profile full steps or individual events.
     """
     context = {}
+    token = _current_record.set(context)
     start_time = time.perf_counter()
     try:
         yield context
     finally:
         end_time = time.perf_counter()
+        _current_record.reset(token)
         duration = end_time - start_time
 
         # create profiling record
@@ -0,0 +1,279 @@
+from __future__ import annotations
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Callable, Hashable, List, Optional, Union, TYPE_CHECKING
+from lavague.core.utilities.parsed_page import ParsedPage
+import hashlib
+
+if TYPE_CHECKING:
+    from llama_index.core import QueryBundle
+    from lavague.core.retrievers import BaseHtmlRetriever
+    from lavague.core.utilities.embedding_store import EmbeddingStore
+    from lavague.core.utilities.html_chunker import HtmlChunker, HtmlLayout
+    from lavague.core.utilities.process_pool import ProcessPool
+
+
+def fingerprint(*parts: str) -> str:
+    """Content hash of the given strings, used as cache key"""
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(part.encode("utf-8", "surrogatepass"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def fingerprint_chunks(html_chunks: List[str]) -> str:
+    """
+    Merkle-style fingerprint of a list of HTML chunks: the hash of the chunk hashes.
+    Chunks are serialized subtrees, so unchanged subtrees keep the same chunk hash across steps,
+    see `RetrievalCache.layouts`.
+    """
+    return fingerprint(*[fingerprint(chunk) for chunk in html_chunks])
+
+
+class LRUCache:
+    """Bounded mapping evicting the least recently used entries, with hit/miss counters. Thread-safe."""
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class RetrievalCache:
+    """
+    Cache shared by the retrievers of a pipeline across steps and retries.
+
+    - `results` memoizes the output of every retriever exposing a cache key
+    (see `BaseHtmlRetriever.get_cache_key`), keyed by the fingerprint of its input,
+    its parameters and the query when it depends on it.
+    - `subtrees` stores the layouts of HTML chunks by (chunk size, chunk hash), so that only the subtrees
+    that changed since the last step are scanned again by the chunker, see `layouts`.
+    - `embeddings` stores chunk embeddings by (embedding model, chunk hash), so only new
+    or modified chunks are sent to the embedding model. Defaults to the persistent store
+    shared by the whole process, see `EmbeddingStore`.
+    """
+
+    def __init__(
+        self,
+        max_results: int = 256,
+        embedding_store: Optional[EmbeddingStore] = None,
+        max_subtrees: int = 4096,
+    ):
+        from lavague.core.utilities.embedding_store import get_default_embedding_store
+
+        self.results = LRUCache(max_results)
+        self.subtrees = LRUCache(max_subtrees)
+        self.embeddings = embedding_store or get_default_embedding_store()
+
+    def layouts(
+        self,
+        chunker: HtmlChunker,
+        html_chunks: List[str],
+        process_pool: Optional[ProcessPool] = None,
+    ) -> List[HtmlLayout]:
+        """Layouts of the HTML chunks, only the chunks not seen before are scanned, in `process_pool` if given"""
+        keys = [(chunker.chunk_size, fingerprint(chunk)) for chunk in html_chunks]
+        layouts = [self.subtrees.get(key) for key in keys]
+        missing = [i for i, layout in enumerate(layouts) if layout is None]
+        if missing:
+            texts = [html_chunks[i] for i in missing]
+            args = ("".join(texts), [len(text) for text in texts])
+            computed = (
+                chunker.layout_parts(*args)
+                if process_pool is None
+                else process_pool.run(chunker.layout_parts, *args)
+            )
+            for i, layout in zip(missing, computed):
+                self.subtrees.put(keys[i], layout)
+                layouts[i] = layout
+        return layouts
+
+    def retrieve(
+        self,
+        retriever: BaseHtmlRetriever,
+        query: QueryBundle,
+        html_nodes: List[str],
+        viewport_only=True,
+    ) -> List[str]:
+        key = retriever.get_cache_key(query, html_nodes, viewport_only)
+        if key is None:
+            return retriever.retrieve(query, html_nodes, viewport_only)
+        results = self.results.get_or_compute(
+            key,
+            lambda: tuple(retriever.retrieve(query, html_nodes, viewport_only)),
+        )
+        return list(results)
+
+    def retrieve_page(
+        self,
+        retriever: BaseHtmlRetriever,
+        query: QueryBundle,
+        page: ParsedPage,
+        viewport_only=True,
+    ) -> Union[ParsedPage, List[str]]:
+        """Same as `retrieve` for a page shared by the stages of a pipeline"""
+        key = retriever.get_cache_key(query, page.chunks, viewport_only)
+        if key is None:
+            return retriever.retrieve_page(query, page, viewport_only)
+
+        def compute():
+            result = retriever.retrieve_page(query, page, viewport_only)
+            return tuple(result.chunks if isinstance(result, ParsedPage) else result)
+
+        return list(self.results.get_or_compute(key, compute))
+
+    def retrieve_many(
+        self,
+        retriever: BaseHtmlRetriever,
+        queries: List[QueryBundle],
+        html_nodes: List[str],
+        viewport_only=True,
+    ) -> List[List[str]]:
+        """Same as `retrieve` for several queries, only the queries missing from the cache are passed to `retriever.retrieve_many`"""
+        return self._retrieve_many(
+            retriever,
+            queries,
+            html_nodes,
+            viewport_only,
+            lambda missing: retriever.retrieve_many(missing, html_nodes, viewport_only),
+        )
+
+    def retrieve_page_many(
+        self,
+        retriever: BaseHtmlRetriever,
+        queries: List[QueryBundle],
+        page: ParsedPage,
+        viewport_only=True,
+    ) -> List[Union[ParsedPage, List[str]]]:
+        """Same as `retrieve_many` for a page shared by the stages of a pipeline"""
+        if all(
+            retriever.get_cache_key(query, page.chunks, viewport_only) is None
+            for query in queries
+        ):
+            return retriever.retrieve_page_many(queries, page, viewport_only)
+        return self._retrieve_many(
+            retriever,
+            queries,
+            page.chunks,
+            viewport_only,
+            lambda missing: retriever.retrieve_page_many(missing, page, viewport_only),
+        )
+
+    def _retrieve_many(
+        self,
+        retriever: BaseHtmlRetriever,
+        queries: List[QueryBundle],
+        html_nodes: List[str],
+        viewport_only: bool,
+        compute: Callable[[List[QueryBundle]], list],
+    ) -> List[List[str]]:
+        keys = [
+            retriever.get_cache_key(query, html_nodes, viewport_only)
+            for query in queries
+        ]
+        results = [None if key is None else self.results.get(key) for key in keys]
+        # queries to compute, once per cache key
+        missing = {}
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is None:
+                missing.setdefault((i,) if key is None else key, []).append(i)
+        if missing:
+            computed = compute([queries[indices[0]] for indices in missing.values()])
+            for indices, result in zip(missing.values(), computed):
+                result = tuple(
+                    result.chunks if isinstance(result, ParsedPage) else result
+                )
+                if keys[indices[0]] is not None:
+                    self.results.put(keys[indices[0]], result)
+                for i in indices:
+                    results[i] = result
+        return [list(result) for result in results]
+
+    async def aretrieve(
+        self,
+        retriever: BaseHtmlRetriever,
+        query: QueryBundle,
+        html_nodes: List[str],
+        viewport_only=True,
+    ) -> List[str]:
+        """Same as `retrieve` awaiting `retriever.aretrieve`"""
+        key = retriever.get_cache_key(query, html_nodes, viewport_only)
+        if key is None:
+            return await retriever.aretrieve(query, html_nodes, viewport_only)
+        results = self.results.get(key)
+        if results is None:
+            results = tuple(await retriever.aretrieve(query, html_nodes, viewport_only))
+            self.results.put(key, results)
+        return list(results)
+
+    async def aretrieve_page(
+        self,
+        retriever: BaseHtmlRetriever,
+        query: QueryBundle,
+        page: ParsedPage,
+        viewport_only=True,
+    ) -> Union[ParsedPage, List[str]]:
+        """Same as `retrieve_page` awaiting `retriever.aretrieve_page`"""
+        key = retriever.get_cache_key(query, page.chunks, viewport_only)
+        if key is None:
+            return await retriever.aretrieve_page(query, page, viewport_only)
+        results = self.results.get(key)
+        if results is None:
+            result = await retriever.aretrieve_page(query, page, viewport_only)
+            results = tuple(result.chunks if isinstance(result, ParsedPage) else result)
+            self.results.put(key, results)
+        return list(results)
+
+    def clear(self):
+        self.results.clear()
+        self.subtrees.clear()
+        self.embeddings.clear_memory()
+
+    def stats(self) -> dict:
+        return {
+            "results": self.results.stats(),
+            "subtrees": self.subtrees.stats(),
+            "embeddings": self.embeddings.stats(),
+        }
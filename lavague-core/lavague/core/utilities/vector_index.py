@@ -0,0 +1,217 @@
+from typing import List, Optional, Sequence, Tuple
+from llama_index.core import QueryBundle, Settings
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.embeddings.base import mean_agg
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.schema import NodeWithScore, TextNode
+from lavague.core.utilities.hashing_embedding import HashingEmbedding
+import numpy as np
+
+# Rows scored at once for quantized indexes, bounds the float32 copy of the matrix
+QUANTIZED_BLOCK_SIZE = 4096
+
+
+class VectorIndex:
+    """
+    In-memory cosine similarity index over a contiguous float32 matrix of normalized embeddings,
+    a lightweight replacement of a llama-index `VectorStoreIndex` built for a single page.
+
+    With `quantize`, rows are stored as int8 with one scale per row, dividing memory by 4
+    at the cost of a small error on scores.
+    Top-k uses `argpartition` so that only the k best rows are sorted, ties are broken by position.
+    """
+
+    def __init__(
+        self,
+        texts: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        quantize: bool = False,
+    ):
+        self.texts = list(texts)
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(self.texts), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        self.quantized = quantize
+        if quantize:
+            scales = np.abs(matrix).max(axis=1, keepdims=True) / 127
+            self.scales = np.where(scales > 0, scales, 1).astype(np.float32)
+            self.matrix = np.ascontiguousarray(
+                np.rint(matrix / self.scales), dtype=np.int8
+            )
+        else:
+            self.scales = None
+            self.matrix = np.ascontiguousarray(matrix)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + (self.scales.nbytes if self.quantized else 0)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: Sequence[str],
+        embedding: Optional[BaseEmbedding] = None,
+        quantize: bool = False,
+        embedding_store=None,
+    ) -> "VectorIndex":
+        """
+        Embed texts with the given model, through an `EmbeddingStore` when provided.
+        Local `HashingEmbedding`s are computed directly, without the store.
+        """
+        embedding = embedding or Settings.embed_model
+        if isinstance(embedding, HashingEmbedding):
+            return cls(texts, embedding.embed_many(list(texts)), quantize)
+        if embedding_store is not None:
+            embeddings = embedding_store.get_text_embeddings(embedding, list(texts))
+        elif texts:
+            embeddings = embedding.get_text_embedding_batch(list(texts))
+        else:
+            embeddings = []
+        return cls(texts, embeddings, quantize)
+
+    @classmethod
+    async def afrom_texts(
+        cls,
+        texts: Sequence[str],
+        embedding: Optional[BaseEmbedding] = None,
+        quantize: bool = False,
+        embedding_store=None,
+    ) -> "VectorIndex":
+        """Same as `from_texts` with the asynchronous API of the model"""
+        embedding = embedding or Settings.embed_model
+        if isinstance(embedding, HashingEmbedding):
+            return cls(texts, embedding.embed_many(list(texts)), quantize)
+        if embedding_store is not None:
+            embeddings = await embedding_store.aget_text_embeddings(
+                embedding, list(texts)
+            )
+        elif texts:
+            embeddings = await embedding.aget_text_embedding_batch(list(texts))
+        else:
+            embeddings = []
+        return cls(texts, embeddings, quantize)
+
+    def similarities(self, query_embedding: Sequence[float]) -> np.ndarray:
+        """Cosine similarities of the rows with a query embedding, or one row of similarities per query for a matrix of queries"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(query, axis=-1, keepdims=True)
+        query = np.divide(query, norms, out=query.copy(), where=norms > 0)
+        if not self.quantized:
+            return (self.matrix @ query.T).T
+        scores = np.empty(query.shape[:-1] + (len(self),), dtype=np.float32)
+        for start in range(0, len(self), QUANTIZED_BLOCK_SIZE):
+            block = slice(start, start + QUANTIZED_BLOCK_SIZE)
+            scores[..., block] = (self.matrix[block].astype(np.float32) @ query.T).T
+        return scores * self.scales[:, 0]
+
+    def top_k(
+        self, query_embedding: Sequence[float], k: int
+    ) -> List[Tuple[int, float]]:
+        """(row, cosine similarity) of the k most similar rows, best first"""
+        if len(self) == 0 or k <= 0:
+            return []
+        return self._rank(self.similarities(query_embedding), k)
+
+    def top_k_many(
+        self, query_embeddings: Sequence[Sequence[float]], k: int
+    ) -> List[List[Tuple[int, float]]]:
+        """Same as `top_k` for several queries, scored with a single matrix product"""
+        if len(self) == 0 or k <= 0 or len(query_embeddings) == 0:
+            return [[] for _ in query_embeddings]
+        return [self._rank(scores, k) for scores in self.similarities(query_embeddings)]
+
+    def _rank(self, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        # Candidates in position order, then stably sorted by score so that ties keep that order
+        candidates.sort()
+        best = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def query(self, query_embedding: Sequence[float], k: int) -> List[str]:
+        return [self.texts[i] for i, _ in self.top_k(query_embedding, k)]
+
+    def query_many(
+        self, query_embeddings: Sequence[Sequence[float]], k: int
+    ) -> List[List[str]]:
+        return [
+            [self.texts[i] for i, _ in results]
+            for results in self.top_k_many(query_embeddings, k)
+        ]
+
+
+def get_query_embeddings(
+    embedding: BaseEmbedding, queries: List[QueryBundle]
+) -> List[List[float]]:
+    """
+    Embeddings of several queries, each aggregated from its `embedding_strs` like `get_agg_embedding_from_queries`.
+    Distinct strings are embedded once. Models embedding queries and documents the same way
+    (OpenAI models unless a different query engine is set) get them in a single batch request,
+    others with one query embedding call per string.
+    """
+    strings = list(
+        dict.fromkeys(
+            text
+            for query in queries
+            if query.embedding is None
+            for text in query.embedding_strs
+        )
+    )
+    query_engine = getattr(embedding, "_query_engine", None)
+    if (
+        strings
+        and query_engine is not None
+        and (query_engine == getattr(embedding, "_text_engine", None))
+    ):
+        vectors = embedding.get_text_embedding_batch(strings)
+    else:
+        vectors = [embedding.get_query_embedding(text) for text in strings]
+    embeddings = dict(zip(strings, vectors))
+    return [
+        query.embedding
+        if query.embedding is not None
+        else mean_agg([embeddings[text] for text in query.embedding_strs])
+        for query in queries
+    ]
+
+
+class VectorIndexRetriever(BaseRetriever):
+    """llama-index retriever over a `VectorIndex`, e.g. to build a query engine"""
+
+    def __init__(
+        self,
+        index: VectorIndex,
+        embedding: Optional[BaseEmbedding] = None,
+        similarity_top_k: int = 2,
+    ):
+        super().__init__()
+        self.index = index
+        self.embedding = embedding or Settings.embed_model
+        self.similarity_top_k = similarity_top_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        query_embedding = query_bundle.embedding
+        if query_embedding is None:
+            query_embedding = self.embedding.get_agg_embedding_from_queries(
+                query_bundle.embedding_strs
+            )
+        return self._get_nodes(query_embedding)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        query_embedding = query_bundle.embedding
+        if query_embedding is None:
+            query_embedding = await self.embedding.aget_agg_embedding_from_queries(
+                query_bundle.embedding_strs
+            )
+        return self._get_nodes(query_embedding)
+
+    def _get_nodes(self, query_embedding: Sequence[float]) -> List[NodeWithScore]:
+        return [
+            NodeWithScore(node=TextNode(text=self.index.texts[i]), score=score)
+            for i, score in self.index.top_k(query_embedding, self.similarity_top_k)
+        ]
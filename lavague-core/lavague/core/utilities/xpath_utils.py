@@ -0,0 +1,154 @@
+from typing import Any, Iterator, Optional, Tuple
+from bs4 import BeautifulSoup, Tag
+import lxml.html
+
+# Tags that must be addressed with local-name() since they live in the SVG namespace
+LOCAL_NAME_TAGS = ["svg", "path", "circle", "g"]
+
+XPATH_BACKENDS = ["html.parser", "lxml", "table"]
+
+
+def xpath_step(tag: str, index: int) -> str:
+    """Return the xpath step of the `index`-th (1-based) sibling with the given tag"""
+    if tag in LOCAL_NAME_TAGS:
+        tag = f"*[local-name() = '{tag}']"
+    if index > 1:
+        return f"/{tag}[{index}]"
+    return f"/{tag}"
+
+
+def iter_soup_xpaths(soup: BeautifulSoup) -> Iterator[Tuple[Tag, str]]:
+    """
+    Yield every tag of a BeautifulSoup tree with its xpath, in document order.
+    The tree is walked once from the top with per-tag sibling counters, instead of
+    climbing up the ancestors of each element.
+    """
+    stack = [(soup, "")]
+    while stack:
+        element, xpath = stack.pop()
+        if element is not soup:
+            yield element, xpath
+        counters = {}
+        children = []
+        for child in element.children:
+            if isinstance(child, Tag):
+                counters[child.name] = counters.get(child.name, 0) + 1
+                children.append(
+                    (child, xpath + xpath_step(child.name, counters[child.name]))
+                )
+        stack.extend(reversed(children))
+
+
+def iter_lxml_xpaths(root: lxml.html.HtmlElement) -> Iterator[Tuple[Any, str]]:
+    """Same as `iter_soup_xpaths` for an lxml tree, comments and processing instructions are skipped"""
+    stack = [(root, xpath_step(root.tag, 1))]
+    while stack:
+        element, xpath = stack.pop()
+        yield element, xpath
+        counters = {}
+        children = []
+        for child in element.iterchildren():
+            if isinstance(child.tag, str):
+                counters[child.tag] = counters.get(child.tag, 0) + 1
+                children.append(
+                    (child, xpath + xpath_step(child.tag, counters[child.tag]))
+                )
+        stack.extend(reversed(children))
+
+
+class XPathAnnotator:
+    """
+    Parse HTML and compute the xpath of every element in a single top-down pass.
+
+    The `html.parser` backend produces the same output as the historical BeautifulSoup annotation.
+    The `lxml` backend is much faster and yields the same xpaths on well-formed documents
+    such as the page source returned by the drivers, but serializes the HTML differently.
+    The `table` backend builds the same tree as `html.parser` in a compact `DomTable`, elements
+    are (table, node) pairs.
+    """
+
+    def __init__(self, backend: str = "html.parser"):
+        if backend not in XPATH_BACKENDS:
+            raise ValueError(
+                f"Unknown backend {backend}, expected one of {XPATH_BACKENDS}"
+            )
+        self.backend = backend
+
+    def parse(self, html: str) -> Optional[Any]:
+        if self.backend == "lxml":
+            if not html.strip():
+                return None
+            parser = lxml.html.HTMLParser(huge_tree=True)
+            return lxml.html.document_fromstring(html, parser=parser)
+        if self.backend == "table":
+            from lavague.core.utilities.dom_table import DomTable
+
+            return DomTable.from_html(html)
+        return BeautifulSoup(html, "html.parser")
+
+    def iter_xpaths(self, root: Optional[Any]) -> Iterator[Tuple[Any, str]]:
+        if root is None:
+            return iter(())
+        if self.backend == "lxml":
+            return iter_lxml_xpaths(root)
+        if self.backend == "table":
+            return (((root, node), xpath) for node, xpath in root.iter_xpaths())
+        return iter_soup_xpaths(root)
+
+    def get_tag(self, element: Any) -> str:
+        if self.backend == "lxml":
+            return element.tag
+        if self.backend == "table":
+            table, node = element
+            return table.tag_name(node)
+        return element.name
+
+    def set_xpath(self, element: Any, xpath: str):
+        if self.backend == "lxml":
+            element.set("xpath", xpath)
+        elif self.backend == "table":
+            table, node = element
+            table.set_xpath(node, xpath)
+        else:
+            element["xpath"] = xpath
+
+    def replace_with_html(self, element: Any, html: str):
+        """Replace an element (usually an iframe) by the given HTML document"""
+        self.replace_with_root(element, self.parse(html))
+
+    def replace_with_root(self, element: Any, root: Optional[Any]):
+        """Replace an element (usually an iframe) by a tree parsed with `parse`"""
+        if self.backend == "lxml":
+            if root is None:
+                element.drop_tree()
+                return
+            root.tail = element.tail
+            element.getparent().replace(element, root)
+        elif self.backend == "table":
+            table, node = element
+            table.replace_with_table(node, root)
+        else:
+            element.replace_with(root)
+
+    def serialize(self, root: Optional[Any]) -> str:
+        if root is None:
+            return ""
+        if self.backend == "lxml":
+            return lxml.html.tostring(root, encoding="unicode")
+        if self.backend == "table":
+            return root.serialize()
+        return str(root)
+
+    def annotate(
+        self,
+        html: str,
+        filter_by_xpaths: Optional[Any] = None,
+        xpath_prefix: str = "",
+    ) -> str:
+        """Add an `xpath` attribute to every element, or only to those whose xpath is in `filter_by_xpaths`"""
+        root = self.parse(html)
+        for element, xpath in self.iter_xpaths(root):
+            xpath = xpath_prefix + xpath
+            if filter_by_xpaths is None or xpath in filter_by_xpaths:
+                self.set_xpath(element, xpath)
+        return self.serialize(root)
@@ -8,6 +8,7 @@ from playwright.sync_api import Page, Locator
 from lavague.core.base_driver import (
     BaseDriver,
     JS_GET_INTERACTIVES,
+    JS_GET_FRAMES_HTML,
     JS_WAIT_DOM_IDLE,
     PossibleInteractionsByXpath,
     InteractionType,
@@ -21,6 +22,8 @@ import time
 
 class PlaywrightDriver(BaseDriver):
     page: Page
+    # page.content() is doctype + outerHTML
+    snapshot_html = True
 
     def __init__(
         self,
@@ -307,16 +310,21 @@ class PlaywrightDriver(BaseDriver):
     def scroll_down(self):
         self.execute_script("window.scrollBy(0, window.innerHeight);")
 
+    def get_frames_html(self) -> Optional[Dict[str, str]]:
+        return self.execute_script(JS_GET_FRAMES_HTML)
+
     def get_possible_interactions(
         self, in_viewport=True, foreground_only=True
     ) -> PossibleInteractionsByXpath:
-        exe: Dict[str, List[str]] = self.execute_script(
+        exe: Dict[str, Dict[str, List]] = self.execute_script(
             JS_GET_INTERACTIVES,
             in_viewport,
             foreground_only,
+            True,
         )
+        self.interaction_rects = {k: tuple(v) for k, v in exe["rects"].items()}
         res = dict()
-        for k, v in exe.items():
+        for k, v in exe["interactions"].items():
             res[k] = set(InteractionType[i] for i in v)
         return res
 
@@ -16,6 +16,7 @@ from selenium.webdriver.common.actions.wheel_input import ScrollOrigin
 from lavague.core.base_driver import (
     BaseDriver,
     JS_GET_INTERACTIVES,
+    JS_GET_FRAMES_HTML,
     JS_WAIT_DOM_IDLE,
     JS_GET_SCROLLABLE_PARENT,
     PossibleInteractionsByXpath,
@@ -583,22 +584,18 @@ driver.set_window_size({width}, {height} + height_difference)
         tab_id = 0
 
         for handle in window_handles:
-            # Switch to each tab
-            driver.switch_to.window(handle)
-
-            # Get the title of the current tab
-            title = driver.title
-
-            # Check if this is the focused tab
+            # Check if this is the focused tab, other tabs are switched to for their title
             if handle == current_handle:
-                tab_info.append(f"{tab_id} - [CURRENT] {title}")
+                tab_info.append(f"{tab_id} - [CURRENT] {driver.title}")
             else:
-                tab_info.append(f"{tab_id} - {title}")
+                driver.switch_to.window(handle)
+                tab_info.append(f"{tab_id} - {driver.title}")
 
             tab_id += 1
 
         # Switch back to the original tab
-        driver.switch_to.window(current_handle)
+        if len(window_handles) > 1:
+            driver.switch_to.window(current_handle)
 
         tab_info = "\n".join(tab_info)
         tab_info = "Tabs opened:\n" + tab_info
@@ -663,16 +660,21 @@ driver.set_window_size({width}, {height} + height_difference)
             lambda: self.remove_nodes_highlight(xpaths)
         )
 
+    def get_frames_html(self) -> Optional[Dict[str, str]]:
+        return self.driver.execute_script(JS_GET_FRAMES_HTML)
+
     def get_possible_interactions(
         self, in_viewport=True, foreground_only=True
     ) -> PossibleInteractionsByXpath:
-        exe: Dict[str, List[str]] = self.driver.execute_script(
+        exe: Dict[str, Dict[str, List]] = self.driver.execute_script(
             JS_GET_INTERACTIVES,
             in_viewport,
             foreground_only,
+            True,
         )
+        self.interaction_rects = {k: tuple(v) for k, v in exe["rects"].items()}
         res = dict()
-        for k, v in exe.items():
+        for k, v in exe["interactions"].items():
             res[k] = set(InteractionType[i] for i in v)
         return res
 
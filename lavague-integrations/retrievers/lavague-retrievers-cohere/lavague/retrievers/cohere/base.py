@@ -1,10 +1,80 @@
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+from lavague.core.base_driver import BaseDriver
 from lavague.core.retrievers import OpsmSplitRetriever
+from lavague.core.utilities.retrieval_cache import LRUCache, fingerprint
+import asyncio
+import json
 import cohere
+import httpx
+
+# Connections kept open to each Cohere endpoint, shared by all retrievers
+MAX_CONNECTIONS = 16
+
+_clients: Dict[Tuple[Optional[str], Optional[str]], cohere.Client] = {}
+_clients_lock = Lock()
+# asynchronous clients are bound to the event loop they were created in
+_async_clients: WeakKeyDictionary = WeakKeyDictionary()
+
+# Rerank results of the document batches already sent, shared by all retrievers
+default_rerank_cache = LRUCache(max_size=1024)
+
+
+def _client_kwargs(base_url: Optional[str]) -> dict:
+    return {} if base_url is None else {"base_url": base_url}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS
+    )
+
+
+def get_cohere_client(
+    api_key: Optional[str], base_url: Optional[str] = None
+) -> cohere.Client:
+    """Cohere client shared by the whole process for this key and endpoint, reusing its HTTP connections"""
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = cohere.Client(
+                api_key,
+                httpx_client=httpx.Client(limits=_limits()),
+                **_client_kwargs(base_url),
+            )
+            _clients[key] = client
+        return client
+
+
+def get_cohere_async_client(
+    api_key: Optional[str], base_url: Optional[str] = None
+) -> cohere.AsyncClient:
+    """Same as `get_cohere_client` for the running event loop"""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    key = (api_key, base_url)
+    client = clients.get(key)
+    if client is None:
+        client = cohere.AsyncClient(
+            api_key,
+            httpx_client=httpx.AsyncClient(limits=_limits()),
+            **_client_kwargs(base_url),
+        )
+        clients[key] = client
+    return client
 
 
 class CohereRetriever(OpsmSplitRetriever):
-    """This retriever uses cohere as a backend, which means it will not use the provided embedding model (which can be None)"""
+    """
+    This retriever uses cohere as a backend, which means it will not use the provided embedding model (which can be None).
+
+    Elements are reranked in batches of `batch_size`, up to `max_concurrency` batches at a time, through a client
+    shared by all retrievers. Rerank results are cached by model, query and batch content, so that retries
+    on the same page are not sent again, see `default_rerank_cache`.
+    `driver` is used by `retrieve` to keep only the visible elements.
+    """
 
     def __init__(
         self,
@@ -12,29 +82,100 @@ class CohereRetriever(OpsmSplitRetriever):
         cohere_api_key: Optional[str] = None,
         top_k: int = 5,
         rank_fields=["element", "placeholder", "text", "name"],
+        driver: Optional[BaseDriver] = None,
+        base_url: Optional[str] = None,
+        batch_size: int = 1000,
+        max_concurrency: int = 4,
+        cache: Optional[LRUCache] = None,
     ):
         self.cohere_model = cohere_model
-        self.cohere_session = cohere.Client(cohere_api_key)
-        super().__init__(top_k=top_k, rank_fields=rank_fields)
+        self.cohere_api_key = cohere_api_key
+        self.base_url = base_url
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.cache = default_rerank_cache if cache is None else cache
+        self.cohere_session = get_cohere_client(cohere_api_key, base_url)
+        super().__init__(driver, top_k=top_k, rank_fields=rank_fields)
 
-    def _get_results(self, _embedding, query, html):
+    def _batches(self, html) -> List[Tuple[int, list]]:
         attributes_list = self._create_nodes_dict(html)
-        l = len(attributes_list)
+        return [
+            (j, attributes_list[j : j + self.batch_size])
+            for j in range(0, len(attributes_list), self.batch_size)
+        ]
+
+    def _cache_key(self, query: str, documents: list) -> str:
+        return fingerprint(
+            self.cohere_model,
+            query,
+            str(self.top_k),
+            json.dumps(self.rank_fields),
+            json.dumps(documents, sort_keys=True),
+        )
+
+    def _rerank_kwargs(self, query: str, documents: list) -> dict:
+        return dict(
+            model=self.cohere_model,
+            query=query,
+            documents=documents,
+            top_n=self.top_k,
+            return_documents=True,
+            rank_fields=self.rank_fields,
+        )
+
+    def _rerank(self, query: str, documents: list) -> tuple:
+        response = self.cohere_session.rerank(**self._rerank_kwargs(query, documents))
+        return tuple(r.dict() for r in response.results)
+
+    def _get_results(self, query, html):
+        batches = self._batches(html)
+        keys = [self._cache_key(query, documents) for _, documents in batches]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if len(missing) > 1 and self.max_concurrency > 1:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_concurrency, len(missing))
+            ) as executor:
+                computed = list(
+                    executor.map(lambda i: self._rerank(query, batches[i][1]), missing)
+                )
+        else:
+            computed = [self._rerank(query, batches[i][1]) for i in missing]
+        for i, result in zip(missing, computed):
+            self.cache.put(keys[i], result)
+            results[i] = result
+        return self._merge_results(batches, results)
+
+    async def _aget_results(self, query, html):
+        """Rerank the batches concurrently with the asynchronous client"""
+        session = get_cohere_async_client(self.cohere_api_key, self.base_url)
+        batches = await asyncio.to_thread(self._batches, html)
+        keys = [self._cache_key(query, documents) for _, documents in batches]
+        results = [self.cache.get(key) for key in keys]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def rerank(i: int):
+            async with semaphore:
+                response = await session.rerank(
+                    **self._rerank_kwargs(query, batches[i][1])
+                )
+            result = tuple(r.dict() for r in response.results)
+            self.cache.put(keys[i], result)
+            results[i] = result
+
+        await asyncio.gather(
+            *[rerank(i) for i, result in enumerate(results) if result is None]
+        )
+        return self._merge_results(batches, results)
+
+    def _merge_results(self, batches, results):
         list_of_results = []
-        for j in range(0, l, 1000):
-            attr = attributes_list[j : j + 1000]
-            results = self.cohere_session.rerank(
-                model=self.cohere_model,
-                query=query,
-                documents=attr,
-                top_n=self.top_k,
-                return_documents=True,
-                rank_fields=self.rank_fields,
-            )
-            results = [r.dict() for r in results.results]
-            for r in results:
-                r["index"] += j
-            list_of_results += results
+        for (j, _), batch_results in zip(batches, results):
+            for r in batch_results:
+                list_of_results.append({**r, "index": r["index"] + j})
+        return self._top_results(list_of_results)
+
+    def _top_results(self, list_of_results):
         list_of_results = sorted(
             list_of_results, key=lambda x: x["relevance_score"], reverse=True
         )
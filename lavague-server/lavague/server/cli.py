@@ -2,6 +2,7 @@ import click
 from lavague.server import AgentSession
 from lavague.core import WorldModel, ActionEngine
 from lavague.core.agents import WebAgent
+from lavague.core.utilities.process_pool import ProcessPool, set_default_process_pool
 from lavague.server.driver import DriverServer
 from lavague.server.base import AgentServer
 
@@ -15,7 +16,18 @@ from lavague.server.base import AgentServer
     default=8000,
     help="Server port",
 )
-def cli(port: int) -> None:
+@click.option(
+    "--workers",
+    "-w",
+    type=int,
+    required=False,
+    default=0,
+    help="Worker processes annotating and chunking large pages, 0 to process them in the server process",
+)
+def cli(port: int, workers: int) -> None:
+    if workers > 0:
+        set_default_process_pool(ProcessPool(max_workers=workers))
+
     def create_agent(session: AgentSession):
         world_model = WorldModel()
         driver = DriverServer(session)
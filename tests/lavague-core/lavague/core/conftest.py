@@ -0,0 +1,5 @@
+import os
+import sys
+
+# test fakes shared by the tests of lavague.core and its utilities, see `fakes`
+sys.path.insert(0, os.path.dirname(__file__))
@@ -0,0 +1,126 @@
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from llama_index.core.embeddings import BaseEmbedding
+
+DEFAULT_WORDS = ["cart", "shop", "deals", "home", "shoes"]
+
+
+class FakeDriver:
+    """
+    Driver on a static page, with the reads the retrievers make. `html_by_frame` maps the full xpath
+    of every frame to its HTML ("" being the page), `captured` is returned by `get_frames_html`,
+    None meaning that frames are read by switching to them. Calls are counted by method in `calls`.
+    """
+
+    def __init__(
+        self,
+        possible_interactions: Optional[Dict[str, Set]] = None,
+        html_by_frame: Optional[Dict[str, str]] = None,
+        captured: Optional[Dict[str, str]] = None,
+        rects: Optional[Dict[str, Tuple[float, float, float, float]]] = None,
+        url: Optional[str] = None,
+    ):
+        self.possible_interactions = possible_interactions or {}
+        self.html_by_frame = html_by_frame or {}
+        self.captured = captured
+        self.rects = rects
+        self.url = url
+        # stack of the frames switched to
+        self.frames = [""]
+        self.calls = Counter()
+
+    @property
+    def round_trips(self) -> int:
+        return sum(self.calls.values())
+
+    def get_url(self):
+        self.calls["get_url"] += 1
+        return self.url
+
+    def get_capability(self):
+        return ""
+
+    def get_possible_interactions(self, in_viewport=True):
+        self.calls["get_possible_interactions"] += 1
+        return self.possible_interactions
+
+    def get_interaction_rects(self):
+        self.calls["get_interaction_rects"] += 1
+        return self.rects
+
+    def get_html(self):
+        self.calls["get_html"] += 1
+        return self.html_by_frame[self.frames[-1]]
+
+    def get_frames_html(self):
+        self.calls["get_frames_html"] += 1
+        return self.captured
+
+    def switch_frame(self, xpath):
+        self.calls["switch_frame"] += 1
+        self._switch_frame(xpath)
+
+    def switch_parent_frame(self):
+        self.calls["switch_parent_frame"] += 1
+        self.frames.pop()
+
+    def execute_script(self, js_code, *args):
+        self.calls["execute_script"] += 1
+        return []
+
+    async def aget_possible_interactions(self, in_viewport=True):
+        self.calls["aget_possible_interactions"] += 1
+        return self.possible_interactions
+
+    async def aget_html(self):
+        self.calls["aget_html"] += 1
+        return self.html_by_frame[self.frames[-1]]
+
+    async def aget_frames_html(self):
+        self.calls["aget_frames_html"] += 1
+        return self.captured
+
+    async def aswitch_frame(self, xpath):
+        self.calls["aswitch_frame"] += 1
+        self._switch_frame(xpath)
+
+    async def aswitch_parent_frame(self):
+        self.calls["aswitch_parent_frame"] += 1
+        self.frames.pop()
+
+    def _switch_frame(self, xpath):
+        frame = self.frames[-1] + xpath
+        if frame not in self.html_by_frame:
+            raise ValueError(xpath)
+        self.frames.append(frame)
+
+
+class WordEmbedding(BaseEmbedding):
+    """Counts of `words` in the text, enough to rank texts deterministically. Embedded texts are recorded."""
+
+    words: List[str]
+    texts: List[str] = []
+    queries: int = 0
+    async_calls: int = 0
+
+    def __init__(self, words: List[str] = DEFAULT_WORDS, **kwargs):
+        super().__init__(words=words, model_name="words-" + "-".join(words), **kwargs)
+
+    def vector(self, text: str) -> List[float]:
+        return [text.lower().count(w) + 0.01 * i for i, w in enumerate(self.words)]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        self.queries += 1
+        return self.vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        self.async_calls += 1
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        self.texts.append(text)
+        return self.vector(text)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        self.async_calls += 1
+        return self._get_text_embedding(text)
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import unittest
+from typing import List
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import (
+    BaseHtmlRetriever,
+    FromXPathNodesExpansionRetriever,
+    InteractiveXPathRetriever,
+    ParallelRetrievers,
+    RetrieversPipeline,
+    SemanticRetriever,
+)
+from lavague.core.utilities.retrieval_cache import RetrievalCache
+from lavague.core.utilities.embedding_store import EmbeddingStore
+from fakes import FakeDriver, WordEmbedding
+
+HTML = """<html><body>
+<nav><a href="/">Home</a><a href="/shop">Shop</a></nav>
+<main><h1>Products</h1><div><p>Blue shoes</p><button>Add to cart</button></div>
+<iframe src="/ads"></iframe></main>
+</body></html>"""
+
+FRAME_HTML = "<html><body><a>Deals</a></body></html>"
+
+INTERACTIONS = {
+    "/html/body/nav/a[2]": set(),
+    "/html/body/main/div/button": set(),
+    "/html/body/main/iframe/html/body/a": set(),
+}
+
+HTML_BY_FRAME = {"": HTML, "/html/body/main/iframe": FRAME_HTML}
+
+
+class SleepingRetriever(BaseHtmlRetriever):
+    def __init__(self, results: List[str], delay: float):
+        self.results = results
+        self.delay = delay
+
+    def retrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        time.sleep(self.delay)
+        return self.results
+
+    async def aretrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        await asyncio.sleep(self.delay)
+        return self.results
+
+
+def get_pipeline(driver, embedding, backend):
+    cache = RetrievalCache(embedding_store=EmbeddingStore(path=None))
+    return RetrieversPipeline(
+        InteractiveXPathRetriever(driver, backend=backend),
+        FromXPathNodesExpansionRetriever(chunk_size=60),
+        SemanticRetriever(embedding=embedding, top_k=2, cache=cache),
+        cache=cache,
+    )
+
+
+class TestAsyncRetrievers(unittest.TestCase):
+    def test_same_output_as_retrieve(self):
+        query = QueryBundle("add to cart")
+        for backend in ["html.parser", "table", "lxml"]:
+            driver = FakeDriver(INTERACTIONS, HTML_BY_FRAME)
+            embedding = WordEmbedding()
+            expected = get_pipeline(
+                FakeDriver(INTERACTIONS, HTML_BY_FRAME), WordEmbedding(), backend
+            ).retrieve(query, [HTML])
+            results = asyncio.run(
+                get_pipeline(driver, embedding, backend).aretrieve(query, [HTML])
+            )
+            self.assertEqual(results, expected)
+            self.assertEqual(driver.frames, [""])
+            # frames are captured once for the results key, then switched into as they cannot be captured
+            self.assertEqual(driver.round_trips, 6)
+            self.assertTrue(all(name.startswith("a") for name in driver.calls))
+            self.assertGreater(embedding.async_calls, 0)
+
+    def test_parallel_members_run_concurrently(self):
+        stage = ParallelRetrievers(
+            SleepingRetriever(["a"], 0.3),
+            SleepingRetriever(["b"], 0.3),
+            SleepingRetriever(["c"], 5),
+            timeouts=[None, None, 0.5],
+        )
+        start = time.monotonic()
+        results = asyncio.run(stage.aretrieve_all(QueryBundle("q"), []))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(results, [["a"], ["b"], None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import unittest
+from collections import Counter
+from lavague.core.base_driver import BaseDriver, InteractionType
+
+HTML = "<!DOCTYPE html><html><head></head><body><a>Home</a></body></html>"
+
+
+class CountingDriver(BaseDriver):
+    """Driver on a static page counting its round trips, with or without script arguments"""
+
+    def __init__(self, batched: bool = True):
+        self.calls = Counter()
+        self.batched = batched
+        self.page = 0
+        super().__init__(None, None)
+
+    def default_init_code(self):
+        import os
+
+        return os
+
+    def code_for_init(self):
+        return ""
+
+    def destroy(self):
+        pass
+
+    def get_driver(self):
+        return self.driver
+
+    def resize_driver(self, width, height):
+        pass
+
+    def get_url(self):
+        self.calls["get_url"] += 1
+        return f"https://example.com/{self.page}"
+
+    def get(self, url):
+        self.calls["get"] += 1
+        self.page += 1
+
+    def code_for_get(self, url):
+        return ""
+
+    def back(self):
+        self.page -= 1
+
+    def maximize_window(self):
+        pass
+
+    def code_for_back(self):
+        return ""
+
+    def get_html(self):
+        self.calls["get_html"] += 1
+        return HTML
+
+    def get_possible_interactions(self, in_viewport=True, foreground_only=True):
+        self.calls["get_possible_interactions"] += 1
+        self.interaction_rects = {"/html/body/a": (0, 0, 10, 10)}
+        return {"/html/body/a": {InteractionType.CLICK}}
+
+    def get_highlighted_element(self, generated_code):
+        pass
+
+    def exec_code(self, code, globals=None, locals=None):
+        self.page += 1
+
+    def execute_script(self, js_code, *args):
+        self.calls["execute_script"] += 1
+        if not self.batched:
+            raise TypeError("script arguments are not supported")
+        return {
+            "url": f"https://example.com/{self.page}",
+            "title": "Example",
+            "html": HTML if args[3] else None,
+            "scroll_position": [0, 0],
+            "page_size": [800, 2000],
+            "viewport_size": [800, 600],
+            "interactives": {
+                "interactions": {"/html/body/a": ["CLICK"]},
+                "rects": {"/html/body/a": [0, 0, 10, 10]},
+            }
+            if args[0]
+            else None,
+        }
+
+    def scroll_up(self):
+        pass
+
+    def scroll_down(self):
+        pass
+
+    def code_for_execute_script(self, js_code):
+        return ""
+
+    def get_capability(self):
+        return ""
+
+    def get_screenshot_as_png(self):
+        return b""
+
+
+class TestDriverSnapshot(unittest.TestCase):
+    def test_reads_are_memoized_within_a_step(self):
+        driver = CountingDriver()
+        with driver.step():
+            for _ in range(3):
+                driver.get_url()
+                driver.get_html()
+                driver.get_possible_interactions(in_viewport=True)
+        self.assertEqual(driver.calls["get_url"], 1)
+        self.assertEqual(driver.calls["get_html"], 1)
+        self.assertEqual(driver.calls["get_possible_interactions"], 1)
+
+        driver.get_url()
+        driver.get_url()
+        self.assertEqual(driver.calls["get_url"], 3)
+
+    def test_page_changes_invalidate_reads(self):
+        driver = CountingDriver()
+        with driver.step():
+            self.assertEqual(driver.get_url(), "https://example.com/0")
+            driver.exec_code("")
+            self.assertEqual(driver.get_url(), "https://example.com/1")
+            driver.scroll_down()
+            driver.get_url()
+            driver.get_possible_interactions(False)
+            driver.interaction_rects = None
+            driver.get_possible_interactions(in_viewport=False)
+        self.assertEqual(driver.calls["get_url"], 3)
+        self.assertEqual(driver.calls["get_possible_interactions"], 1)
+        self.assertEqual(
+            driver.get_interaction_rects(), {"/html/body/a": (0, 0, 10, 10)}
+        )
+
+    def test_snapshot_seeds_reads(self):
+        driver = CountingDriver()
+        driver.snapshot_html = True
+        with driver.step():
+            snapshot = driver.snapshot()
+            self.assertEqual(driver.snapshot(), snapshot)
+            self.assertEqual(driver.get_url(), snapshot.url)
+            self.assertEqual(driver.get_html(), HTML)
+            self.assertEqual(
+                driver.get_possible_interactions(in_viewport=True),
+                {"/html/body/a": {InteractionType.CLICK}},
+            )
+        self.assertEqual(driver.calls["execute_script"], 1)
+        self.assertEqual(driver.calls["get_url"], 0)
+        self.assertEqual(driver.calls["get_html"], 0)
+        self.assertEqual(driver.calls["get_possible_interactions"], 0)
+        self.assertEqual(snapshot.viewport_size, (800, 600))
+        self.assertEqual(snapshot.interaction_rects, {"/html/body/a": (0, 0, 10, 10)})
+
+    def test_snapshot_reads_driver_html(self):
+        driver = CountingDriver()
+        with driver.step():
+            snapshot = driver.snapshot(with_interactions=False)
+            self.assertEqual(snapshot.html, HTML)
+            self.assertEqual(driver.get_html(), HTML)
+        # the HTML comes from get_html unless the driver serializes it as the script does
+        self.assertEqual(driver.calls["get_html"], 1)
+        self.assertEqual(driver.calls["get_url"], 0)
+        self.assertIsNone(snapshot.possible_interactions)
+
+    def test_snapshot_falls_back_to_reads(self):
+        driver = CountingDriver(batched=False)
+        snapshot = driver.snapshot(with_interactions=False)
+        self.assertEqual(snapshot.url, "https://example.com/0")
+        self.assertEqual(snapshot.html, HTML)
+        self.assertIsNone(snapshot.possible_interactions)
+        self.assertIsNone(snapshot.scroll_position)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import InteractiveXPathRetriever
+from fakes import FakeDriver
+
+HTML = """<html><body>
+<main><button>Buy</button><iframe src="/ads"></iframe><iframe src="https://other.com"></iframe></main>
+</body></html>"""
+
+ADS = "<html><body><a>Deals</a><div><iframe src='/nested'></iframe></div></body></html>"
+NESTED = "<html><body><a>Nested</a></body></html>"
+OTHER = "<html><body><a>Cross origin</a></body></html>"
+
+FRAMES = {
+    "/html/body/main/iframe": ADS,
+    "/html/body/main/iframe/html/body/div/iframe": NESTED,
+    "/html/body/main/iframe[2]": OTHER,
+}
+
+INTERACTIONS = {
+    "/html/body/main/button": set(),
+    "/html/body/main/iframe/html/body/a": set(),
+    "/html/body/main/iframe/html/body/div/iframe/html/body/a": set(),
+    "/html/body/main/iframe[2]/html/body/a": set(),
+}
+
+HTML_BY_FRAME = {"": HTML, **FRAMES}
+
+
+class TestInteractiveXPathRetriever(unittest.TestCase):
+    def test_frames_captured_in_one_round_trip(self):
+        query = QueryBundle("q")
+        for backend in ["html.parser", "table", "lxml"]:
+            driver = FakeDriver(INTERACTIONS, HTML_BY_FRAME)
+            expected = InteractiveXPathRetriever(driver, backend).retrieve(
+                query, [HTML]
+            )
+            for xpath in INTERACTIONS:
+                self.assertIn(f'xpath="{xpath}"', expected[0])
+            # all frames captured, after reading the interactions
+            driver = FakeDriver(INTERACTIONS, HTML_BY_FRAME, captured=FRAMES)
+            results = InteractiveXPathRetriever(driver, backend).retrieve(query, [HTML])
+            self.assertEqual(results, expected)
+            self.assertEqual(driver.round_trips, 2)
+            # the cross-origin frame is read by switching to it
+            captured = {k: v for k, v in FRAMES.items() if "iframe[2]" not in k}
+            driver = FakeDriver(INTERACTIONS, HTML_BY_FRAME, captured=captured)
+            results = InteractiveXPathRetriever(driver, backend).retrieve(query, [HTML])
+            self.assertEqual(results, expected)
+            self.assertEqual(driver.round_trips, 5)
+            self.assertEqual(driver.frames, [""])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from lavague.core.retrievers import OpsmSplitRetriever
+from lavague.core.utilities.bm25 import BM25Index
+
+HTML = "<html><body>{}</body></html>".format(
+    "".join(
+        f'<div xpath="/html/body/div[{i + 1}]">'
+        f'<button xpath="/html/body/div[{i + 1}]/button" name="{name}">{name} {i}</button></div>'
+        for i, name in enumerate(
+            ["cart", "home", "shop", "deals", "about", "help"]
+            + ["news", "blog", "cart", "faq", "jobs", "team"]
+        )
+    )
+)
+
+
+class TestOpsmSplitRetriever(unittest.TestCase):
+    def test_top_k_per_slice(self):
+        retriever = OpsmSplitRetriever(None, top_k=1)
+        retriever.slice_size = 3
+        texts = ["home", "add to cart", "shop", "cart", "deals", "about", "cart"]
+        results = retriever._sliced_top_k(BM25Index(), "cart", texts)
+        self.assertEqual([i for i, _ in results], [1, 3, 6])
+
+    def test_every_slice_keeps_its_candidates(self):
+        retriever = OpsmSplitRetriever(None, top_k=1, group_by=1)
+        retriever.slice_size = 6
+        candidates = []
+        sliced_top_k = retriever._sliced_top_k
+
+        def spy(index, query, texts):
+            results = sliced_top_k(index, query, texts)
+            candidates.append(len(results))
+            return results
+
+        retriever._sliced_top_k = spy
+        results, _ = retriever._get_results("cart", HTML)
+        # the best group of each slice goes to the second round
+        self.assertEqual(candidates[0], 2)
+        self.assertEqual(len(results), 1)
+        self.assertIn(results[0]["text"], ["cart 0", "cart 8"])
+
+
+if __name__ == "__main__":
+    unittest.main()
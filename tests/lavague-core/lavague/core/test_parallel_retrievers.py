@@ -0,0 +1,75 @@
+import time
+import unittest
+from typing import List
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import BaseHtmlRetriever, ParallelRetrievers
+from lavague.core.utilities.profiling import add_profiling_data, time_profiler
+
+
+class StaticRetriever(BaseHtmlRetriever):
+    def __init__(self, results: List[str], delay: float = 0):
+        self.results = results
+        self.delay = delay
+
+    def retrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        time.sleep(self.delay)
+        return self.results
+
+
+class ReportingRetriever(StaticRetriever):
+    def retrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        add_profiling_data("members", self.results[0])
+        return self.results
+
+
+class FailingRetriever(BaseHtmlRetriever):
+    def retrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        raise RuntimeError("unavailable")
+
+
+class TestParallelRetrievers(unittest.TestCase):
+    def test_reciprocal_rank_fusion(self):
+        stage = ParallelRetrievers(
+            StaticRetriever(["a", "b", "c"]), StaticRetriever(["c", "b"])
+        )
+        self.assertEqual(stage.retrieve(QueryBundle("q"), []), ["c", "b", "a"])
+
+    def test_weighted_fusion(self):
+        stage = ParallelRetrievers(
+            StaticRetriever(["a", "b"]),
+            StaticRetriever(["b", "a"]),
+            weights=[1, 3],
+            fusion="weighted",
+            top_k=1,
+        )
+        self.assertEqual(stage.retrieve(QueryBundle("q"), []), ["b"])
+
+    def test_slow_and_failing_members_are_skipped(self):
+        stage = ParallelRetrievers(
+            StaticRetriever(["a"], delay=0.2),
+            StaticRetriever(["b"], delay=0.2),
+            StaticRetriever(["c"], delay=5),
+            FailingRetriever(),
+            timeouts=[None, None, 0.5, None],
+        )
+        start = time.monotonic()
+        results = stage.retrieve_all(QueryBundle("q"), [])
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(results, [["a"], ["b"], None, None])
+
+    def test_members_report_to_the_caller_profiling(self):
+        stage = ParallelRetrievers(ReportingRetriever(["a"]), ReportingRetriever(["b"]))
+        with time_profiler("Retrieval") as record:
+            stage.retrieve(QueryBundle("q"), [])
+            stage.retrieve_many([QueryBundle("q"), QueryBundle("r")], [])
+        self.assertEqual(sorted(record["members"]), ["a"] * 3 + ["b"] * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from llama_index.core import QueryBundle
+from lavague.core.exceptions import RetrievalServiceException
+from lavague.core.retrieval_service import (
+    RemoteRetriever,
+    RetrievalServer,
+    parse_address,
+)
+from lavague.core.retrievers import BM25HtmlRetriever, RetrieversPipeline
+from lavague.core.utilities.retrieval_cache import RetrievalCache
+
+HTML = "\n".join(
+    f'<div xpath="/html/body/div[{i}]"><button>Product {i} add to cart</button></div>'
+    for i in range(1, 30)
+)
+
+
+class TestRetrievalService(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.directory.name, "retrieval.sock")
+        cache = RetrievalCache()
+        self.pipeline = RetrieversPipeline(BM25HtmlRetriever(top_k=3), cache=cache)
+        self.server = RetrievalServer(
+            {"bm25": self.pipeline}, self.address, max_workers=2
+        ).start_in_thread()
+
+    def tearDown(self):
+        self.server.stop()
+        self.directory.cleanup()
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("localhost:8765"), ("localhost", 8765))
+        self.assertEqual(parse_address("/tmp/retrieval.sock"), "/tmp/retrieval.sock")
+
+    def test_remote_retrieval(self):
+        query = QueryBundle("Product 7")
+        expected = self.pipeline.retrieve(query, [HTML])
+        # two agents share the cache of the service
+        agents = [RemoteRetriever("bm25", self.address) for _ in range(2)]
+        for agent in agents:
+            self.assertEqual(agent.retrieve(query, [HTML]), expected)
+        self.assertEqual(
+            agents[0].retrieve_many([query, QueryBundle("Product 9")], [HTML])[0],
+            expected,
+        )
+        self.assertEqual(asyncio.run(agents[1].aretrieve(query, [HTML])), expected)
+        stats = agents[0].stats()
+        self.assertEqual(stats["requests"], 5)
+        self.assertGreaterEqual(stats["caches"]["bm25"]["final"]["hits"], 3)
+        with self.assertRaises(RetrievalServiceException):
+            RemoteRetriever("missing", self.address).retrieve(query, [HTML])
+        for agent in agents:
+            agent.close()
+
+    def test_reconnects_after_restart(self):
+        query = QueryBundle("Product 7")
+        agent = RemoteRetriever("bm25", self.address)
+        expected = agent.retrieve(query, [HTML])
+        self.server.stop()
+        self.server = RetrievalServer(
+            {"bm25": self.pipeline}, self.address, max_workers=2
+        ).start_in_thread()
+        self.assertEqual(agent.retrieve(query, [HTML]), expected)
+        self.assertEqual(agent.stats()["requests"], 2)
+        agent.close()
+
+    def test_sent_requests_are_not_sent_again(self):
+        address = os.path.join(self.directory.name, "closing.sock")
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(address)
+        listener.listen()
+        received = []
+
+        def serve():
+            # read the request and close the connection without answering
+            while True:
+                try:
+                    connection, _ = listener.accept()
+                except OSError:
+                    return
+                received.append(connection.recv(1 << 16))
+                connection.close()
+
+        threading.Thread(target=serve, daemon=True).start()
+        agent = RemoteRetriever("bm25", address)
+        with self.assertRaises(ConnectionError):
+            agent.retrieve(QueryBundle("Product 7"), [HTML])
+        self.assertEqual(len(received), 1)
+        listener.close()
+
+    def test_tcp_token(self):
+        with self.assertRaises(RetrievalServiceException):
+            RetrievalServer({"bm25": self.pipeline}, "0.0.0.0:0").start_in_thread()
+        server = RetrievalServer(
+            {"bm25": self.pipeline}, "0.0.0.0:0", token="secret"
+        ).start_in_thread()
+        try:
+            port = server._server.sockets[0].getsockname()[1]
+            address = f"127.0.0.1:{port}"
+            query = QueryBundle("Product 7")
+            expected = self.pipeline.retrieve(query, [HTML])
+            for token in [None, "wrong"]:
+                agent = RemoteRetriever("bm25", address, token=token)
+                with self.assertRaises(RetrievalServiceException):
+                    agent.retrieve(query, [HTML])
+                agent.close()
+            agent = RemoteRetriever("bm25", address, token="secret")
+            self.assertEqual(agent.retrieve(query, [HTML]), expected)
+            self.assertEqual(asyncio.run(agent.aretrieve(query, [HTML])), expected)
+            self.assertEqual(agent.stats()["requests"], 3)
+            agent.close()
+        finally:
+            server.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
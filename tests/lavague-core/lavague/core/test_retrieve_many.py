@@ -0,0 +1,81 @@
+import unittest
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import (
+    InteractiveXPathRetriever,
+    ParallelRetrievers,
+    RetrieversPipeline,
+    SemanticRetriever,
+    XPathedChunkRetriever,
+)
+from lavague.core.utilities.embedding_store import EmbeddingStore
+from lavague.core.utilities.retrieval_cache import RetrievalCache
+from fakes import FakeDriver, WordEmbedding
+
+FILLER = "<p>" + "lorem ipsum " * 200 + "</p>"
+
+HTML = f"""<html><body>
+<nav><a href="/">Home</a><a href="/shop">Shop</a></nav>{FILLER}
+<form><div><input name="name"></div>{FILLER}<div><input name="email"></div>{FILLER}
+<div><button>Submit</button></div></form>
+</body></html>"""
+
+INTERACTIONS = {
+    "/html/body/nav/a[2]": set(),
+    "/html/body/form/div/input": set(),
+    "/html/body/form/div[2]/input": set(),
+    "/html/body/form/div[3]/button": set(),
+}
+
+WORDS = ["name", "email", "submit", "shop", "home"]
+
+QUERIES = [QueryBundle(q) for q in ["fill name", "fill email", "click submit", "shop"]]
+
+
+def get_pipeline(driver, embedding, cache=None):
+    return RetrieversPipeline(
+        InteractiveXPathRetriever(driver, backend="table"),
+        SemanticRetriever(embedding=embedding, top_k=1, cache=cache),
+        cache=cache,
+    )
+
+
+class TestRetrieveMany(unittest.TestCase):
+    def test_same_results_as_retrieve(self):
+        expected = [
+            get_pipeline(FakeDriver(INTERACTIONS), WordEmbedding(WORDS)).retrieve(
+                query, [HTML]
+            )
+            for query in QUERIES
+        ]
+        for cache in [None, RetrievalCache(embedding_store=EmbeddingStore(None))]:
+            driver = FakeDriver(INTERACTIONS)
+            embedding = WordEmbedding(WORDS)
+            results = get_pipeline(driver, embedding, cache).retrieve_many(
+                QUERIES, [HTML]
+            )
+            self.assertEqual(results, expected)
+            self.assertIn("Submit", results[2][0])
+            # the page is annotated and embedded once
+            self.assertEqual(driver.calls["get_possible_interactions"], 1)
+            self.assertEqual(embedding.queries, len(QUERIES))
+            texts = list(embedding.texts)
+            get_pipeline(driver, embedding, cache).retrieve_many(QUERIES, [HTML])
+            if cache is not None:
+                self.assertEqual(embedding.texts, texts)
+
+    def test_parallel_retrievers(self):
+        stage = ParallelRetrievers(
+            SemanticRetriever(embedding=WordEmbedding(WORDS), top_k=2),
+            XPathedChunkRetriever(),
+        )
+        chunks = get_pipeline(FakeDriver(INTERACTIONS), WordEmbedding(WORDS)).retrieve(
+            QueryBundle("q"), [HTML]
+        )
+        self.assertEqual(
+            stage.retrieve_many(QUERIES, chunks),
+            [stage.retrieve(query, chunks) for query in QUERIES],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
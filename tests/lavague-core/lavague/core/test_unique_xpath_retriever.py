@@ -0,0 +1,47 @@
+import unittest
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import UniqueXPathRetriever
+from fakes import FakeDriver
+
+HTML = """<html><body>
+<a xpath="/html/body/a"><span xpath="/html/body/a/span">Home</span></a>
+<button xpath="/html/body/button">Add to cart</button>
+<input xpath="/html/body/input"/>
+<a xpath="/html/body/div/a">Deals</a>
+</body></html>"""
+
+RECTS = {
+    "/html/body/a": (10, 10, 50, 20),
+    # same box as its parent link
+    "/html/body/a/span": (10, 10, 50, 20),
+    "/html/body/button": (10, 40, 80, 20),
+    "/html/body/input": (100, 40, 80, 20),
+}
+
+
+class TestUniqueXPathRetriever(unittest.TestCase):
+    def test_offline_dedupe(self):
+        driver = FakeDriver(rects=RECTS)
+        results = UniqueXPathRetriever(driver, offline=True).retrieve(
+            QueryBundle(""), [HTML]
+        )
+        self.assertEqual(
+            results,
+            [
+                '<a xpath="/html/body/a"><span xpath="/html/body/a/span">Home</span></a>',
+                '<button xpath="/html/body/button">Add to cart</button>',
+                '<input xpath="/html/body/input"/>',
+                # no rect, kept
+                '<a xpath="/html/body/div/a">Deals</a>',
+            ],
+        )
+        self.assertEqual(driver.calls["execute_script"], 0)
+
+    def test_falls_back_to_browser_without_rects(self):
+        driver = FakeDriver()
+        UniqueXPathRetriever(driver, offline=True).retrieve(QueryBundle(""), [HTML])
+        self.assertEqual(driver.calls["execute_script"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
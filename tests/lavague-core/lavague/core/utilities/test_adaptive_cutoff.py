@@ -0,0 +1,50 @@
+import unittest
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import SemanticRetriever
+from lavague.core.utilities import profiling
+from lavague.core.utilities.adaptive_cutoff import AdaptiveCutoff
+from lavague.core.utilities.hashing_embedding import HashingEmbedding
+
+
+class TestAdaptiveCutoff(unittest.TestCase):
+    def test_cutoff(self):
+        cutoff = AdaptiveCutoff()
+        # the first result dominates
+        self.assertEqual(cutoff.cutoff([0.9, 0.4, 0.38, 0.35, 0.33]), 1)
+        # gap after the third result
+        self.assertEqual(cutoff.cutoff([1, 0.95, 0.9, 0.3, 0.25, 0.2]), 3)
+        # elbow without a single large gap
+        self.assertEqual(cutoff.cutoff([0.6, 0.45, 0.3, 0.25, 0.22, 0.2, 0.19]), 3)
+        # ambiguous
+        self.assertEqual(cutoff.cutoff([1, 0.9, 0.8, 0.7, 0.6]), 5)
+        self.assertEqual(cutoff.cutoff([0.8, 0.79, 0.79, 0.78]), 4)
+        self.assertEqual(AdaptiveCutoff(min_k=2).cutoff([0.9, 0.4, 0.38, 0.35]), 2)
+        with self.assertRaises(ValueError):
+            AdaptiveCutoff(min_k=3, max_k=2)
+
+    def test_retriever_profile(self):
+        chunks = [f"<p>Product {i} shoes</p>" for i in range(8)]
+        chunks.append("<input placeholder='Subscribe to the newsletter'>")
+        retriever = SemanticRetriever(
+            HashingEmbedding(),
+            top_k=5,
+            xpathed_only=False,
+            cutoff=AdaptiveCutoff(),
+        )
+        retriever.chunker.chunk_size = 60
+        profiling.clear_profiling_data()
+        with profiling.time_profiler("Retriever Inference") as profiler:
+            results = retriever.retrieve(
+                QueryBundle("subscribe to the newsletter"), ["\n".join(chunks)]
+            )
+        self.assertEqual(results, [chunks[-1]])
+        [record] = profiler["top_k_cutoffs"]
+        self.assertEqual(record["retriever"], "SemanticRetriever")
+        self.assertEqual((record["k"], record["candidates"]), (1, 5))
+        self.assertEqual(len(record["scores"]), 5)
+        self.assertGreater(record["saved_size"], 0)
+        self.assertEqual(profiling.agent_events[-1][-1]["top_k_cutoffs"], [record])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from llama_index.retrievers.bm25.base import tokenize_remove_stopwords
+from rank_bm25 import BM25Okapi
+from lavague.core.utilities.bm25 import BM25Index
+
+TEXTS = [
+    '<button xpath="/html/body/button">Add to cart</button>',
+    '<input xpath="/html/body/input" placeholder="Search products">',
+    '<a xpath="/html/body/a[1]">Shoes</a><a xpath="/html/body/a[2]">Blue shoes</a>',
+    "<p>Free shipping on all products</p>",
+    '<button xpath="/html/body/button">Add to cart</button>',
+]
+QUERIES = ["add blue shoes to the cart", "search for products", "unknown words"]
+
+
+class TestBM25Index(unittest.TestCase):
+    def test_same_scores_as_rank_bm25(self):
+        reference = BM25Okapi([tokenize_remove_stopwords(t) for t in TEXTS])
+        scores = BM25Index().score_texts(QUERIES, TEXTS)
+        for query, query_scores in zip(QUERIES, scores):
+            expected = reference.get_scores(tokenize_remove_stopwords(query))
+            self.assertEqual(query_scores.tolist(), expected.tolist())
+
+    def test_incremental_update(self):
+        index = BM25Index()
+        index.update(TEXTS[:3] + ["<p>Previous page</p>"])
+        index.score_texts(QUERIES, TEXTS[:3])
+        index.remove(TEXTS[0])
+        index.add(TEXTS[0])
+        self.assertEqual(
+            index.score_texts(QUERIES, TEXTS).tolist(),
+            BM25Index().score_texts(QUERIES, TEXTS).tolist(),
+        )
+        self.assertEqual(len(index), len(TEXTS))
+
+    def test_top_k(self):
+        results = BM25Index().top_k("search for products", TEXTS, 2)
+        self.assertEqual(results[0][0], 1)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(BM25Index().top_k("query", [], 2), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
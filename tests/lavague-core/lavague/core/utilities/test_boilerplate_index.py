@@ -0,0 +1,99 @@
+import tempfile
+import unittest
+from pathlib import Path
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import BoilerplateRetriever
+from lavague.core.utilities import profiling
+from lavague.core.utilities.boilerplate_index import (
+    COMPACTION_FACTOR,
+    BoilerplateIndex,
+    chunk_fingerprint,
+)
+from fakes import FakeDriver
+
+NAVBAR = (
+    '<nav xpath="/html/body/nav"><a href="/">Home</a><a href="/cart">Cart</a></nav>'
+)
+COOKIES = '<div xpath="/html/body/div[2]"><button>Accept cookies</button></div>'
+
+
+class TestBoilerplateIndex(unittest.TestCase):
+    def test_index(self):
+        self.assertEqual(
+            chunk_fingerprint(NAVBAR),
+            chunk_fingerprint(NAVBAR.replace("/html/body", "/html/body/div")),
+        )
+        with tempfile.TemporaryDirectory() as path:
+            index = BoilerplateIndex(path)
+            navbar = chunk_fingerprint(NAVBAR)
+            for i in range(3):
+                index.add_page(f"https://shop.com/p/{i}", [navbar, str(i)])
+            # steps on the same page are counted once
+            index.add_page("https://shop.com/p/2#reviews", [navbar, "2"])
+            self.assertEqual(
+                index.is_boilerplate("https://shop.com/p/3", [navbar, "0"]),
+                [True, False],
+            )
+            self.assertEqual(
+                index.is_boilerplate("https://other.com", [navbar]), [False]
+            )
+            # shared across instances
+            self.assertEqual(
+                BoilerplateIndex(path).get_shares("https://shop.com", [navbar, "0"]),
+                [1, 1 / 3],
+            )
+
+    def test_compaction(self):
+        with tempfile.TemporaryDirectory() as path:
+            index = BoilerplateIndex(path, min_pages=2, max_pages=2)
+            reader = BoilerplateIndex(path, min_pages=2, max_pages=2)
+            for i in range(20):
+                index.add_page(f"https://shop.com/p/{i}", ["navbar", str(i)])
+                reader.get_shares("https://shop.com", ["navbar"])
+            (file,) = Path(path).iterdir()
+            lines = file.read_text().splitlines()
+            self.assertLessEqual(len(lines), COMPACTION_FACTOR * 2)
+            self.assertEqual(lines[-1], "https://shop.com/p/19\t19 navbar")
+            # readers of the previous file start over
+            for other in [reader, BoilerplateIndex(path, min_pages=2, max_pages=2)]:
+                self.assertEqual(
+                    list(other._get_site("shop.com").pages),
+                    ["https://shop.com/p/18", "https://shop.com/p/19"],
+                )
+                self.assertEqual(
+                    other.get_shares("https://shop.com", ["navbar", "19"]), [1, 0.5]
+                )
+
+    def test_retriever(self):
+        driver = FakeDriver()
+        retriever = BoilerplateRetriever(driver, BoilerplateIndex(None))
+        query = QueryBundle("Click on the product")
+        for i in range(3):
+            driver.url = f"https://shop.com/p/{i}"
+            product = f'<a xpath="/html/body/a">Product {i}</a>'
+            chunks = [NAVBAR, product, COOKIES]
+            profiling.clear_profiling_data()
+            with profiling.time_profiler("Retriever Inference") as profiler:
+                results = retriever.retrieve(query, chunks)
+        self.assertEqual(results, [product])
+        self.assertEqual(
+            profiler["boilerplate"],
+            [
+                {
+                    "chunks": 3,
+                    "boilerplate_chunks": 2,
+                    "saved_size": len(NAVBAR) + len(COOKIES),
+                }
+            ],
+        )
+        # kept when matching the query
+        self.assertEqual(
+            retriever.retrieve(QueryBundle("Accept the cookies"), chunks),
+            [product, COOKIES],
+        )
+        retriever.mode = "demote"
+        self.assertEqual(retriever.retrieve(query, chunks), [product, NAVBAR, COOKIES])
+
+
+if __name__ == "__main__":
+    unittest.main()
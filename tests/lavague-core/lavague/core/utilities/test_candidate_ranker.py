@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import CandidateRankerRetriever
+from lavague.core.utilities.candidate_ranker import (
+    FEATURE_NAMES,
+    CandidateRanker,
+    Candidates,
+)
+
+HTML = """<html xpath="/html"><body xpath="/html/body">
+<nav xpath="/html/body/nav"><a href="/" xpath="/html/body/nav/a">Home</a><a href="/cart" xpath="/html/body/nav/a[2]">Cart</a></nav>
+<form xpath="/html/body/form"><input type="search" placeholder="Search products" xpath="/html/body/form/input">
+<button type="submit" xpath="/html/body/form/button">Go</button></form>
+<div xpath="/html/body/div"><h3 xpath="/html/body/div/h3">Red shoes</h3><button xpath="/html/body/div/button">Add to cart</button></div>
+</body></html>"""
+
+
+class TestCandidateRanker(unittest.TestCase):
+    def test_features(self):
+        candidates = Candidates(HTML, {"/html/body/nav/a[2]": (1200, 10, 40, 20)})
+        self.assertEqual(len(candidates), 11)
+        features = candidates.features("Search for shoes")
+        self.assertEqual(features.shape, (11, len(FEATURE_NAMES)))
+        column = dict(zip(FEATURE_NAMES, features[6]))
+        self.assertEqual(column["tag_input"], 1)
+        self.assertEqual(column["input_text"], 1)
+        self.assertEqual(column["label_query_share"], 0.5)
+        self.assertEqual(column["typing_match"], 1)
+        cart = dict(zip(FEATURE_NAMES, features[4]))
+        self.assertEqual((cart["has_rect"], cart["in_viewport"]), (1, 1))
+
+    def test_ranking(self):
+        retriever = CandidateRankerRetriever(top_k=2)
+        self.assertEqual(
+            [
+                results[0]
+                for results in retriever.retrieve_many(
+                    [QueryBundle("Search for shoes"), QueryBundle("Go to the cart")],
+                    [HTML],
+                )
+            ],
+            [
+                '<input type="search" placeholder="Search products" xpath="/html/body/form/input">',
+                '<a href="/cart" xpath="/html/body/nav/a[2]">Cart</a>',
+            ],
+        )
+        self.assertIsNotNone(
+            retriever.get_cache_key(QueryBundle("Go to the cart"), [HTML])
+        )
+
+    def test_fit(self):
+        rows = [
+            ("Add the shoes to the cart", HTML, "/html/body/div/button[1]"),
+            ("Open the home page", HTML, "/html/body/nav/a"),
+            ("Missing", HTML, "/html/body/table"),
+        ]
+        ranker = CandidateRanker.fit(rows, epochs=100)
+        candidates = Candidates(HTML)
+        self.assertEqual(
+            candidates.xpaths[
+                ranker.rank("Add the shoes to the cart", candidates, 1)[0]
+            ],
+            "/html/body/div/button",
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ranker.npz")
+            ranker.save(path)
+            self.assertTrue(
+                np.array_equal(CandidateRanker.load(path).weights, ranker.weights)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from lavague.core.utilities.context_packing import ContextPacker
+
+
+def words(text: str):
+    return text.split()
+
+
+class TestContextPacking(unittest.TestCase):
+    def test_greedy_packing_in_rank_order(self):
+        packer = ContextPacker(token_budget=6, tokenizer=words, separator=" ")
+        chunks = ["a b c", "d e f g", "h", "i j"]
+        self.assertEqual(packer.pack(chunks), ["a b c", "h", "i j"])
+        self.assertEqual(packer.stats["context_tokens"], 6)
+        self.assertEqual(packer.stats["packed_chunks"], 3)
+
+    def test_overlapping_chunks_are_deduplicated(self):
+        packer = ContextPacker(token_budget=10, tokenizer=words, separator=" ")
+        chunks = ["<a>x</a>", "<p> <a>x</a> </p>", "<a>x</a>", "<b>y</b>"]
+        self.assertEqual(packer.pack(chunks), ["<p> <a>x</a> </p>", "<b>y</b>"])
+        self.assertEqual(packer.stats["deduplicated_chunks"], 2)
+
+    def test_oversized_best_chunk_is_truncated(self):
+        packer = ContextPacker(token_budget=3, tokenizer=words)
+        (chunk,) = packer.pack(["a b c d e"])
+        self.assertEqual(chunk.strip(), "a b c")
+
+    def test_truncation_keeps_whole_elements(self):
+        packer = ContextPacker(token_budget=2, tokenizer=words)
+        html = "<div><p>one two</p><p>three four five</p></div>"
+        self.assertEqual(packer.pack([html]), ["<div><p>one two</p>"])
+        # the start tag alone does not fit
+        packer = ContextPacker(token_budget=1, tokenizer=words)
+        self.assertEqual(packer.pack(['<div class="a b c d">x</div>']), [])
+
+    def test_merged_chunk_keeps_the_best_rank(self):
+        packer = ContextPacker(token_budget=10, tokenizer=words, separator=" ")
+        chunks = ["<a>x</a>", "<b>y</b>", "<p> <a>x</a> </p>"]
+        self.assertEqual(packer.pack(chunks), ["<p> <a>x</a> </p>", "<b>y</b>"])
+
+    def test_no_budget(self):
+        packer = ContextPacker(tokenizer=words)
+        self.assertFalse(packer.enabled)
+        self.assertTrue(ContextPacker(token_budget=10).enabled)
+        chunks = ["a b", "a b", "c"]
+        self.assertEqual(packer.pack(chunks), chunks)
+
+
+if __name__ == "__main__":
+    unittest.main()
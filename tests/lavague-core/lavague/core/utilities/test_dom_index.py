@@ -0,0 +1,45 @@
+import unittest
+from bs4 import BeautifulSoup
+from lavague.core.retrievers import FromXPathNodesExpansionRetriever
+from lavague.core.utilities.dom_index import DomIndex
+
+HTML = """<!DOCTYPE html>
+<html><body>
+<!-- menu -->
+<nav><div><div><a href="/" xpath="/html/body/nav/div/div/a">Home &amp; more</a></div></div><br></nav>
+<ul>
+<li><a href="#1" xpath="/html/body/ul/li[1]/a">One</a> first</li>
+<li><a href="#2" xpath="/html/body/ul/li[2]/a">Two</a> second</li>
+<li><button xpath="/html/body/ul/li[3]/button">Three &lt; four</button></li>
+</ul>
+<script>if (a < b) {}</script>
+<p>Footer <a href="/about" xpath="/html/body/p/a">About</a></p>
+</body></html>"""
+
+
+class TestDomIndex(unittest.TestCase):
+    def test_spans_match_serialization(self):
+        soup = BeautifulSoup(HTML, "html.parser")
+        index = DomIndex.from_soup(soup)
+        self.assertIsNotNone(index)
+        elements = [soup] + list(soup.descendants)
+        self.assertEqual(len(elements), len(index.parent))
+        for node, element in enumerate(elements):
+            self.assertEqual(index.piece(node), str(element))
+        self.assertEqual(
+            index.marked_xpaths,
+            [e["xpath"] for e in soup.find_all(attrs={"xpath": True})],
+        )
+
+    def test_same_chunks_as_tree_walk(self):
+        retriever = FromXPathNodesExpansionRetriever()
+        for chunk_size in [10, 50, 100, 200, 750]:
+            retriever.chunk_size = chunk_size
+            expected = retriever.get_expanded_chunks_from_soup(
+                BeautifulSoup(HTML, "html.parser")
+            )
+            self.assertEqual(retriever.get_expanded_chunks([HTML]), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
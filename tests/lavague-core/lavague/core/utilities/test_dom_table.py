@@ -0,0 +1,83 @@
+import unittest
+from bs4 import BeautifulSoup
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import (
+    FromXPathNodesExpansionRetriever,
+    InteractiveXPathRetriever,
+    RetrieversPipeline,
+)
+from lavague.core.utilities.dom_table import DomTable
+from lavague.core.utilities.xpath_utils import XPathAnnotator, iter_soup_xpaths
+from fakes import FakeDriver
+
+HTML = """<!DOCTYPE html>
+<html><head><meta charset="latin-1"><title>Shop &amp; more</title>
+<style>a > b {}</style><script>if (a < b) {}</script></head>
+<body class=" main  page ">
+<!-- menu -->
+<nav><a href="/?a=1&b=2">Home</a><a href='/shop' title='"x"'>Shop</a><br></nav>
+<main><h1>Products</h1><p>Blue<p>shoes &lt; 50</p>
+<div><svg><path d="M0"></path></svg><button disabled>Add to cart</button></span></div>
+<pre>  keep  </pre>  <img src="a.png">
+<template><p>hidden</p></template><iframe src="/frame"></iframe></main>
+</body></html>"""
+
+FRAME = "<html><body><a href='/inside'>Inside</a></body></html>"
+
+
+class TestDomTable(unittest.TestCase):
+    def test_same_tree_as_soup(self):
+        soup = BeautifulSoup(HTML, "html.parser")
+        table = DomTable.from_html(HTML)
+        self.assertEqual(table.serialize(), str(soup))
+        self.assertEqual(table.get_text(), soup.get_text())
+        self.assertEqual(
+            [xpath for _, xpath in table.iter_xpaths()],
+            [xpath for _, xpath in iter_soup_xpaths(soup)],
+        )
+        for node, element in zip(table.iter_descendants(0), soup.descendants):
+            self.assertEqual(table.piece(node), str(element))
+
+    def test_attributes(self):
+        table = DomTable.from_html(HTML)
+        nodes = {xpath: node for node, xpath in table.iter_xpaths()}
+        self.assertEqual(table.get_attribute(nodes["/html/body"], "class"), "main page")
+        self.assertEqual(
+            table.attributes(nodes["/html/body/nav/a[2]"]),
+            {"href": "/shop", "title": '"x"'},
+        )
+        self.assertIsNone(table.get_attribute(nodes["/html/body/nav/a[2]"], "id"))
+
+    def test_table_annotation_same_as_soup(self):
+        soup = BeautifulSoup(HTML, "html.parser")
+        xpaths = [xpath for _, xpath in iter_soup_xpaths(soup)]
+        for possible_interactions in [None, set(xpaths[::2])]:
+            self.assertEqual(
+                XPathAnnotator("table").annotate(HTML, possible_interactions),
+                XPathAnnotator().annotate(HTML, possible_interactions),
+            )
+
+    def test_pipeline_same_chunks_as_soup(self):
+        soup = BeautifulSoup(HTML, "html.parser")
+        xpaths = {element.name: xpath for element, xpath in iter_soup_xpaths(soup)}
+        driver = FakeDriver(
+            {
+                "/html/body/nav/a[2]": set(),
+                xpaths["button"]: set(),
+                xpaths["iframe"] + "/html/body/a": set(),
+            },
+            html_by_frame={"": HTML, xpaths["iframe"]: FRAME},
+        )
+        for chunk_size in [20, 100, 500]:
+            chunks = {}
+            for backend in ["html.parser", "table"]:
+                chunks[backend] = RetrieversPipeline(
+                    InteractiveXPathRetriever(driver, backend=backend),
+                    FromXPathNodesExpansionRetriever(chunk_size=chunk_size),
+                ).retrieve(QueryBundle("add to cart"), [HTML])
+            self.assertEqual(chunks["table"], chunks["html.parser"])
+            self.assertIn("Inside", "".join(chunks["table"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from lavague.core.utilities.embedding_store import EmbeddingFile, EmbeddingStore
+from fakes import WordEmbedding
+
+WRITER = """
+import sys
+from lavague.core.utilities.embedding_store import EmbeddingStore
+EmbeddingStore(sys.argv[1]).put_many("words", ["written elsewhere"], [[0.5, 1.5, 2.5]])
+"""
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_disk_round_trip(self):
+        texts = ["add to cart", "checkout", "add to cart"]
+        embedding = WordEmbedding()
+        first = EmbeddingStore(self.path).get_text_embeddings(embedding, texts)
+        self.assertEqual(embedding.texts, ["add to cart", "checkout"])
+        # stored as float32
+        for stored, value in zip(first[0], embedding.vector("add to cart")):
+            self.assertAlmostEqual(stored, value, places=6)
+
+        # a new store reads them from disk, without calling the model
+        embedding = WordEmbedding()
+        store = EmbeddingStore(self.path)
+        self.assertEqual(store.get_text_embeddings(embedding, texts), first)
+        self.assertEqual(embedding.texts, [])
+        self.assertEqual(store.stats()["hits"], 3)
+
+    def test_models_are_separated(self):
+        store = EmbeddingStore(self.path)
+        store.put_many("words", ["home"], [[1.0, 2.0]])
+        store.put_many("other/model", ["home"], [[3.0, 4.0, 5.0]])
+        store = EmbeddingStore(self.path)
+        self.assertEqual(store.get("words", "home"), [1.0, 2.0])
+        self.assertEqual(store.get("other/model", "home"), [3.0, 4.0, 5.0])
+        self.assertIsNone(store.get("missing", "home"))
+        self.assertEqual(len(list(Path(self.path).glob("*.f32"))), 2)
+
+    def test_refresh_across_instances_and_processes(self):
+        store = EmbeddingStore(self.path)
+        store.put_many("words", ["home"], [[1.0, 2.0, 3.0]])
+        other = EmbeddingStore(self.path)
+        self.assertEqual(other.get("words", "home"), [1.0, 2.0, 3.0])
+
+        subprocess.run([sys.executable, "-c", WRITER, self.path], check=True)
+        self.assertEqual(store.get("words", "written elsewhere"), [0.5, 1.5, 2.5])
+        self.assertEqual(other.get("words", "written elsewhere"), [0.5, 1.5, 2.5])
+
+    def test_batches_refresh_once(self):
+        embedding = WordEmbedding()
+        store = EmbeddingStore(self.path)
+        store.put_many(embedding.model_name, ["home"], [embedding.vector("home")])
+        with mock.patch.object(
+            EmbeddingFile, "refresh", autospec=True, side_effect=EmbeddingFile.refresh
+        ) as refresh:
+            store.get_text_embeddings(embedding, ["home", "cart", "shop", "home"])
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(embedding.texts, ["cart", "shop"])
+
+    def test_truncated_tail_is_ignored(self):
+        store = EmbeddingStore(self.path)
+        store.put_many("words", ["home", "cart"], [[1.0, 2.0], [3.0, 4.0]])
+        (file,) = Path(self.path).glob("*.f32")
+        # interrupted write of the second record
+        file.write_bytes(file.read_bytes()[:-3])
+        store = EmbeddingStore(self.path)
+        self.assertEqual(store.get("words", "home"), [1.0, 2.0])
+        self.assertIsNone(store.get("words", "cart"))
+
+        # the partial record is dropped before appending
+        store.put_many("words", ["shop"], [[5.0, 6.0]])
+        store = EmbeddingStore(self.path)
+        self.assertEqual(store.get("words", "shop"), [5.0, 6.0])
+        self.assertEqual(store.get("words", "home"), [1.0, 2.0])
+
+    def test_corrupted_file_is_indexed_again(self):
+        store = EmbeddingStore(self.path)
+        store.put_many("words", ["home", "cart"], [[1.0, 2.0], [3.0, 4.0]])
+        reader = EmbeddingStore(self.path)
+        self.assertEqual(reader.get("words", "cart"), [3.0, 4.0])
+
+        # truncated by another process then appended to
+        (file,) = Path(self.path).glob("*.f32")
+        file.write_bytes(b"")
+        store.put_many("words", ["shop"], [[5.0, 6.0]])
+        reader.clear_memory()
+        self.assertIsNone(reader.get("words", "cart"))
+        self.assertEqual(reader.get("words", "shop"), [5.0, 6.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
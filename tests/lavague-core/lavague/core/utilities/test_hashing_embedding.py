@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from lavague.core.utilities.hashing_embedding import HashingEmbedding
+from lavague.core.utilities.vector_index import VectorIndex
+
+CHUNKS = [
+    '<button xpath="/html/body/button">Add to cart</button>',
+    '<input xpath="/html/body/form/input" placeholder="Subscribe to our newsletter">',
+    '<a xpath="/html/body/nav/a" href="/shop">Shop</a>',
+]
+
+
+class TestHashingEmbedding(unittest.TestCase):
+    def test_embeddings(self):
+        embedding = HashingEmbedding(dimensions=1024)
+        self.assertEqual(embedding.model_name, "lavague-hashing-1024-3")
+        vector = np.asarray(embedding.get_text_embedding(CHUNKS[0]))
+        self.assertEqual(vector.shape, (1024,))
+        self.assertAlmostEqual(float(np.linalg.norm(vector)), 1, places=5)
+        # xpaths are ignored
+        self.assertTrue(
+            np.allclose(vector, embedding.embed("<button>Add to cart</button>"))
+        )
+        self.assertFalse(embedding.embed("the of and").any())
+
+    def test_ranking(self):
+        embedding = HashingEmbedding()
+        index = VectorIndex.from_texts(CHUNKS, embedding)
+        self.assertTrue(
+            np.allclose(
+                index.matrix,
+                np.asarray(embedding.get_text_embedding_batch(CHUNKS)),
+                atol=1e-6,
+            )
+        )
+        for query, expected in [
+            ("add the item to the cart", CHUNKS[0]),
+            ("subscribe to the newsletters", CHUNKS[1]),
+            ("go to the shop", CHUNKS[2]),
+        ]:
+            self.assertEqual(
+                index.query(embedding.get_query_embedding(query), 1), [expected]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from lavague.core.utilities.html_chunker import HtmlChunker, HtmlElements
+
+CARD = '<div class="card" xpath="/html/body/div[{i}]"><a xpath="/html/body/div[{i}]/a">Product {i}</a><p>{text}</p></div>'
+
+HTML = (
+    "<html><body>\n"
+    + "\n".join(CARD.format(i=i, text="lorem ipsum " * (i * 3)) for i in range(1, 8))
+    + "\n</body></html>"
+)
+
+
+def without_spaces(text: str) -> str:
+    return "".join(text.split())
+
+
+class TestHtmlChunker(unittest.TestCase):
+    def test_chunks_are_aligned_on_elements(self):
+        chunker = HtmlChunker(chunk_size=200)
+        chunks = chunker.chunk(HTML)
+        self.assertGreater(len(chunks), 3)
+        for chunk in chunks:
+            self.assertIn(chunk.text, HTML)
+            self.assertLessEqual(len(chunk.text), 200)
+        # cards fitting in a chunk are never cut
+        for i in range(1, 3):
+            card = CARD.format(i=i, text="lorem ipsum " * (i * 3))
+            self.assertTrue(any(card in chunk.text for chunk in chunks))
+        # every annotated element is in exactly one chunk
+        xpaths = [xpath for chunk in chunks for xpath in chunk.xpaths]
+        self.assertEqual(xpaths, HtmlElements(HTML).marked_xpaths)
+        self.assertEqual(len(xpaths), 14)
+
+    def test_large_elements_and_text_are_split(self):
+        text = "word " * 100
+        html = f'<div xpath="/div"><p>{text}</p><p>end</p></div>'
+        chunks = HtmlChunker(chunk_size=60).chunk(html)
+        self.assertTrue(chunks[0].text.startswith('<div xpath="/div"><p>'))
+        self.assertEqual(chunks[0].xpaths, ("/div",))
+        self.assertTrue(all(len(chunk.text) <= 60 for chunk in chunks))
+        self.assertEqual(
+            without_spaces("".join(chunk.text for chunk in chunks)),
+            without_spaces(html),
+        )
+
+    def test_malformed_html(self):
+        html = "<div><p>a<p>b</span><script>if (a<b) '</div>'</script><!-- <div> --></div>tail"
+        elements = HtmlElements(html)
+        div = elements.children(0)[0]
+        self.assertEqual(html[elements.start[div] : elements.end[div]], html[:-4])
+        chunks = HtmlChunker(chunk_size=10).chunk(html)
+        self.assertEqual(
+            without_spaces("".join(chunk.text for chunk in chunks)),
+            without_spaces(html),
+        )
+
+    def test_xpathed_only(self):
+        chunker = HtmlChunker(chunk_size=30)
+        html = '<p>no xpath here at all</p><a xpath="/a">link</a>'
+        self.assertEqual(
+            chunker.split(html, xpathed_only=True), ['<a xpath="/a">link</a>']
+        )
+        self.assertEqual(
+            chunker.split("<p>no xpath</p>", xpathed_only=True), ["<p>no xpath</p>"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
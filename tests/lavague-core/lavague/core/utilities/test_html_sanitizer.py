@@ -0,0 +1,48 @@
+import unittest
+from lavague.core.utilities.format_utils import clean_html
+from lavague.core.utilities.html_sanitizer import HtmlSanitizer
+
+HTML = """<!DOCTYPE html><div id="main" style="color:red" data-x=1>Hello
+<script>if (a<b) alert("</div>")</script><svg viewBox="0 0 1 1"><svg/><g><svg><path d="M0"></path></svg></g></svg>
+<img src="data:image/png;base64,iVBORw0KGgo=" id=logo/> <!-- a <b> comment -->
+<a href='/shop' class=link>Shop</a></div>"""
+
+
+class TestHtmlSanitizer(unittest.TestCase):
+    def test_clean_html(self):
+        self.assertEqual(
+            clean_html(HTML),
+            """<!DOCTYPE html><div id="main">Hello
+\n<img id=logo/> <!-- a <b> comment -->
+<a href='/shop'>Shop</a></div>""",
+        )
+
+    def test_base64_and_whitespace(self):
+        sanitizer = HtmlSanitizer(drop_tags=["svg"], collapse_whitespace=True)
+        self.assertEqual(
+            sanitizer.sanitize(HTML),
+            """<!DOCTYPE html><div id="main" style="color:red" data-x=1>Hello
+<script>if (a<b) alert("</div>")</script>\n<img id=logo/> <!-- a <b> comment -->
+<a href='/shop' class=link>Shop</a></div>""",
+        )
+
+    def test_chunks(self):
+        for sanitizer in [
+            HtmlSanitizer(keep_attributes=["id", "href"]),
+            HtmlSanitizer(drop_tags=["svg"], collapse_whitespace=True),
+        ]:
+            expected = sanitizer.sanitize(HTML)
+            for size in [1, 2, 3, 7, 16]:
+                chunks = [HTML[i : i + size] for i in range(0, len(HTML), size)]
+                self.assertEqual("".join(sanitizer.sanitize_chunks(chunks)), expected)
+
+    def test_bytes_removed(self):
+        stream = HtmlSanitizer().stream()
+        output = stream.feed(HTML[:100]) + stream.feed(HTML[100:]) + stream.close()
+        self.assertEqual(stream.bytes_in, len(HTML.encode()))
+        self.assertEqual(stream.bytes_out, len(output.encode()))
+        self.assertEqual(stream.bytes_removed, len(HTML) - len(output))
+
+
+if __name__ == "__main__":
+    unittest.main()
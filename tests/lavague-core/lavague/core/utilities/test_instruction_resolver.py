@@ -0,0 +1,83 @@
+import unittest
+import yaml
+from lavague.core.navigation import NavigationEngine
+from lavague.core.utilities.instruction_resolver import InstructionResolver
+from fakes import FakeDriver
+
+CONTEXT = """<ul xpath="/html/body/ul"><li xpath="/html/body/ul/li"><a href="/contact" xpath="/html/body/ul/li/a">Contact Us</a></li>
+<li xpath="/html/body/ul/li[2]"><a href="/about" xpath="/html/body/ul/li[2]/a">About</a></li></ul>
+<button aria-label="Close" xpath="/html/body/button">×</button>
+<a href="/about-team" xpath="/html/body/a">About</a>"""
+
+
+def get_xpath(action: str) -> str:
+    return yaml.safe_load(action)[0]["actions"][0]["action"]["args"]["xpath"]
+
+
+class TestInstructionResolver(unittest.TestCase):
+    def test_parse(self):
+        resolver = InstructionResolver()
+        self.assertEqual(
+            resolver.parse("Click on 'Contact Us'"), ("click", "contact us")
+        )
+        self.assertEqual(
+            resolver.parse('hover over the "Menu" button.'), ("hover", "menu")
+        )
+        self.assertIsNone(resolver.parse("Click on 'Gemma' under the 'More' menu"))
+        self.assertIsNone(resolver.parse("Type 'shoes' in the search bar"))
+
+    def test_resolve(self):
+        resolver = InstructionResolver()
+        action = resolver.resolve("Click on 'Contact Us'", CONTEXT)
+        # the link is preferred to the list item containing it
+        self.assertEqual(get_xpath(action), "/html/body/ul/li/a")
+        self.assertEqual(
+            yaml.safe_load(action)[0]["actions"][0]["action"]["name"], "click"
+        )
+        self.assertEqual(
+            get_xpath(resolver.resolve("Click on the 'close' button", CONTEXT)),
+            "/html/body/button",
+        )
+        # ambiguous or partial matches fall through
+        self.assertIsNone(resolver.resolve("Click on 'About'", CONTEXT))
+        self.assertIsNone(resolver.resolve("Click on 'Contact'", CONTEXT))
+        self.assertEqual(resolver.stats["hit_rate"], 0.5)
+        self.assertIsNone(resolver.stats["saved_time"])
+        resolver.add_llm_time(2.0)
+        resolver.resolve("Click on 'Contact Us'", CONTEXT)
+        self.assertTrue(resolver.stats["resolved"])
+        self.assertGreater(resolver.stats["saved_time"], 1.9)
+
+    def test_visibility(self):
+        driver = FakeDriver(rects={"/html/body/a": (0, 0, 50, 20)})
+        resolver = InstructionResolver(driver)
+        self.assertEqual(
+            get_xpath(resolver.resolve("Click on 'About'", CONTEXT)), "/html/body/a"
+        )
+        self.assertIsNone(resolver.resolve("Click on 'Contact Us'", CONTEXT))
+        resolver.enabled = False
+        driver.rects = None
+        self.assertIsNone(resolver.resolve("Click on 'Contact Us'", CONTEXT))
+
+    def test_navigation_attempts(self):
+        driver = FakeDriver()
+        engine = NavigationEngine(
+            driver, llm=object(), retriever=object(), n_attempts=1
+        )
+        # disabled by default
+        self.assertEqual(
+            engine._get_attempts("Click on 'Contact Us'", CONTEXT, {}), [None]
+        )
+
+        engine.instruction_resolver = InstructionResolver(driver)
+        log = {}
+        attempts = engine._get_attempts("Click on 'Contact Us'", CONTEXT, log)
+        # the resolved action does not use up the LLM attempt
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(get_xpath(attempts[0]), "/html/body/ul/li/a")
+        self.assertIsNone(attempts[1])
+        self.assertTrue(log["instruction_resolver"]["resolved"])
+
+
+if __name__ == "__main__":
+    unittest.main()
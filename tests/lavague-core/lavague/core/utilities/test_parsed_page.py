@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch
+from bs4 import BeautifulSoup
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import (
+    FromXPathNodesExpansionRetriever,
+    InteractiveXPathRetriever,
+    RetrieversPipeline,
+    XPathedChunkRetriever,
+)
+from lavague.core.utilities.parsed_page import ParsedPage
+from fakes import FakeDriver
+
+HTML = """<html><body>
+<nav><a href="/">Home</a><a href="/shop">Shop</a></nav>
+<main><h1>Products</h1><div><p>Blue shoes</p><button>Add to cart</button></div></main>
+</body></html>"""
+
+INTERACTIONS = {"/html/body/nav/a[2]": set(), "/html/body/main/div/button": set()}
+
+
+class TestParsedPage(unittest.TestCase):
+    def test_pipeline_same_output_as_string_stages(self):
+        query = QueryBundle("add to cart")
+        stages = [
+            InteractiveXPathRetriever(FakeDriver(INTERACTIONS)),
+            FromXPathNodesExpansionRetriever(chunk_size=60),
+            XPathedChunkRetriever(),
+        ]
+        expected = [HTML]
+        for stage in stages:
+            expected = stage.retrieve(query, expected)
+        self.assertEqual(RetrieversPipeline(*stages).retrieve(query, [HTML]), expected)
+
+    def test_page_is_parsed_once(self):
+        stages = [
+            InteractiveXPathRetriever(FakeDriver(INTERACTIONS)),
+            FromXPathNodesExpansionRetriever(),
+        ]
+        with patch(
+            "lavague.core.utilities.parsed_page.BeautifulSoup",
+            wraps=BeautifulSoup,
+        ) as parse:
+            RetrieversPipeline(*stages).retrieve(QueryBundle("q"), [HTML])
+        self.assertEqual(parse.call_count, 1)
+
+    def test_elements_by_xpath(self):
+        page = InteractiveXPathRetriever(FakeDriver(INTERACTIONS)).retrieve_page(
+            QueryBundle("q"), ParsedPage([HTML])
+        )
+        self.assertEqual(set(page.elements_by_xpath), set(INTERACTIONS))
+        self.assertEqual(
+            page.get_element("/html/body/main/div/button").text, "Add to cart"
+        )
+        self.assertIs(page.possible_interactions, INTERACTIONS)
+
+
+if __name__ == "__main__":
+    unittest.main()
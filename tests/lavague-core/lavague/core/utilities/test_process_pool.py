@@ -0,0 +1,66 @@
+import pickle
+import unittest
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import BM25HtmlRetriever, InteractiveXPathRetriever
+from lavague.core.utilities.html_chunker import HtmlChunker
+from lavague.core.utilities.parsed_page import ParsedPage
+from lavague.core.utilities.process_pool import ProcessPool, SharedText
+from fakes import FakeDriver
+
+ITEM = '<div class="item"><a href="/p/{i}">Product {i} – café</a><button>Add to cart</button></div>\n'
+
+HTML = (
+    "<html><body><main>"
+    + "".join(ITEM.format(i=i) for i in range(200))
+    + "</main></body></html>"
+)
+
+INTERACTIONS = {"/html/body/main/div[3]/button": set()}
+
+
+class TestProcessPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = ProcessPool(max_workers=1, min_size=len(HTML))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_shared_text(self):
+        shared = SharedText(HTML)
+        try:
+            self.assertEqual(pickle.loads(pickle.dumps(shared)).read(), HTML)
+        finally:
+            shared.unlink()
+
+    def test_small_pages_inline(self):
+        pool = ProcessPool(max_workers=1, min_size=len(HTML) + 1)
+        self.assertEqual(
+            pool.run(HtmlChunker(200).split, HTML), HtmlChunker(200).split(HTML)
+        )
+        self.assertIsNone(pool._executor)
+
+    def test_same_results_as_inline(self):
+        chunker = HtmlChunker(200)
+        self.assertEqual(
+            self.pool.run(chunker.split, HTML, True), chunker.split(HTML, True)
+        )
+        query = QueryBundle("product 42")
+        self.assertEqual(
+            BM25HtmlRetriever(top_k=3, process_pool=self.pool).retrieve(query, [HTML]),
+            BM25HtmlRetriever(top_k=3).retrieve(query, [HTML]),
+        )
+        for backend in ["html.parser", "table"]:
+            expected = InteractiveXPathRetriever(
+                FakeDriver(INTERACTIONS, captured={}), backend
+            ).retrieve_page(query, ParsedPage([HTML]))
+            result = InteractiveXPathRetriever(
+                FakeDriver(INTERACTIONS, captured={}), backend, process_pool=self.pool
+            ).retrieve_page(query, ParsedPage([HTML]))
+            self.assertEqual(result.chunks, expected.chunks)
+            self.assertIn('xpath="/html/body/main/div[3]/button"', result.html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from typing import List
+from llama_index.core import QueryBundle
+from lavague.core.retrievers import BaseHtmlRetriever, RetrieversPipeline
+from lavague.core.utilities.html_chunker import HtmlChunker
+from lavague.core.utilities.embedding_store import EmbeddingStore
+from lavague.core.utilities.parsed_page import ParsedPage
+from lavague.core.utilities.retrieval_cache import RetrievalCache
+
+CARD = '<div xpath="/html/body/div[{i}]"><a xpath="/html/body/div[{i}]/a">Product {i}</a><p>{text}</p></div>'
+
+SUBTREES = [CARD.format(i=i, text="lorem ipsum " * (i * 3)) for i in range(1, 5)]
+
+
+class CountingChunker(HtmlChunker):
+    def __init__(self, chunk_size: int):
+        super().__init__(chunk_size)
+        self.scanned = []
+
+    def layout(self, html):
+        self.scanned.append(html)
+        return super().layout(html)
+
+
+class CountingRetriever(BaseHtmlRetriever):
+    """Last words of the chunks, depending on nothing but the query and the HTML"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_state_key(self, html_nodes: List[str], viewport_only=True):
+        return ""
+
+    def retrieve(
+        self, query: QueryBundle, html_nodes: List[str], viewport_only=True
+    ) -> List[str]:
+        self.calls += 1
+        return [node.split()[-1] for node in html_nodes if query.query_str in node]
+
+
+def get_cache() -> RetrievalCache:
+    return RetrievalCache(embedding_store=EmbeddingStore(path=None))
+
+
+class TestRetrievalCache(unittest.TestCase):
+    def test_layouts_of_unchanged_subtrees_are_reused(self):
+        cache = get_cache()
+        chunker = CountingChunker(chunk_size=120)
+        layouts = cache.layouts(chunker, SUBTREES)
+        self.assertEqual(chunker.scanned, SUBTREES)
+        self.assertEqual(cache.layouts(chunker, SUBTREES), layouts)
+        self.assertEqual(len(chunker.scanned), 4)
+
+        # only the changed subtree is scanned again
+        changed = SUBTREES[:2] + [SUBTREES[2].replace("Product", "Item")] + SUBTREES[3:]
+        cache.layouts(chunker, changed)
+        self.assertEqual(chunker.scanned[4:], [changed[2]])
+        self.assertEqual(cache.stats()["subtrees"]["hits"], 7)
+        self.assertEqual(cache.stats()["subtrees"]["misses"], 5)
+
+        # layouts depend on the chunk size
+        cache.layouts(CountingChunker(chunk_size=60), SUBTREES)
+        self.assertEqual(cache.stats()["subtrees"]["misses"], 9)
+
+    def test_reused_layouts_give_the_same_chunks(self):
+        cache = get_cache()
+        chunker = HtmlChunker(chunk_size=120)
+        cache.layouts(chunker, SUBTREES[:2])
+        chunks = chunker.chunk_layouts(SUBTREES, cache.layouts(chunker, SUBTREES))
+        self.assertEqual(chunks, chunker.chunk("\n".join(SUBTREES)))
+
+    def test_pipeline_results_are_memoized(self):
+        retriever = CountingRetriever()
+        pipeline = RetrieversPipeline(retriever, cache=get_cache())
+        query = QueryBundle("Product")
+        expected = pipeline.retrieve(query, SUBTREES)
+        self.assertEqual(pipeline.retrieve(query, list(SUBTREES)), expected)
+        self.assertEqual(retriever.calls, 1)
+        key = pipeline.get_results_key(query, ParsedPage(SUBTREES))
+        self.assertIsNotNone(key)
+
+        # the key covers the page hash, the query and the viewport flag
+        changed = SUBTREES[:3] + [SUBTREES[3].replace("lorem", "dolor")]
+        pipeline.retrieve(query, changed)
+        pipeline.retrieve(QueryBundle("lorem"), SUBTREES)
+        pipeline.retrieve(query, SUBTREES, viewport_only=False)
+        self.assertEqual(retriever.calls, 4)
+        self.assertEqual(pipeline.retrieve_many([query], SUBTREES), [expected])
+        self.assertEqual(retriever.calls, 4)
+        self.assertEqual(pipeline.results.stats()["hits"], 2)
+
+    def test_pipeline_results_need_a_cache_and_a_state(self):
+        query = QueryBundle("Product")
+        retriever = CountingRetriever()
+        pipeline = RetrieversPipeline(retriever)
+        self.assertIsNone(pipeline.get_results_key(query, ParsedPage(SUBTREES)))
+        pipeline.retrieve(query, SUBTREES)
+        pipeline.retrieve(query, SUBTREES)
+        self.assertEqual(retriever.calls, 2)
+
+        # a stage depending on a state that cannot be fingerprinted disables the memo
+        retriever.get_state_key = lambda html_nodes, viewport_only=True: None
+        pipeline = RetrieversPipeline(retriever, cache=get_cache())
+        self.assertIsNone(pipeline.get_results_key(query, ParsedPage(SUBTREES)))
+
+
+if __name__ == "__main__":
+    unittest.main()
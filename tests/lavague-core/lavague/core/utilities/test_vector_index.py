@@ -0,0 +1,70 @@
+import unittest
+from llama_index.core import Document, QueryBundle, VectorStoreIndex
+import numpy as np
+from lavague.core.retrievers import SemanticRetriever
+from lavague.core.utilities.vector_index import VectorIndex, VectorIndexRetriever
+from fakes import WordEmbedding
+
+
+TEXTS = ["abba", "cafe", "bead", "jig", "hedge", "faded", "dab", "aaa"]
+
+HTML = "\n".join(
+    f'<div><a xpath="/html/body/div[{i}]/a">{text}</a></div>'
+    for i, text in enumerate(TEXTS, 1)
+)
+
+
+class TestVectorIndex(unittest.TestCase):
+    def test_same_ranking_as_vector_store_index(self):
+        embedding = WordEmbedding(list("abcdefghij"))
+        index = VectorIndex.from_texts(TEXTS, embedding)
+        reference = VectorStoreIndex.from_documents(
+            [Document(text=text) for text in TEXTS], embed_model=embedding
+        ).as_retriever(similarity_top_k=4)
+        retriever = VectorIndexRetriever(index, embedding, similarity_top_k=4)
+        for query in ["bad", "face", "hi"]:
+            expected = reference.retrieve(query)
+            results = retriever.retrieve(query)
+            self.assertEqual([n.text for n in results], [n.node.text for n in expected])
+            np.testing.assert_allclose(
+                [n.score for n in results], [n.score for n in expected], rtol=1e-5
+            )
+
+    def test_quantized_index(self):
+        rng = np.random.default_rng(0)
+        embeddings = rng.normal(size=(500, 64))
+        index = VectorIndex(range(500), embeddings)
+        quantized = VectorIndex(range(500), embeddings, quantize=True)
+        self.assertEqual(quantized.matrix.dtype, np.int8)
+        self.assertLess(quantized.nbytes, index.nbytes / 3)
+        query = rng.normal(size=64)
+        np.testing.assert_allclose(
+            quantized.similarities(query), index.similarities(query), atol=0.02
+        )
+        self.assertEqual(index.top_k(query, 1), index.top_k(query, 500)[:1])
+
+    def test_many_queries(self):
+        rng = np.random.default_rng(1)
+        embeddings = rng.normal(size=(300, 32))
+        queries = rng.normal(size=(5, 32))
+        for quantize in [False, True]:
+            index = VectorIndex(range(300), embeddings, quantize=quantize)
+            self.assertEqual(
+                [[i for i, _ in r] for r in index.top_k_many(queries, 10)],
+                [[i for i, _ in index.top_k(query, 10)] for query in queries],
+            )
+
+    def test_semantic_retriever_reuses_index(self):
+        embedding = WordEmbedding(list("abcdefghij"))
+        retriever = SemanticRetriever(embedding=embedding, top_k=3)
+        first = retriever.retrieve(QueryBundle("bad"), [HTML])
+        texts = list(embedding.texts)
+        retriever.retrieve(QueryBundle("face"), [HTML])
+        self.assertEqual(embedding.texts, texts)
+        self.assertEqual(embedding.queries, 2)
+        self.assertEqual(len(retriever.indexes), 1)
+        self.assertEqual(len(first), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from bs4 import BeautifulSoup
+from lavague.core.retrievers import InteractiveXPathRetriever
+from lavague.core.utilities.xpath_utils import XPathAnnotator
+
+HTML = """<!DOCTYPE html>
+<html><head><title>Test</title></head>
+<body>
+<!-- comment -->
+<div id="a"><span>1</span><span>2</span><p>text</p><span>3</span></div>
+<div id="b">
+<button>Ok</button>
+<svg><g><path d="M0"></path><path d="M1"></path></g><circle r="1"></circle></svg>
+<svg><path d="M2"></path></svg>
+</div>
+<ul><li><a href="#1">One</a></li><li><a href="#2">Two</a></li></ul>
+</body></html>"""
+
+
+def legacy_xpaths(html: str):
+    retriever = InteractiveXPathRetriever.__new__(InteractiveXPathRetriever)
+    soup = BeautifulSoup(html, "html.parser")
+    return [retriever._generate_xpath(element) for element in soup.find_all(True)]
+
+
+class TestXPathAnnotator(unittest.TestCase):
+    def test_same_xpaths_as_recursive_generation(self):
+        soup = XPathAnnotator().parse(HTML)
+        xpaths = [xpath for _, xpath in XPathAnnotator().iter_xpaths(soup)]
+        self.assertEqual(xpaths, legacy_xpaths(HTML))
+        self.assertIn(
+            "/html/body/div[2]/*[local-name() = 'svg']/*[local-name() = 'g']/*[local-name() = 'path'][2]",
+            xpaths,
+        )
+
+    def test_lxml_backend_same_xpaths(self):
+        annotator = XPathAnnotator("lxml")
+        root = annotator.parse(HTML)
+        xpaths = [xpath for _, xpath in annotator.iter_xpaths(root)]
+        self.assertEqual(xpaths, legacy_xpaths(HTML))
+
+    def test_annotate_with_filter(self):
+        interactives = {"/html/body/ul/li[2]/a", "/html/body/div[2]/button"}
+        for backend in ["html.parser", "lxml"]:
+            html = XPathAnnotator(backend).annotate(HTML, interactives)
+            annotated = BeautifulSoup(html, "html.parser").find_all(
+                attrs={"xpath": True}
+            )
+            self.assertEqual(
+                sorted(e["xpath"] for e in annotated), sorted(interactives)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lavague.core.utilities.retrieval_cache import LRUCache
+
+try:
+    from lavague.retrievers.cohere.base import CohereRetriever, get_cohere_client
+except ImportError:
+    CohereRetriever = None
+
+HTML = (
+    "<html><body>"
+    + "".join(f'<button name="b{i}">Item {i}</button>' for i in range(2500))
+    + "</body></html>"
+)
+
+
+class RerankServer(ThreadingHTTPServer):
+    """Stand-in for the Cohere rerank endpoint, scoring documents by the query words they contain"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RerankHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()
+
+
+class RerankHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.connections.add(self.client_address)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(0.1)
+        words = body["query"].lower().split()
+        scores = []
+        for i, document in enumerate(body["documents"]):
+            values = " ".join(str(document.get(f, "")) for f in body["rank_fields"])
+            score = sum(w in values.lower().split() for w in words) / len(words)
+            scores.append((score, i, document))
+        scores.sort(key=lambda s: (-s[0], s[1]))
+        response = json.dumps(
+            {
+                "id": "rerank",
+                "results": [
+                    {"index": i, "relevance_score": score, "document": document}
+                    for score, i, document in scores[: body["top_n"]]
+                ],
+                "meta": {"api_version": {"version": "1"}},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+        with server.lock:
+            server.in_flight -= 1
+
+
+@unittest.skipIf(CohereRetriever is None, "cohere is not installed")
+class TestCohereRetriever(unittest.TestCase):
+    def setUp(self):
+        self.server = RerankServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_retriever(self, cache: LRUCache) -> CohereRetriever:
+        return CohereRetriever(
+            cohere_api_key="key",
+            base_url=self.base_url,
+            top_k=3,
+            max_concurrency=3,
+            cache=cache,
+        )
+
+    def test_concurrent_cached_rerank(self):
+        cache = LRUCache()
+        retriever = self.get_retriever(cache)
+        results, scores = retriever._get_results("item 1234", HTML)
+        self.assertEqual(results[0]["text"], "Item 1234")
+        self.assertEqual(scores[0], 1)
+        # 3 batches of 1000 elements sent together
+        self.assertEqual(self.server.requests, 3)
+        self.assertGreater(self.server.max_in_flight, 1)
+        # a retry on the same page, even from another retriever, is served from the cache
+        self.assertEqual(
+            self.get_retriever(cache)._get_results("item 1234", HTML),
+            (results, scores),
+        )
+        self.assertEqual(self.server.requests, 3)
+        retriever._get_results("item 42", HTML)
+        self.assertEqual(self.server.requests, 6)
+        # connections of the shared client are reused
+        self.assertIs(retriever.cohere_session, get_cohere_client("key", self.base_url))
+        self.assertLessEqual(len(self.server.connections), 3)
+
+    def test_async_rerank(self):
+        expected = self.get_retriever(LRUCache())._get_results("item 7", HTML)
+        self.server.max_in_flight = 0
+        retriever = self.get_retriever(LRUCache())
+        self.assertEqual(asyncio.run(retriever._aget_results("item 7", HTML)), expected)
+        self.assertEqual(self.server.requests, 6)
+        self.assertGreater(self.server.max_in_flight, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()